@@ -0,0 +1,159 @@
+'''Benchmark of request latency with the app's logs written synchronously on
+request threads, as they were before, and through the queue pipeline in
+`seclopzapi.logs`.
+
+Threads send requests to the app in this process, each of which is logged,
+for `--duration` seconds.  `--write-delay` slows every write to the log file,
+as a busy or network disk would.
+
+Run with `python -m benchmarks.log_pipeline --help` from the `seclopzapi`
+directory.
+'''
+
+import json
+import logging
+from logging.handlers import TimedRotatingFileHandler
+import os
+from queue import Queue
+import tempfile
+from threading import Thread
+import time
+
+import click
+
+
+class _SlowStream:
+    # Wraps a file so that every write takes at least `delay` seconds.
+    def __init__(self, stream, delay):
+        self._stream = stream
+        self._delay = delay
+
+    def write(self, text):
+        time.sleep(self._delay)
+        return self._stream.write(text)
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+def percentile(values, p):
+    '''The `p`th percentile (0 to 100) of `values`, by the nearest-rank
+    method.
+    '''
+
+    if len(values) == 0:
+        return float('nan')
+
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(p / 100 * len(ordered)) - 1))
+
+    return ordered[rank]
+
+
+def _client(app, until, latencies):
+    client = app.test_client()
+
+    while time.monotonic() < until:
+        start = time.perf_counter()
+        client.get('/').close()
+        latencies.append(time.perf_counter() - start)
+
+
+def _run(app, pipeline, handler, clients, duration):
+    for installed in list(app.logger.handlers):
+        app.logger.removeHandler(installed)
+
+    app.logger.addHandler(handler)
+    latencies = []
+    until = time.monotonic() + duration
+    threads = [
+        Thread(target=_client, args=(app, until, latencies))
+        for _ in range(clients)
+    ]
+    start = time.monotonic()
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    elapsed = time.monotonic() - start
+    handler.close()
+    app.logger.removeHandler(handler)
+
+    return {
+        'logging': pipeline,
+        'requests_per_second': len(latencies) / elapsed,
+        **{
+            f'p{p}_ms': percentile(latencies, p) * 1e3
+            for p in [50, 95, 99]
+        },
+        'sampled': getattr(handler, 'sampled', 0),
+        'dropped': getattr(handler, 'dropped', 0),
+    }
+
+
+@click.command()
+@click.option('--clients', default=16, help='Concurrent request threads.')
+@click.option('--duration', default=5.0, help='Seconds to send for.')
+@click.option('--write-delay', default=0.0,
+              help='Seconds each write to the log file takes.')
+def main(clients, duration, write_delay):
+    directory = tempfile.TemporaryDirectory()
+    settings = os.path.join(directory.name, 'settings.cfg')
+
+    with open(settings, 'w') as cfg_file:
+        cfg_file.write(f'LOG_DIR = {directory.name!r}\n')
+
+    os.environ['SECLOPZAPI_SETTINGS'] = settings
+
+    from seclopzapi import app
+    from seclopzapi.logs import (
+        BatchingFileHandler, BatchingListener, JsonFormatter,
+        RequestFilter, SamplingQueueHandler)
+
+    def file_handler(cls, name):
+        handler = cls(os.path.join(directory.name, name), 'midnight')
+        handler.setLevel(logging.INFO)
+        handler.setFormatter(JsonFormatter())
+
+        if write_delay > 0:
+            handler.stream = _SlowStream(handler.stream, write_delay)
+
+        return handler
+
+    synchronous = file_handler(TimedRotatingFileHandler, 'synchronous.log')
+    synchronous.addFilter(RequestFilter())
+
+    def make_listener(queue):
+        return BatchingListener(
+            queue,
+            file_handler(BatchingFileHandler, 'pipeline.log'),
+            app.config['LOG_BATCH_SIZE'],
+            app.config['LOG_FLUSH_INTERVAL'])
+
+    pipeline = SamplingQueueHandler(
+        Queue(app.config['LOG_QUEUE_SIZE']),
+        make_listener,
+        app.config['LOG_SAMPLE_ABOVE'],
+        app.config['LOG_SAMPLE_RATE'])
+    pipeline.addFilter(RequestFilter())
+
+    try:
+        reports = [
+            _run(app, 'synchronous', synchronous, clients, duration),
+            _run(app, 'pipeline', pipeline, clients, duration),
+        ]
+    finally:
+        directory.cleanup()
+
+    print(json.dumps({
+        'clients': clients,
+        'write_delay_ms': write_delay * 1e3,
+        'runs': reports,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
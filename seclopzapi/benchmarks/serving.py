@@ -0,0 +1,211 @@
+'''Load test of seclopzapi on one machine, measuring the requests per second
+it answers and their tail latency.
+
+Starts the app in a subprocess, either on Flask's development server or on
+Gunicorn with the production settings in `seclopzapi.gunicorn_conf`, and has
+`--clients` threads each send requests back to back over a keep-alive
+connection for `--duration` seconds.
+
+Run with `python -m benchmarks.serving --help` from the `seclopzapi`
+directory.
+'''
+
+import http.client
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+from threading import Thread
+import time
+
+import click
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PATHS = {
+    'index': ('/', {}),
+    'static': ('/static/styles.css', {}),
+    'revalidate': ('/', 'etag'),
+}
+
+
+def percentile(values, p):
+    '''The `p`th percentile (0 to 100) of `values`, by the nearest-rank
+    method.
+    '''
+
+    if len(values) == 0:
+        return float('nan')
+
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(p / 100 * len(ordered)) - 1))
+
+    return ordered[rank]
+
+
+def _start(server, port, workers, threads, directory):
+    settings = os.path.join(directory, 'settings.cfg')
+
+    with open(settings, 'w') as cfg_file:
+        cfg_file.write(f'LOG_DIR = {directory!r}\n')
+
+    env = dict(
+            os.environ,
+            SECLOPZAPI_SETTINGS=settings,
+            SECLOPZAPI_BIND=f'127.0.0.1:{port}',
+            SECLOPZAPI_WORKERS=str(workers),
+            SECLOPZAPI_THREADS=str(threads),
+            FLASK_APP='seclopzapi')
+
+    if server == 'gunicorn':
+        command = [
+            sys.executable, '-m', 'gunicorn',
+            '-c', 'python:seclopzapi.gunicorn_conf', 'seclopzapi.wsgi',
+        ]
+    else:
+        command = [
+            sys.executable, '-m', 'flask', 'run', '--port', str(port),
+        ]
+
+    return subprocess.Popen(
+            command,
+            cwd=ROOT,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL)
+
+
+def _stop(process):
+    process.send_signal(signal.SIGTERM)
+
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def _wait_until_serving(port, process):
+    deadline = time.monotonic() + 30
+
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            break
+
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+
+        try:
+            connection.request('GET', '/')
+            connection.getresponse().read()
+            return
+        except (OSError, http.client.HTTPException):
+            time.sleep(0.1)
+        finally:
+            connection.close()
+
+    raise click.ClickException('The server failed to start.')
+
+
+def _client(port, path, headers, until, latencies, errors):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+
+    while time.monotonic() < until:
+        start = time.monotonic()
+
+        try:
+            connection.request('GET', path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+
+            if response.status not in (200, 304):
+                errors.append(response.status)
+                continue
+        except (OSError, http.client.HTTPException):
+            errors.append(0)
+            connection.close()
+            connection = http.client.HTTPConnection(
+                    '127.0.0.1', port, timeout=10)
+            continue
+
+        latencies.append(time.monotonic() - start)
+
+    connection.close()
+
+
+def _etag(port):
+    connection = http.client.HTTPConnection('127.0.0.1', port)
+
+    try:
+        connection.request('GET', '/')
+        response = connection.getresponse()
+        response.read()
+        return response.getheader('ETag')
+    finally:
+        connection.close()
+
+
+@click.command()
+@click.option('--server', default='gunicorn',
+              type=click.Choice(['gunicorn', 'flask']))
+@click.option('--path', 'kind', default='index',
+              type=click.Choice(sorted(PATHS)),
+              help='What to request: the index page, a static file, or the '
+                   'index page with the ETag of the copy already held.')
+@click.option('--port', default=5065)
+@click.option('--clients', default=16, help='Concurrent connections.')
+@click.option('--duration', default=10.0, help='Seconds to send for.')
+@click.option('--workers', default=os.cpu_count() * 2,
+              help='Gunicorn worker processes.')
+@click.option('--threads', default=4, help='Threads in each worker.')
+def main(server, kind, port, clients, duration, workers, threads):
+    directory = tempfile.TemporaryDirectory()
+    process = _start(server, port, workers, threads, directory.name)
+
+    try:
+        _wait_until_serving(port, process)
+        (path, headers) = PATHS[kind]
+
+        if headers == 'etag':
+            headers = {'If-None-Match': _etag(port)}
+
+        latencies = []
+        errors = []
+        until = time.monotonic() + duration
+        senders = [
+            Thread(target=_client,
+                   args=(port, path, headers, until, latencies, errors))
+            for _ in range(clients)
+        ]
+        start = time.monotonic()
+
+        for thread in senders:
+            thread.start()
+
+        for thread in senders:
+            thread.join()
+
+        elapsed = time.monotonic() - start
+    finally:
+        _stop(process)
+        directory.cleanup()
+
+    print(json.dumps({
+        'server': server,
+        'path': kind,
+        'clients': clients,
+        'workers': workers if server == 'gunicorn' else 1,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'requests_per_second': len(latencies) / elapsed,
+        **{
+            f'p{p}_ms': percentile(latencies, p) * 1e3
+            for p in [50, 95, 99]
+        },
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,17 +1,11 @@
-import os
 from flask import Flask
 
 app = Flask(__name__)
 app.config.from_object('seclopzapi.default_settings')
 app.config.from_envvar('SECLOPZAPI_SETTINGS')
 
-if not app.debug:
-    import logging
-    from logging.handlers import TimedRotatingFileHandler
-    # https://docs.python.org/3.6/library/logging.handlers.html#timedrotatingfilehandler
-    file_handler = TimedRotatingFileHandler(os.path.join(app.config['LOG_DIR'], 'seclopzapi.log'), 'midnight')
-    file_handler.setLevel(logging.WARNING)
-    file_handler.setFormatter(logging.Formatter('<%(asctime)s> <%(levelname)s> %(message)s'))
-    app.logger.addHandler(file_handler)
+from seclopzapi import logs  # noqa: E402
+logs.install(app)
 
 import seclopzapi.views
+import seclopzapi.commands
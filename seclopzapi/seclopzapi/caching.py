@@ -0,0 +1,39 @@
+import hashlib
+
+from flask import Response, render_template, request
+
+from seclopzapi import app
+
+
+# Rendered pages, by template name and the path the app is served under,
+# along with their ETags.
+_rendered = {}
+
+
+def render_cached(template_name):
+    '''Render a template that takes no context once, and answer with it
+    from then on.
+
+    Responses carry an ETag and may be reused by browsers and proxies for
+    PAGE_MAX_AGE seconds, and requests for a page the client already has
+    are answered with 304 Not Modified.  In debug mode, templates are
+    rendered on every request so that changes to them show up at once.
+    '''
+
+    key = (template_name, request.script_root)
+    entry = None if app.debug else _rendered.get(key)
+
+    if entry is None:
+        body = render_template(template_name).encode('utf-8')
+        entry = (body, hashlib.sha1(body).hexdigest())
+
+        if not app.debug:
+            _rendered[key] = entry
+
+    (body, etag) = entry
+    response = Response(body, mimetype='text/html')
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = app.config['PAGE_MAX_AGE']
+
+    return response.make_conditional(request)
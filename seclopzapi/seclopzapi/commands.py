@@ -0,0 +1,175 @@
+'''Endpoints that parse and execute seclopzbot commands, for tools that want
+to classify or answer messages without going through Slack.
+
+Messages are answered by a seclopzbot `Bot`, built once per process from the
+bot configuration file named by COMMANDS_CONFIG, so that they get the replies
+the bot would give in Slack.  Commands are loaded, and their parsers compiled
+or read from the bot's parser table cache, when the app starts, so that forked
+workers share them.  Without COMMANDS_CONFIG both endpoints answer 503.
+
+Executing a command runs its callback, which can change other services, so
+`/commands/execute` requires an `Authorization: Bearer <COMMANDS_TOKEN>`
+header, and is refused altogether while COMMANDS_TOKEN is not set.
+
+Both endpoints take a JSON object with either a `message` string, answered
+with a single JSON object, or a `messages` list of up to COMMANDS_MAX_BATCH
+strings.  A batch is answered with `{"results": [...]}`, or, if the request
+accepts `application/x-ndjson`, streamed back as one JSON object per line,
+with its `index` in the batch, as each chunk of COMMANDS_CHUNK_SIZE messages
+is done.
+'''
+
+import asyncio
+import hmac
+import json
+
+from flask import Response, abort, jsonify, request
+
+from bot.config import Config
+from bot.slackbot import Bot
+from seclopzapi import app
+
+
+NDJSON = 'application/x-ndjson'
+
+
+def load_bot(path):
+    '''A `Bot` answering with the commands of the bot configuration at
+    `path`, with every command loaded, or `None` if `path` is `None`.
+    '''
+
+    if path is None:
+        return None
+
+    bot = Bot(None, Config.load(path))
+    bot.warm(background=False)
+    return bot
+
+
+bot = load_bot(app.config['COMMANDS_CONFIG'])
+
+
+def parse_messages(messages):
+    '''The command each message invokes and the parameters parsed for it,
+    without invoking any.
+    '''
+
+    return [
+        {'command': None, 'args': None} if match is None else
+        {'command': match[0], 'args': match[1]}
+        for match in bot.classify_batch(messages)
+    ]
+
+
+def execute_messages(messages):
+    '''The command answering each message and the bot's reply, if it would
+    reply, waiting on the callbacks of every message at once.
+    '''
+
+    async def respond_all():
+        return await asyncio.gather(*[
+            bot.respond_to_message_async(message) for message in messages
+        ])
+
+    return [
+        {'command': None, 'message': None} if response is None else
+        {'command': response.command, 'message': response.message}
+        for response in bot.runner.run(respond_all())
+    ]
+
+
+def _require_bot():
+    if bot is None:
+        abort(503, 'COMMANDS_CONFIG is not set.')
+
+
+def _require_token():
+    token = app.config['COMMANDS_TOKEN']
+
+    if token is None:
+        abort(403, 'Executing commands is disabled; set COMMANDS_TOKEN.')
+
+    given = request.headers.get('Authorization', '')
+
+    if not hmac.compare_digest(given.encode('utf-8'),
+                               f'Bearer {token}'.encode('utf-8')):
+        abort(401, 'Expected an `Authorization: Bearer <token>` header.')
+
+
+def _messages():
+    # The message or batch of messages in the request, and whether it is a
+    # batch.
+    body = request.get_json(silent=True)
+
+    if not isinstance(body, dict):
+        abort(400, 'Expected a JSON object.')
+
+    if 'messages' in body:
+        messages = body['messages']
+
+        if not isinstance(messages, list) or\
+                not all(isinstance(m, str) for m in messages):
+            abort(400, '`messages` must be a list of strings.')
+
+        if len(messages) > app.config['COMMANDS_MAX_BATCH']:
+            abort(413, f'At most {app.config["COMMANDS_MAX_BATCH"]} messages '
+                       'can be sent at once.')
+
+        return (messages, True)
+
+    if not isinstance(body.get('message'), str):
+        abort(400, 'Expected a `message` string or a `messages` list.')
+
+    return ([body['message']], False)
+
+
+def _answer(handle):
+    (messages, batch) = _messages()
+
+    if not batch:
+        return jsonify(handle(messages)[0])
+
+    size = app.config['COMMANDS_CHUNK_SIZE']
+    chunks = (messages[i:i + size] for i in range(0, len(messages), size))
+
+    if request.accept_mimetypes.best_match(['application/json', NDJSON]) !=\
+            NDJSON:
+        return jsonify({
+            'results': [result for chunk in chunks for result in handle(chunk)]
+        })
+
+    def stream():
+        index = 0
+
+        for chunk in chunks:
+            lines = []
+
+            for result in handle(chunk):
+                lines.append(json.dumps({'index': index, **result}) + '\n')
+                index += 1
+
+            yield ''.join(lines)
+
+    return Response(stream(), mimetype=NDJSON)
+
+
+@app.errorhandler(400)
+@app.errorhandler(401)
+@app.errorhandler(403)
+@app.errorhandler(413)
+@app.errorhandler(503)
+def bad_request(error):
+    return jsonify({'error': error.description}), error.code
+
+
+@app.route('/commands/parse', methods=['POST'])
+def parse():
+    _require_bot()
+    return _answer(parse_messages)
+
+
+@app.route('/commands/execute', methods=['POST'])
+def execute():
+    _require_bot()
+    _require_token()
+    return _answer(execute_messages)
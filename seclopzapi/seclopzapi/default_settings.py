@@ -1,2 +1,15 @@
 DEBUG = False  # make sure DEBUG is off unless enabled explicitly otherwise
 LOG_DIR = '.'  # create log files in current working directory
+LOG_LEVEL = 'INFO'  # every request is logged at INFO
+LOG_BACKUP_COUNT = 14  # days of rotated logs kept
+LOG_QUEUE_SIZE = 10000  # records waiting to be written before more are dropped
+LOG_BATCH_SIZE = 256  # records written at once
+LOG_FLUSH_INTERVAL = 0.05  # seconds records wait to be written with others
+LOG_SAMPLE_ABOVE = 0.5  # fraction of the queue full before sampling starts
+LOG_SAMPLE_RATE = 0.1  # fraction of records below WARNING kept once sampling
+PAGE_MAX_AGE = 300  # seconds browsers and proxies may reuse rendered pages for
+SEND_FILE_MAX_AGE_DEFAULT = 3600  # seconds they may reuse files in static/
+COMMANDS_CONFIG = None  # seclopzbot config file naming the commands to serve
+COMMANDS_TOKEN = None  # bearer token /commands/execute requires, off if None
+COMMANDS_MAX_BATCH = 100000  # messages accepted in one request
+COMMANDS_CHUNK_SIZE = 1000  # messages handled per streamed chunk
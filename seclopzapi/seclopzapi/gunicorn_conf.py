@@ -0,0 +1,37 @@
+'''Gunicorn settings for serving seclopzapi in production:
+
+    gunicorn -c python:seclopzapi.gunicorn_conf seclopzapi.wsgi
+
+Gunicorn forks WORKERS processes, each answering up to THREADS requests at
+once, so that requests are served on every core despite the GIL.  Each can
+be set by an environment variable prefixed with SECLOPZAPI_.
+'''
+
+import multiprocessing
+import os
+
+
+def _env(name, default):
+    return type(default)(os.environ.get('SECLOPZAPI_' + name, default))
+
+
+bind = _env('BIND', '127.0.0.1:8000')
+
+# Two workers per core keeps every core busy while others wait on I/O.
+workers = _env('WORKERS', multiprocessing.cpu_count() * 2)
+worker_class = 'gthread'
+threads = _env('THREADS', 4)
+
+# Seconds to hold idle connections open for the reverse proxy to reuse.
+keepalive = _env('KEEPALIVE', 5)
+timeout = _env('TIMEOUT', 30)
+graceful_timeout = _env('GRACEFUL_TIMEOUT', 30)
+
+# Workers are replaced after a number of requests, at staggered times, to
+# bound the memory any leak can take.
+max_requests = _env('MAX_REQUESTS', 10000)
+max_requests_jitter = max_requests // 10
+
+# The app and its templates are loaded once before forking, so workers start
+# quickly and share the memory.
+preload_app = True
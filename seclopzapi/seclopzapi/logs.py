@@ -0,0 +1,324 @@
+'''A logging pipeline that keeps file I/O off request threads.
+
+Request threads only put records on a bounded queue, through a
+`SamplingQueueHandler`.  A `BatchingListener` thread takes every record
+waiting at once and has a `BatchingFileHandler` write them as JSON lines in
+a single write, rotating the file at midnight.  When the queue backs up,
+records below `priority` are sampled, and any record arriving while it is
+full is dropped rather than block a request.
+
+Every process forked from the app, such as Gunicorn's workers, appends to
+the same file, and they take turns rotating it.
+'''
+
+import copy
+from datetime import datetime, timezone
+import fcntl
+import json
+import logging
+from logging.handlers import QueueHandler, TimedRotatingFileHandler
+import os
+from queue import Empty, Full, Queue
+import random
+from threading import Lock, Thread
+import time
+import uuid
+
+from flask import g, has_request_context, request
+from flask.logging import default_handler
+
+
+# Attributes copied from records into their JSON lines when present.
+FIELDS = ('request_id', 'method', 'path', 'status', 'latency_ms',
+          'sample_rate')
+
+
+class JsonFormatter(logging.Formatter):
+    '''Formats records as single line JSON objects.
+    '''
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc)
+                    .isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+
+        for name in FIELDS:
+            value = getattr(record, name, None)
+
+            if value is not None:
+                entry[name] = value
+
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+
+        return json.dumps(entry)
+
+
+class BatchingFileHandler(TimedRotatingFileHandler):
+    '''A `TimedRotatingFileHandler` that can write many records at once, and
+    that can share its file with other processes.
+
+    Processes hold a lock on a `.lock` file next to the log while they write
+    or rotate it.  A process that finds the file has been rotated by another
+    reopens it, rather than rotate it again and overwrite the old log.
+    '''
+
+    def _reopen_if_rotated(self):
+        # Must be called holding the lock file.
+        try:
+            current = os.stat(self.baseFilename)
+        except FileNotFoundError:
+            current = None
+
+        if self.stream is not None and current is not None and\
+                os.fstat(self.stream.fileno()).st_ino == current.st_ino:
+            return
+
+        if self.stream is not None:
+            self.stream.close()
+
+        self.stream = self._open()
+        self.rolloverAt = self.computeRollover(
+            int(current.st_mtime) if current is not None else int(time.time()))
+
+    def emit_batch(self, records):
+        '''Write the records at or above the handler's level with one write
+        and one flush, rotating the file first if it is due.
+        '''
+
+        records = [r for r in records if r.levelno >= self.level]
+
+        if not records:
+            return
+
+        self.acquire()
+
+        try:
+            with open(self.baseFilename + '.lock', 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                self._reopen_if_rotated()
+
+                if self.shouldRollover(records[0]):
+                    self.doRollover()
+
+                self.stream.write(
+                    ''.join(self.format(record) + '\n' for record in records))
+                self.stream.flush()
+        except Exception:
+            self.handleError(records[0])
+        finally:
+            self.release()
+
+
+class BatchingListener:
+    '''Takes records off `queue` on a background thread and hands them to
+    `handler` in batches of up to `batch_size`.
+
+    Once a record arrives, the listener waits `interval` seconds for more to
+    join it, rather than wake for every record and contend with request
+    threads for the interpreter.
+    '''
+
+    def __init__(self, queue, handler, batch_size=256, interval=0.05):
+        self.queue = queue
+        self.handler = handler
+        self.batch_size = batch_size
+        self.interval = interval
+        self._thread = None
+
+    def start(self):
+        self._thread = Thread(
+            target=self._run, name='log-listener', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            record = self.queue.get()
+
+            if record is None:
+                return
+
+            batch = [record]
+
+            if self.interval > 0:
+                time.sleep(self.interval)
+
+            while len(batch) < self.batch_size:
+                try:
+                    record = self.queue.get_nowait()
+                except Empty:
+                    break
+
+                if record is None:
+                    self.handler.emit_batch(batch)
+                    return
+
+                batch.append(record)
+
+            self.handler.emit_batch(batch)
+
+    def stop(self):
+        '''Write every record already queued, then stop.
+        '''
+
+        if self._thread is not None:
+            self.queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+
+class SamplingQueueHandler(QueueHandler):
+    '''Puts records on a bounded queue for a listener started by
+    `make_listener`, in every process the handler is used in, since the
+    listener thread does not survive a fork.
+
+    Once the queue is `sample_above` full, only `sample_rate` of the
+    records below `priority` are kept, and marked with the rate so counts can
+    be scaled back up.  Records arriving while the queue is full are
+    dropped.  `sampled` and `dropped` count the records left out.
+    '''
+
+    def __init__(self, queue, make_listener, sample_above=0.5,
+                 sample_rate=0.1, priority=logging.WARNING):
+        super().__init__(queue)
+        self.sample_above = sample_above
+        self.sample_rate = sample_rate
+        self.priority = priority
+        self.sampled = 0
+        self.dropped = 0
+        self._make_listener = make_listener
+        self._listener = None
+        self._pid = None
+        self._starting = Lock()
+
+    def _start_listener(self):
+        # Starts a listener the first time a record is logged in a process.
+        if self._pid != os.getpid():
+            with self._starting:
+                if self._pid != os.getpid():
+                    self._listener = self._make_listener(self.queue)
+                    self._listener.start()
+                    self._pid = os.getpid()
+
+    def prepare(self, record):
+        # Unlike `QueueHandler.prepare`, only merges the message's arguments,
+        # leaving any exception to be formatted by the listener's handler.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def emit(self, record):
+        self._start_listener()
+        sample_rate = None
+
+        # Records are sampled before they are prepared, so that those left
+        # out cost as little as possible.
+        if record.levelno < self.priority and\
+                self.queue.qsize() >= self.sample_above * self.queue.maxsize:
+            if random.random() >= self.sample_rate:
+                self.sampled += 1
+                return
+
+            sample_rate = self.sample_rate
+
+        try:
+            prepared = self.prepare(record)
+
+            if sample_rate is not None:
+                prepared.sample_rate = sample_rate
+
+            self.enqueue(prepared)
+        except Exception:
+            self.handleError(record)
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except Full:
+            self.dropped += 1
+
+    def close(self):
+        if self._pid == os.getpid():
+            self._listener.stop()
+            self._pid = None
+
+        super().close()
+
+
+class RequestFilter(logging.Filter):
+    '''Adds the current request's id to records logged while handling it.
+    '''
+
+    def filter(self, record):
+        if has_request_context() and 'request_id' in g:
+            record.request_id = g.request_id
+
+        return True
+
+
+def log_path(directory):
+    '''The file the app and every process forked from it log to.
+    '''
+
+    return os.path.join(directory, 'seclopzapi.log')
+
+
+def install(app):
+    '''Log every request to `app.logger` with its id, status and latency,
+    and, outside debug mode, write the app's logs through the pipeline.
+    '''
+
+    @app.before_request
+    def start_request():
+        g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+        g.started = time.perf_counter()
+
+    @app.after_request
+    def log_request(response):
+        latency = (time.perf_counter() - g.get('started', 0)) * 1e3
+        response.headers['X-Request-ID'] = g.get('request_id', '')
+        app.logger.info(
+            '%s %s %s', request.method, request.path, response.status_code,
+            extra={
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'latency_ms': round(latency, 3),
+            })
+        return response
+
+    if app.debug:
+        return
+
+    queue = Queue(app.config['LOG_QUEUE_SIZE'])
+
+    def make_listener(queue):
+        handler = BatchingFileHandler(
+            log_path(app.config['LOG_DIR']),
+            'midnight',
+            backupCount=app.config['LOG_BACKUP_COUNT'])
+        handler.setLevel(app.config['LOG_LEVEL'])
+        handler.setFormatter(JsonFormatter())
+        return BatchingListener(
+            queue, handler,
+            app.config['LOG_BATCH_SIZE'], app.config['LOG_FLUSH_INTERVAL'])
+
+    handler = SamplingQueueHandler(
+        queue,
+        make_listener,
+        app.config['LOG_SAMPLE_ABOVE'],
+        app.config['LOG_SAMPLE_RATE'])
+    handler.addFilter(RequestFilter())
+    # Flask's own handler writes to stderr on the request thread.
+    app.logger.removeHandler(default_handler)
+    app.logger.addHandler(handler)
+    app.logger.setLevel(app.config['LOG_LEVEL'])
+    return handler
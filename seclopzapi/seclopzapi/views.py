@@ -1,9 +1,7 @@
-from flask import render_template
-
 from seclopzapi import app
+from seclopzapi.caching import render_cached
 
 
 @app.route('/')
 def index():
-    app.logger.warning('sample message')
-    return render_template('index.html')
+    return render_cached('index.html')
@@ -0,0 +1,6 @@
+'''The WSGI entry point for serving seclopzapi in production, as in:
+
+    gunicorn -c python:seclopzapi.gunicorn_conf seclopzapi.wsgi
+'''
+
+from seclopzapi import app as application  # noqa: F401
@@ -4,10 +4,15 @@ setup(
     name='seclopzapi',
     version='1.0',
     long_description=__doc__,
-    packages=find_packages(),
+    # Benchmarks run from the source tree, and would clash with the bot's.
+    packages=find_packages(exclude=['benchmarks', 'benchmarks.*']),
     include_package_data=True,
     zip_safe=False,
     install_requires=[
         'flask',
+        'seclopzbot',
     ],
+    extras_require={
+        'serve': ['gunicorn'],
+    },
 )
@@ -0,0 +1,135 @@
+import json
+import os
+import tempfile
+import unittest
+
+import seclopzapi
+from seclopzapi import commands
+
+
+INVOKING = 'seclopzbot is there a guide for new hires?'
+CHATTER = 'lunch in 10 minutes, who is in?'
+LINK = 'https://example.com/new-hires'
+TOKEN = 'secret'
+
+
+class CommandsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        (fd, path) = tempfile.mkstemp(suffix='.json')
+
+        with os.fdopen(fd, 'w') as conf:
+            json.dump({'channels': ['general'], 'new_hire_links': [LINK]},
+                      conf)
+
+        self.addCleanup(os.remove, path)
+        self.bot = commands.load_bot(path)
+        (default_bot, commands.bot) = (commands.bot, self.bot)
+        self.addCleanup(setattr, commands, 'bot', default_bot)
+        seclopzapi.app.config['COMMANDS_TOKEN'] = TOKEN
+        self.addCleanup(seclopzapi.app.config.__setitem__,
+                        'COMMANDS_TOKEN', None)
+        self.app = seclopzapi.app.test_client()
+
+    def post(self, path, body, **headers):
+        if path == '/commands/execute':
+            headers.setdefault('Authorization', f'Bearer {TOKEN}')
+
+        return self.app.post(path, json=body, headers=headers)
+
+    def test_commands_loaded_with_bot(self):
+        self.assertTrue(all(
+            command.loaded
+            for command in self.bot._snapshot.registry.commands))
+
+    def test_no_config(self):
+        commands.bot = None
+
+        for path in ['/commands/parse', '/commands/execute']:
+            rv = self.post(path, {'message': INVOKING})
+            self.assertEqual(rv.status_code, 503)
+            self.assertIn('COMMANDS_CONFIG', rv.get_json()['error'])
+
+    def test_parse_message(self):
+        rv = self.post('/commands/parse', {'message': INVOKING})
+        self.assertEqual(rv.get_json(), {'command': 'new-hires', 'args': {}})
+
+        rv = self.post('/commands/parse', {'message': CHATTER})
+        self.assertEqual(rv.get_json(), {'command': None, 'args': None})
+
+    def test_parse_batch_as_bot_would(self):
+        messages = [INVOKING, CHATTER, 'new hires', 'seclopzbot help']
+        rv = self.post('/commands/parse', {'messages': messages})
+
+        self.assertEqual(
+            [(r['command'], r['args']) if r['command'] else None
+             for r in rv.get_json()['results']],
+            self.bot.classify_batch(messages))
+
+    def test_execute_message(self):
+        rv = self.post('/commands/execute', {'message': INVOKING})
+        result = rv.get_json()
+
+        self.assertEqual(result['command'], 'new-hires')
+        self.assertIn(LINK, result['message'])
+
+        rv = self.post('/commands/execute', {'message': CHATTER})
+        self.assertEqual(rv.get_json(), {'command': None, 'message': None})
+
+        rv = self.post('/commands/execute', {'message': 'seclopzbot lunch?'})
+        result = rv.get_json()
+
+        self.assertIsNone(result['command'])
+        self.assertIn('help', result['message'])
+
+    def test_execute_requires_token(self):
+        for headers in [{}, {'Authorization': 'Bearer wrong'},
+                        {'Authorization': TOKEN}]:
+            rv = self.app.post('/commands/execute', json={'message': INVOKING},
+                               headers=headers)
+            self.assertEqual(rv.status_code, 401, headers)
+            self.assertIn('error', rv.get_json())
+
+        seclopzapi.app.config['COMMANDS_TOKEN'] = None
+        rv = self.post('/commands/execute', {'message': INVOKING})
+        self.assertEqual(rv.status_code, 403)
+
+    def test_stream_batch(self):
+        seclopzapi.app.config['COMMANDS_CHUNK_SIZE'] = 2
+
+        try:
+            rv = self.post(
+                '/commands/execute', {'messages': [INVOKING, CHATTER] * 3},
+                Accept='application/x-ndjson')
+            lines = [json.loads(line) for line in rv.data.splitlines()]
+        finally:
+            seclopzapi.app.config['COMMANDS_CHUNK_SIZE'] = 1000
+
+        self.assertEqual(rv.mimetype, 'application/x-ndjson')
+        self.assertEqual([line['index'] for line in lines], list(range(6)))
+        self.assertEqual(
+            [line['command'] for line in lines],
+            ['new-hires', None] * 3)
+
+    def test_bad_requests(self):
+        for body in [['x'], {}, {'message': 1}, {'messages': 'x'},
+                     {'messages': ['x', None]}]:
+            rv = self.post('/commands/parse', body)
+            self.assertEqual(rv.status_code, 400, body)
+            self.assertIn('error', rv.get_json())
+
+        rv = self.app.post('/commands/parse', data='not json')
+        self.assertEqual(rv.status_code, 400)
+
+        seclopzapi.app.config['COMMANDS_MAX_BATCH'] = 2
+
+        try:
+            rv = self.post('/commands/parse', {'messages': ['a', 'b', 'c']})
+        finally:
+            seclopzapi.app.config['COMMANDS_MAX_BATCH'] = 100000
+
+        self.assertEqual(rv.status_code, 413)
+
+
+if __name__ == '__main__':
+    unittest.main()
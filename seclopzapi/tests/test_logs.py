@@ -0,0 +1,217 @@
+import json
+import logging
+import os
+from queue import Queue
+import sys
+import tempfile
+import unittest
+
+import seclopzapi
+from seclopzapi.logs import (
+    BatchingFileHandler, BatchingListener, JsonFormatter,
+    SamplingQueueHandler, log_path)
+
+
+def _record(level=logging.INFO, message='hello', exc_info=None, **fields):
+    record = logging.LogRecord(
+        'seclopzapi', level, __file__, 1, message, None,
+        sys.exc_info() if exc_info else None)
+    record.__dict__.update(fields)
+    return record
+
+
+class _IdleListener:
+    # Never takes records off the queue, so that it fills up.
+    started = 0
+
+    def __init__(self, queue):
+        pass
+
+    def start(self):
+        _IdleListener.started += 1
+
+    def stop(self):
+        pass
+
+
+class _CountingHandler(BatchingFileHandler):
+    def __init__(self, path):
+        super().__init__(path, 'midnight')
+        self.batches = []
+
+    def emit_batch(self, records):
+        self.batches.append(len(records))
+        super().emit_batch(records)
+
+
+class LogsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_json_lines(self):
+        line = JsonFormatter().format(
+            _record(request_id='abc', status=200, latency_ms=1.5))
+        entry = json.loads(line)
+
+        self.assertEqual(entry['level'], 'INFO')
+        self.assertEqual(entry['message'], 'hello')
+        self.assertEqual(entry['request_id'], 'abc')
+        self.assertEqual(entry['status'], 200)
+        self.assertEqual(entry['latency_ms'], 1.5)
+        self.assertNotIn('method', entry)
+
+    def test_listener_writes_waiting_records_at_once(self):
+        path = log_path(self.directory.name)
+        handler = _CountingHandler(path)
+        handler.setFormatter(JsonFormatter())
+        queue = Queue()
+        listener = BatchingListener(queue, handler, batch_size=64)
+
+        for n in range(100):
+            queue.put(_record(message=f'record {n}'))
+
+        listener.start()
+        listener.stop()
+        handler.close()
+
+        self.assertEqual(handler.batches, [64, 36])
+
+        with open(path) as log_file:
+            messages = [json.loads(line)['message'] for line in log_file]
+
+        self.assertEqual(messages, [f'record {n}' for n in range(100)])
+
+    def test_low_priority_records_sampled_under_load(self):
+        queue = Queue(10)
+        handler = SamplingQueueHandler(
+            queue, _IdleListener, sample_above=0.5, sample_rate=0.0)
+
+        for _ in range(20):
+            handler.handle(_record())
+
+        self.assertEqual(queue.qsize(), 5)
+        self.assertEqual(handler.sampled, 15)
+
+        for _ in range(10):
+            handler.handle(_record(logging.WARNING))
+
+        self.assertEqual(queue.qsize(), 10)
+        self.assertEqual(handler.dropped, 5)
+
+    def test_sampled_records_marked(self):
+        queue = Queue(2)
+        handler = SamplingQueueHandler(
+            queue, _IdleListener, sample_above=0.5, sample_rate=1.0)
+        handler.handle(_record())
+        handler.handle(_record())
+
+        self.assertFalse(hasattr(queue.get(), 'sample_rate'))
+        self.assertEqual(queue.get().sample_rate, 1.0)
+
+    def test_processes_share_rotated_file(self):
+        path = log_path(self.directory.name)
+        (first, second) = (BatchingFileHandler(path, 'midnight'),
+                           BatchingFileHandler(path, 'midnight'))
+
+        for handler in (first, second):
+            handler.setFormatter(JsonFormatter())
+            self.addCleanup(handler.close)
+
+        first.emit_batch([_record(message='a')])
+        second.emit_batch([_record(message='b')])
+        # Both are due to rotate the file, as after midnight.
+        first.rolloverAt = second.rolloverAt = 0
+        first.emit_batch([_record(message='c')])
+        second.emit_batch([_record(message='d')])
+
+        def messages(name):
+            with open(os.path.join(self.directory.name, name)) as log_file:
+                return [json.loads(line)['message'] for line in log_file]
+
+        rotated = [name for name in os.listdir(self.directory.name)
+                   if name.startswith('seclopzapi.log.')
+                   and not name.endswith('.lock')]
+
+        self.assertEqual(len(rotated), 1)
+        self.assertEqual(messages(rotated[0]), ['a', 'b'])
+        self.assertEqual(messages('seclopzapi.log'), ['c', 'd'])
+
+    def test_exceptions_formatted_by_listener(self):
+        path = log_path(self.directory.name)
+        file_handler = BatchingFileHandler(path, 'midnight')
+        file_handler.setFormatter(JsonFormatter())
+        self.addCleanup(file_handler.close)
+
+        def make_listener(queue):
+            return BatchingListener(queue, file_handler, interval=0)
+
+        handler = SamplingQueueHandler(Queue(10), make_listener)
+
+        try:
+            raise ValueError('bad value')
+        except ValueError:
+            handler.handle(_record(logging.ERROR, 'failed', exc_info=True))
+
+        handler.close()
+
+        with open(path) as log_file:
+            entry = json.loads(log_file.readline())
+
+        self.assertEqual(entry['message'], 'failed')
+        self.assertIn('ValueError: bad value', entry['exception'])
+
+    def test_records_sampled_before_formatting(self):
+        formatted = []
+
+        class Argument:
+            def __str__(self):
+                formatted.append(self)
+                return 'argument'
+
+        queue = Queue(2)
+        handler = SamplingQueueHandler(
+            queue, _IdleListener, sample_above=0.5, sample_rate=0.0)
+
+        for _ in range(5):
+            record = _record(message='%s')
+            record.args = (Argument(),)
+            handler.handle(record)
+
+        self.assertEqual(handler.sampled, 4)
+        self.assertEqual(len(formatted), 1)
+        self.assertEqual(queue.get().getMessage(), 'argument')
+
+    def test_listener_started_in_each_process(self):
+        _IdleListener.started = 0
+        handler = SamplingQueueHandler(Queue(10), _IdleListener)
+        handler.handle(_record())
+        handler.handle(_record())
+
+        self.assertEqual(_IdleListener.started, 1)
+
+        # As seen by a forked worker.
+        handler._pid = os.getpid() + 1
+        handler.handle(_record())
+
+        self.assertEqual(_IdleListener.started, 2)
+
+    def test_only_pipeline_handles_app_logs(self):
+        handlers = seclopzapi.app.logger.handlers
+
+        self.assertEqual(len(handlers), 1)
+        self.assertIsInstance(handlers[0], SamplingQueueHandler)
+
+    def test_request_ids(self):
+        client = seclopzapi.app.test_client()
+        rv = client.get('/', headers={'X-Request-ID': 'req-1'})
+
+        self.assertEqual(rv.headers['X-Request-ID'], 'req-1')
+        self.assertNotEqual(client.get('/').headers['X-Request-ID'], '')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,9 @@
+import importlib
+import os
 import unittest
 
 import seclopzapi
+from seclopzapi import caching
 
 
 class SeclopzapiTestCase(unittest.TestCase):
@@ -12,6 +15,66 @@ class SeclopzapiTestCase(unittest.TestCase):
         rv = self.app.get('/')
         self.assertIn('Welcome to seclopz-api', rv.data.decode())
 
+    def test_index_cacheable(self):
+        rv = self.app.get('/')
+        self.assertEqual(rv.status_code, 200)
+        self.assertIsNotNone(rv.headers.get('ETag'))
+        self.assertIn('max-age=300', rv.headers['Cache-Control'])
+        self.assertIn('public', rv.headers['Cache-Control'])
+
+    def test_index_not_modified(self):
+        etag = self.app.get('/').headers['ETag']
+        rv = self.app.get('/', headers={'If-None-Match': etag})
+        self.assertEqual(rv.status_code, 304)
+        self.assertEqual(rv.data, b'')
+
+        rv = self.app.get('/', headers={'If-None-Match': '"stale"'})
+        self.assertEqual(rv.status_code, 200)
+
+    def test_index_rendered_once(self):
+        caching._rendered.clear()
+        self.app.get('/')
+        self.app.get('/')
+        self.assertEqual(len(caching._rendered), 1)
+
+    def test_static_cacheable(self):
+        rv = self.app.get('/static/styles.css')
+        self.assertIn('max-age=3600', rv.headers['Cache-Control'])
+        self.assertIsNotNone(rv.headers.get('ETag'))
+        etag = rv.headers['ETag']
+        rv.close()
+
+        rv = self.app.get('/static/styles.css',
+                          headers={'If-None-Match': etag})
+        self.assertEqual(rv.status_code, 304)
+        rv.close()
+
+
+class ServingTestCase(unittest.TestCase):
+
+    def test_wsgi_entry_point(self):
+        from seclopzapi import wsgi
+        self.assertIs(wsgi.application, seclopzapi.app)
+
+    def test_gunicorn_settings_from_environment(self):
+        os.environ['SECLOPZAPI_WORKERS'] = '3'
+        os.environ['SECLOPZAPI_BIND'] = '0.0.0.0:9000'
+        os.environ['SECLOPZAPI_GRACEFUL_TIMEOUT'] = '5'
+
+        try:
+            from seclopzapi import gunicorn_conf
+            conf = importlib.reload(gunicorn_conf)
+        finally:
+            del os.environ['SECLOPZAPI_WORKERS']
+            del os.environ['SECLOPZAPI_BIND']
+            del os.environ['SECLOPZAPI_GRACEFUL_TIMEOUT']
+
+        self.assertEqual(conf.workers, 3)
+        self.assertEqual(conf.bind, '0.0.0.0:9000')
+        self.assertEqual(conf.timeout, 30)
+        self.assertEqual(conf.graceful_timeout, 5)
+        self.assertTrue(conf.preload_app)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,71 @@
+'''Benchmark of classifying archived messages in a batch, comparing
+`CompiledParser.parse_many` and `Dispatcher.classify_many` to handling one
+message at a time.
+
+Run with `python -m benchmarks.batch` from the `seclopzbot` directory.
+'''
+
+import random
+import time
+from typing import Callable
+
+from benchmarks import grammars
+from benchmarks.dispatch import synthetic_commands
+from nli import Dispatcher, compile_parser
+from nli.parser import ParseError
+
+
+def _time(run: Callable[[], object], repeat: int = 3) -> float:
+    best = float('inf')
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+def _parse_each(compiled, messages):
+    results = []
+
+    for message in messages:
+        try:
+            results.append(compiled.parse(message))
+        except ParseError as err:
+            results.append(err)
+
+    return results
+
+
+def _classify_each(dispatcher, messages):
+    return [next(dispatcher.matches(message), None) for message in messages]
+
+
+def main():
+    rng = random.Random(0)
+    messages = grammars.chat_messages(10000, rng)
+
+    print(f'{"":<24} {"each us/msg":>12} {"batch us/msg":>13} {"speedup":>8}')
+
+    for (name, parser) in [
+            ('new-hires', grammars.new_hire_parser()),
+            ('cargo', grammars.cargo_parser()),
+            ('synthetic-200x10', grammars.synthetic_parser(200, 10))]:
+        compiled = compile_parser(parser)
+        each = _time(lambda: _parse_each(compiled, messages))
+        batch = _time(lambda: compiled.parse_many(messages))
+
+        print(f'{"parse " + name:<24} {each / len(messages) * 1e6:>12.2f} '
+              f'{batch / len(messages) * 1e6:>13.2f} {each / batch:>7.1f}x')
+
+    dispatcher = Dispatcher(synthetic_commands(50, 10))
+    each = _time(lambda: _classify_each(dispatcher, messages), 1)
+    batch = _time(lambda: dispatcher.classify_many(messages), 1)
+
+    print(f'{"classify 50 commands":<24} {each / len(messages) * 1e6:>12.2f} '
+          f'{batch / len(messages) * 1e6:>13.2f} {each / batch:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+'''Benchmark of how message throughput scales with the number of processes
+consuming from a shared `Broker`.
+
+    python -m benchmarks.broker_scaling --processes 1,2,4 --messages 2000
+
+Each process dispatches the messages it claims to a few hundred synthetic
+commands, as a bot with a large command set would.  Messages are spread over
+`--channels` channels, which limits how many can be handled at once.  Run from
+the `seclopzbot` directory.
+'''
+
+import multiprocessing
+import os
+from queue import Queue
+import random
+import tempfile
+from threading import Thread
+import time
+
+import click
+
+from benchmarks import grammars
+from benchmarks.dispatch import synthetic_commands
+from bot import Broker, Message
+from nli import Dispatcher
+
+
+def _consume(path: str, commands: int, workers: int, started):
+    dispatcher = Dispatcher(synthetic_commands(commands, 10))
+    broker = Broker(path)
+    terminate = Queue()
+
+    def until_empty():
+        while broker.qsize() > 0:
+            time.sleep(0.005)
+
+        terminate.put(True)
+
+    started.wait()
+    Thread(target=until_empty, daemon=True).start()
+    broker.consume(
+            lambda message: dispatcher.dispatch(message.text),
+            workers,
+            terminate,
+            poll=0.005)
+
+
+def run(processes: int, messages, channels: int, commands: int,
+        workers: int) -> float:
+    '''Queue every message, then time `processes` processes consuming them.
+    Returns the messages handled per second.
+    '''
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'queue.sqlite3')
+        broker = Broker(path)
+
+        for (i, text) in enumerate(messages):
+            broker.put_nowait(Message(f'C{i % channels}', text))
+
+        context = multiprocessing.get_context('spawn')
+        started = context.Event()
+        consumers = [
+            context.Process(
+                target=_consume, args=(path, commands, workers, started))
+            for _ in range(processes)
+        ]
+
+        for consumer in consumers:
+            consumer.start()
+
+        # Give every process time to import and build its commands first.
+        time.sleep(2)
+        start = time.perf_counter()
+        started.set()
+
+        for consumer in consumers:
+            consumer.join()
+
+        return len(messages) / (time.perf_counter() - start)
+
+
+@click.command()
+@click.option('--processes', default='1,2,4', help='Process counts to try.')
+@click.option('--messages', default=2000, help='Messages to queue.')
+@click.option('--channels', default=64, help='Channels to spread them over.')
+@click.option('--commands', default=300, help='Synthetic commands.')
+@click.option('--workers', default=2, help='Threads in each process.')
+def main(processes, messages, channels, commands, workers):
+    texts = grammars.chat_messages(messages, random.Random(0))
+    print(f'{os.cpu_count()} CPUs')
+
+    for count in [int(p) for p in processes.split(',')]:
+        rate = run(count, texts, channels, commands, workers)
+        print(f'{count:>3} processes {rate:>10.0f} messages/s')
+
+
+if __name__ == '__main__':
+    main()
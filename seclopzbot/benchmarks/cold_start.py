@@ -0,0 +1,78 @@
+'''Benchmark of the time a new bot process takes to reply to its first
+message, checked against a target.
+
+    python -m benchmarks.cold_start --runs 10 --target-ms 250
+
+Each run starts a fresh Python process which builds a `Bot` and answers one
+message, and the time from starting the process to the reply being ready is
+measured.  Exits with a non-zero status if the median run misses the target.
+Run from the `seclopzbot` directory.
+'''
+
+import subprocess
+import sys
+import time
+
+import click
+
+from benchmarks.stats import percentile
+
+
+_FIRST_REPLY = '''
+import sys
+
+from bot import Bot, Config
+
+conf = Config(['general'], ['https://example.com'])
+bot = Bot('token', conf)
+bot.warm()
+bot.respond_to_message('is there a guide for new hires?')
+sys.stdout.write('ready')
+sys.stdout.flush()
+'''
+
+
+def first_reply_seconds() -> float:
+    '''Start a bot process and time how long it takes to answer a message.
+    '''
+
+    start = time.perf_counter()
+    process = subprocess.Popen(
+            [sys.executable, '-c', _FIRST_REPLY],
+            stdout=subprocess.PIPE)
+
+    if process.stdout.read(5) != b'ready':
+        raise RuntimeError('The bot process failed to reply.')
+
+    elapsed = time.perf_counter() - start
+    process.wait()
+    return elapsed
+
+
+def interpreter_seconds() -> float:
+    '''Time starting a Python process that does nothing, for comparison.
+    '''
+
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', 'pass'], check=True)
+    return time.perf_counter() - start
+
+
+@click.command()
+@click.option('--runs', default=10, help='Processes to start.')
+@click.option('--target-ms', default=250.0, help='Allowed median in ms.')
+def main(runs, target_ms):
+    baseline = [interpreter_seconds() for _ in range(runs)]
+    replies = [first_reply_seconds() for _ in range(runs)]
+    median = percentile(replies, 50) * 1e3
+
+    print(f'python startup   p50 {percentile(baseline, 50) * 1e3:>8.1f}ms')
+    print(f'first reply      p50 {median:>8.1f}ms '
+          f'max {max(replies) * 1e3:>8.1f}ms (target {target_ms:.0f}ms)')
+
+    if median > target_ms:
+        sys.exit(f'First reply took {median:.1f}ms, over {target_ms:.0f}ms.')
+
+
+if __name__ == '__main__':
+    main()
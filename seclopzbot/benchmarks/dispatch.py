@@ -0,0 +1,89 @@
+'''Benchmark of dispatching messages to many commands, comparing the
+`Dispatcher` to calling `Command.execute` on each command in turn.
+
+Run with `python -m benchmarks.dispatch` from the `seclopzbot` directory.
+'''
+
+import random
+import time
+from typing import Callable, List
+
+from benchmarks import grammars
+from nli import Command, Dispatcher
+from nli.command import CmdError
+from nli.parser import ParseError
+
+
+def synthetic_commands(count: int, length: int) -> List[Command]:
+    '''`count` commands, each accepting one chain of a synthetic grammar.
+    '''
+
+    return [
+        Command(
+            name=f'synthetic-{c}',
+            help='',
+            format='',
+            callback=lambda args: 'ok',
+            parser=grammars.chain_parser(c, length))
+        for c in range(count)
+    ]
+
+
+def _execute_each(commands: List[Command]) -> Callable[[str], str]:
+    def respond(message):
+        for command in commands:
+            try:
+                return command.execute(message)
+            except (CmdError, ParseError):
+                continue
+
+        return None
+
+    return respond
+
+
+def _time(respond: Callable[[str], str], messages: List[str]) -> float:
+    best = float('inf')
+
+    for _ in range(3):
+        start = time.perf_counter()
+
+        for message in messages:
+            respond(message)
+
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+def main():
+    rng = random.Random(0)
+    length = 5
+
+    print(f'{"commands":>8} {"execute us":>12} {"dispatch us":>12} '
+          f'{"speedup":>9}')
+
+    for count in [1, 10, 50, 100, 200]:
+        commands = synthetic_commands(count, length)
+        dispatcher = Dispatcher(commands)
+        messages = grammars.chat_messages(250, rng) + [
+            grammars.synthetic_message(count, length, rng)
+            for _ in range(250)
+        ]
+
+        for message in messages:
+            outcome = dispatcher.dispatch(message)
+            expected = _execute_each(commands)(message)
+            assert expected == (outcome and outcome.message), message
+
+        each = _time(_execute_each(commands), messages)
+        dispatched = _time(
+                lambda message: dispatcher.dispatch(message), messages)
+        per_msg = 1e6 / len(messages)
+
+        print(f'{count:>8} {each * per_msg:>12.2f} '
+              f'{dispatched * per_msg:>12.2f} {each / dispatched:>8.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,368 @@
+'''End-to-end load test of the whole bot: the webhook, the message queue, the
+responders, `Bot.respond_later` and the post back to Slack.
+
+Starts `seclopz-bot.py` in a subprocess, configured to post to a `StubSlack`
+server in this process, and sends it a mix of messages that do and do not
+invoke commands, arriving as a Poisson process, in bursts or at a steady
+rate.  Each message's latency is measured from sending it to the webhook to
+its reply reaching the stub, and the bot's queue depth is sampled from its
+`/metrics` endpoint throughout.
+
+Messages are spread over `--channels` channels, each sent over a single
+connection so that a channel's replies, which the bot posts in order, can be
+matched to the messages sent to it.  Only messages invoking a command are
+answered, as the bot leaves other chatter alone, and messages the webhook
+fails to accept are left out.  `mismatched` counts replies that were not the
+kind expected for the message matched to them, as when replies are posted
+out of order or chatter is answered.
+
+Run with `python -m benchmarks.end_to_end --help` from the `seclopzbot`
+directory.
+'''
+
+import http.client
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+from threading import Event, Thread
+import time
+from typing import Dict, List, Optional, Tuple
+
+import click
+
+from benchmarks import grammars
+from benchmarks.stats import latency_summary
+from bot.stub_slack import StubSlack
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+INVOKING = [
+    'seclopzbot hi! I\'m a new hire.',
+    'seclopzbot is there a guide for new hires?',
+    'new hires',
+]
+
+_LINK = 'https://example.com/new-hire-guide'
+
+
+def arrivals(
+        pattern: str,
+        rate: float,
+        count: int,
+        burst: int,
+        rng: random.Random) -> List[float]:
+    '''The times, in seconds from the start, at which to send `count`
+    messages averaging `rate` per second.
+
+        * `'poisson'` spaces messages by exponentially distributed gaps.
+        * `'burst'` sends `burst` messages at once every `burst / rate`
+        seconds.
+        * `'steady'` spaces messages evenly.
+    '''
+
+    if pattern == 'poisson':
+        times = []
+        now = 0.0
+
+        for _ in range(count):
+            now += rng.expovariate(rate)
+            times.append(now)
+
+        return times
+
+    if pattern == 'burst':
+        return [(n // burst) * burst / rate for n in range(count)]
+
+    return [n / rate for n in range(count)]
+
+
+def _payload(n: int, channel: str, text: str) -> bytes:
+    return json.dumps({
+        'type': 'event_callback',
+        'event_id': f'EvLoad{n}',
+        'event': {
+            'type': 'message',
+            'channel': channel,
+            'user': 'U1001',
+            'text': text,
+            'ts': f'{n}.000000',
+        },
+    }).encode()
+
+
+def _sender(
+        port: int,
+        start: float,
+        events: List[Tuple[float, int, bytes]],
+        sent: Dict[int, float],
+        errors: Dict[int, int]):
+    connection = http.client.HTTPConnection('127.0.0.1', port)
+    headers = {'Content-Type': 'application/json'}
+
+    for (offset, n, body) in events:
+        delay = start + offset - time.monotonic()
+
+        if delay > 0:
+            time.sleep(delay)
+
+        sent[n] = time.monotonic()
+
+        try:
+            connection.request('POST', '/', body, headers)
+            response = connection.getresponse()
+            response.read()
+
+            if response.status != 200:
+                errors[n] = response.status
+        except (OSError, http.client.HTTPException):
+            errors[n] = 0
+            connection.close()
+            connection = http.client.HTTPConnection('127.0.0.1', port)
+
+    connection.close()
+
+
+def _queue_depths(port: int) -> Optional[Dict[str, float]]:
+    # The depths of the bot's message and send queues, scraped from its
+    # metrics.
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+
+    try:
+        connection.request('GET', '/metrics')
+        body = connection.getresponse().read().decode()
+    except (OSError, http.client.HTTPException):
+        return None
+    finally:
+        connection.close()
+
+    depths = {}
+
+    for line in body.splitlines():
+        for queue in ['message', 'send']:
+            if line.startswith(f'seclopzbot_{queue}_queue_depth '):
+                depths[queue] = float(line.split()[1])
+
+    return depths if 'message' in depths else None
+
+
+def _sample_depths(
+        port: int,
+        interval: float,
+        start: float,
+        stop: Event,
+        samples: List[Tuple[float, float, float]]):
+    while not stop.wait(interval):
+        depths = _queue_depths(port)
+
+        if depths is not None:
+            samples.append((
+                round(time.monotonic() - start, 3),
+                depths['message'],
+                depths.get('send', 0.0)))
+
+
+def _start_bot(
+        directory: str,
+        port: int,
+        slack: StubSlack,
+        options: Dict) -> subprocess.Popen:
+    config_path = os.path.join(directory, 'config.json')
+
+    with open(config_path, 'w') as cfg_file:
+        json.dump({
+            'channels': ['load'],
+            'new_hire_links': [_LINK],
+            'slack_api_url': slack.url,
+            'coalesce_replies': False,
+            'command_entry_points': False,
+            'reload_interval': 0,
+            'broker_path': os.path.join(directory, 'queue.sqlite3'),
+            'table_cache': os.path.join(directory, 'tables'),
+            **options,
+        }, cfg_file)
+
+    env = dict(
+            os.environ,
+            SECLOPZ_CONFIG=config_path,
+            SECLOPZ_PORT=str(port),
+            SLACK_TOKEN='xoxb-load-test')
+
+    return subprocess.Popen(
+            [sys.executable, 'seclopz-bot.py'],
+            cwd=ROOT,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL)
+
+
+def _stop_bot(bot: subprocess.Popen):
+    bot.send_signal(signal.SIGINT)
+
+    try:
+        bot.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        bot.kill()
+        bot.wait()
+
+
+@click.command()
+@click.option('--port', default=5055, help='Port to serve the bot on.')
+@click.option('--pattern', default='poisson',
+              type=click.Choice(['poisson', 'burst', 'steady']))
+@click.option('--rate', default=200.0, help='Average messages per second.')
+@click.option('--duration', default=10.0, help='Seconds to send for.')
+@click.option('--burst', default=50, help='Messages per burst.')
+@click.option('--invoking', default=0.3,
+              help='Fraction of messages that invoke a command.')
+@click.option('--channels', default=50, help='Channels to spread over.')
+@click.option('--workers', default=4, help='Responder threads.')
+@click.option('--processes', default=1, help='Responder processes.')
+@click.option('--slack-rate', default=1000.0,
+              help='Messages per second the bot may post to each channel.')
+@click.option('--slack-latency', default=0.0,
+              help='Seconds the stub Slack takes to answer.')
+@click.option('--drain-timeout', default=30.0,
+              help='Seconds to wait for replies after sending.')
+@click.option('--sample-interval', default=0.25,
+              help='Seconds between queue depth samples.')
+@click.option('--seed', default=0)
+def main(port, pattern, rate, duration, burst, invoking, channels, workers,
+         processes, slack_rate, slack_latency, drain_timeout,
+         sample_interval, seed):
+    rng = random.Random(seed)
+    count = int(rate * duration)
+    times = arrivals(pattern, rate, count, burst, rng)
+    chatter = [
+        message for message in grammars.CHAT
+        if 'new hire' not in message
+    ]
+
+    slack = StubSlack(latency=slack_latency)
+    slack.start()
+    directory = tempfile.TemporaryDirectory()
+    bot = _start_bot(directory.name, port, slack, {
+        'workers': workers,
+        'processes': processes,
+        'send_rate': slack_rate,
+        'send_burst': max(3, int(slack_rate)),
+        'send_connections': max(4, workers),
+    })
+
+    try:
+        deadline = time.monotonic() + 30
+
+        while _queue_depths(port) is None:
+            if bot.poll() is not None or time.monotonic() > deadline:
+                raise click.ClickException('The bot failed to start.')
+
+            time.sleep(0.1)
+
+        # Messages to each channel, in the order they are sent, and whether
+        # each invokes a command.
+        sequences: Dict[str, List[Tuple[int, bool]]] = {}
+        per_connection: List[List[Tuple[float, int, bytes]]] =\
+                [[] for _ in range(channels)]
+
+        for (n, offset) in enumerate(times):
+            c = rng.randrange(channels)
+            channel = f'C{c:04d}'
+            invokes = rng.random() < invoking
+            text = rng.choice(INVOKING if invokes else chatter)
+            sequences.setdefault(channel, []).append((n, invokes))
+            per_connection[c].append((offset, n, _payload(n, channel, text)))
+
+        sent: Dict[int, float] = {}
+        errors: Dict[int, int] = {}
+        samples: List[Tuple[float, float, float]] = []
+        stop = Event()
+        start = time.monotonic() + 0.5
+        sampler = Thread(
+                target=_sample_depths,
+                args=(port, sample_interval, start, stop, samples),
+                daemon=True)
+        senders = [
+            Thread(target=_sender, args=(port, start, events, sent, errors))
+            for events in per_connection if events
+        ]
+
+        sampler.start()
+
+        for thread in senders:
+            thread.start()
+
+        for thread in senders:
+            thread.join()
+
+        sending_ended = time.monotonic()
+        deadline = sending_ended + drain_timeout
+
+        expected = sum(
+            1 for sequence in sequences.values()
+            for (n, invokes) in sequence if invokes and n not in errors)
+
+        while time.monotonic() < deadline:
+            if len(slack.posted()) >= expected:
+                break
+
+            time.sleep(0.1)
+
+        stop.set()
+        sampler.join()
+    finally:
+        _stop_bot(bot)
+        slack.stop()
+        directory.cleanup()
+
+    latencies = []
+    mismatched = 0
+    last_reply = start
+
+    replies: Dict[str, List] = {}
+
+    for post in slack.posted():
+        replies.setdefault(post.params.get('channel'), []).append(post)
+
+    for (channel, sequence) in sequences.items():
+        answered = [
+            n for (n, invokes) in sequence if invokes and n not in errors
+        ]
+        posts = replies.get(channel, [])
+        mismatched += max(0, len(posts) - len(answered))
+
+        for (n, post) in zip(answered, posts):
+            if _LINK not in post.params['text']:
+                mismatched += 1
+
+            latencies.append(post.received - sent[n])
+            last_reply = max(last_reply, post.received)
+
+    report = {
+        'pattern': pattern,
+        'sent': count,
+        'errors': len(errors),
+        'replied': len(latencies),
+        'mismatched': mismatched,
+        'offered_per_second': count / duration,
+        'throughput_per_second':
+            len(latencies) / max(last_reply - start, 1e-9),
+        'seconds_to_drain': max(0.0, last_reply - sending_ended),
+        **latency_summary(latencies),
+        'max_message_queue_depth':
+            max((sample[1] for sample in samples), default=0),
+        'max_send_queue_depth':
+            max((sample[2] for sample in samples), default=0),
+        # Seconds from the start of sending, message queue depth and send
+        # queue depth.
+        'queue_depths': samples,
+    }
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
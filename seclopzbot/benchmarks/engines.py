@@ -0,0 +1,82 @@
+'''Side-by-side benchmark of `Parser.parse` and `CompiledParser.parse`.
+
+Run with `python -m benchmarks.engines` from the `seclopzbot` directory.
+'''
+
+import random
+import time
+from typing import Callable, List
+
+from benchmarks import grammars
+from nli import Parser, compile_parser
+from nli.parser import ParseError
+
+
+def _outcome(parse: Callable, message: str):
+    try:
+        return parse(message)
+    except ParseError as err:
+        return (err.state, err.stack, err.tokens)
+
+
+def _time(parse: Callable, messages: List[str], repeat: int) -> float:
+    best = float('inf')
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+
+        for message in messages:
+            try:
+                parse(message)
+            except ParseError:
+                pass
+
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+def compare(name: str, parser: Parser, messages: List[str], repeat: int = 5):
+    compiled = compile_parser(parser)
+
+    for message in messages:
+        assert _outcome(parser.parse, message) ==\
+                _outcome(compiled.parse, message), message
+
+    linear = _time(parser.parse, messages, repeat)
+    indexed = _time(compiled.parse, messages, repeat)
+    per_msg = 1e6 / len(messages)
+
+    print(f'{name:<24} {len(parser.transitions):>6} '
+          f'{linear * per_msg:>12.2f} {indexed * per_msg:>12.2f} '
+          f'{linear / indexed:>8.2f}x')
+
+
+def main():
+    rng = random.Random(0)
+
+    print(f'{"grammar":<24} {"txs":>6} {"parser us":>12} '
+          f'{"compiled us":>12} {"speedup":>9}')
+    compare(
+        'new-hires',
+        grammars.new_hire_parser(),
+        grammars.chat_messages(2000, rng))
+    compare(
+        'cargo',
+        grammars.cargo_parser(),
+        grammars.chat_messages(2000, rng))
+
+    for (chains, length) in [(10, 5), (50, 10), (100, 10)]:
+        messages = [
+            grammars.synthetic_message(chains, length, rng)
+            for _ in range(100)
+        ]
+        compare(
+            f'synthetic {chains}x{length}',
+            grammars.synthetic_parser(chains, length),
+            messages,
+            repeat=3)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+'''Benchmark of parsing messages that are not accepted, as almost every
+message in a channel is not, comparing catching a `ParseError` to checking
+the result of `try_parse`.
+
+Run with `python -m benchmarks.failures` from the `seclopzbot` directory.
+'''
+
+import random
+import time
+from typing import Callable, List
+
+from benchmarks import grammars
+from nli import compile_parser
+from nli.parser import ParseError, ParseFailure
+
+
+def _time(run: Callable[[str], object], messages: List[str]) -> float:
+    best = float('inf')
+
+    for _ in range(10):
+        start = time.perf_counter()
+
+        for message in messages:
+            run(message)
+
+        best = min(best, time.perf_counter() - start)
+
+    return best / len(messages)
+
+
+def main():
+    messages = grammars.chat_messages(5000, random.Random(0))
+    compiled = compile_parser(grammars.cargo_parser())
+
+    def eager(message):
+        # `ParseError` formatted its message when created, before it was
+        # formatted lazily.
+        try:
+            return compiled.parse(message)
+        except ParseError as err:
+            str(err)
+            return None
+
+    def lazy(message):
+        try:
+            return compiled.parse(message)
+        except ParseError:
+            return None
+
+    def result(message):
+        args = compiled.try_parse(message)
+        return None if isinstance(args, ParseFailure) else args
+
+    for (name, run) in [
+            ('try_parse', result),
+            ('parse, lazy message', lazy),
+            ('parse, eager message', eager)]:
+        print(f'{name:<24} {_time(run, messages) * 1e6:>8.2f}us/message')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+'''Grammars and inputs shared by the benchmarks.
+'''
+
+import random
+from typing import List
+
+from commands import new_hire
+from nli import Parser, Transition
+
+
+def new_hire_parser() -> Parser:
+    '''The parser for the `new-hires` command.
+    '''
+
+    return new_hire(['https://example.com']).parser
+
+
+def cargo_parser() -> Parser:
+    '''The cargo-style grammar from `nli/test_parser.py`.
+
+    cargo new [binary | lib] [using [rust | edition] <edition>]
+    (called | named) <name>
+    '''
+
+    return Parser(
+        start='start',
+        end='end',
+        transitions=[
+            Transition(fr='start', to='cargo', match='cargo'),
+            Transition(fr='cargo', to='new', match='new'),
+            Transition(fr='new', to='binlib', match='(binary|lib)'),
+            Transition(fr='new', to='using', match='using'),
+            Transition(fr='new', to='called', match='(called|named)'),
+            Transition(fr='binlib', to='using', match='using'),
+            Transition(fr='using', to='edition', match='(Rust|edition)'),
+            Transition(
+                fr='edition', to='called', match='\\d{4}', param='edition'),
+            Transition(fr='called', to='name', match='(called|named)'),
+            Transition(fr='name', to='end', match='.*', param='name')
+        ])
+
+
+def _chain(c: int, length: int) -> List[Transition]:
+    transitions = []
+    previous = 'start'
+
+    for w in range(length):
+        state = f'c{c}s{w}'
+        transitions.append(
+            Transition(fr=previous, to=state, match=f'c{c}w{w}'))
+        previous = state
+
+    transitions.append(
+        Transition(fr=previous, to='end', match='.*', param=f'c{c}'))
+
+    return transitions
+
+
+def chain_parser(c: int, length: int) -> Parser:
+    '''A parser accepting the words `c{c}w0 c{c}w1 ... c{c}w{length - 1}`
+    followed by a parameter.
+    '''
+
+    return Parser(start='start', end='end', transitions=_chain(c, length))
+
+
+def synthetic_parser(chains: int, length: int) -> Parser:
+    '''A large parser made of `chains` keyword sequences of `length` words
+    each, all leaving the start state, as accepted by `chain_parser`.
+    '''
+
+    transitions = []
+
+    for c in range(chains):
+        transitions.extend(_chain(c, length))
+
+    return Parser(start='start', end='end', transitions=transitions)
+
+
+def synthetic_message(chains: int, length: int, rng: random.Random) -> str:
+    '''A message accepted by one of the chains of a `synthetic_parser`.
+    '''
+
+    c = rng.randrange(chains)
+    words = [f'c{c}w{w}' for w in range(length)]
+
+    return ' '.join(words + ['value'])
+
+
+CHAT = [
+    'hi! I\'m a new hire.',
+    'is there a guide for new hires?',
+    'cargo new lib using Rust 2018 named test',
+    'cargo new binary called demo',
+    'does anyone know why the build is red again?',
+    'lunch in 10 minutes, who is in?',
+    'I pushed a fix for the flaky test, can someone review it please',
+    'Traceback (most recent call last): File "app.py", line 12, in <module>',
+]
+
+
+def chat_messages(count: int, rng: random.Random) -> List[str]:
+    '''A list of `count` chat messages drawn from a small sample of realistic
+    messages, some of which invoke commands.
+    '''
+
+    return [rng.choice(CHAT) for _ in range(count)]
@@ -0,0 +1,40 @@
+'''Benchmark of the overhead of timing the steps of responding to messages.
+
+Run with `python -m benchmarks.instrumentation` from the `seclopzbot`
+directory.
+'''
+
+import random
+import time
+
+from benchmarks import grammars
+from bot import Bot, Config, Metrics
+
+
+def _time(bot: Bot, messages, repeat: int = 5) -> float:
+    best = float('inf')
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+
+        for message in messages:
+            bot.respond_to_message(message)
+
+        best = min(best, time.perf_counter() - start)
+
+    return best / len(messages)
+
+
+def main():
+    messages = grammars.chat_messages(5000, random.Random(0))
+    conf = Config(['general'], ['https://example.com'])
+    disabled = _time(Bot('token', conf, Metrics(enabled=False)), messages)
+    enabled = _time(Bot('token', conf, Metrics(enabled=True)), messages)
+
+    print(f'disabled {disabled * 1e6:8.2f} us/message')
+    print(f'enabled  {enabled * 1e6:8.2f} us/message '
+          f'({enabled / disabled - 1:+.1%})')
+
+
+if __name__ == '__main__':
+    main()
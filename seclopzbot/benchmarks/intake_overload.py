@@ -0,0 +1,114 @@
+'''Stress test of message intake under sustained overload, comparing each
+`BoundedIntake` policy to an unbounded `Queue`.
+
+Messages arrive ten times faster than a responder takes them, and the memory
+held by the intake, its depth and how long commands wait are reported every
+second.
+
+Run with `python -m benchmarks.intake_overload` from the `seclopzbot`
+directory.
+'''
+
+from array import array
+from queue import Empty, Full, Queue
+import random
+from threading import Event, Thread
+import time
+import tracemalloc
+
+from benchmarks import grammars
+from benchmarks.stats import percentile
+from bot.intake import BoundedIntake
+from bot.slackbot import Message
+
+
+ARRIVALS_PER_SECOND = 20000
+TAKEN_PER_SECOND = 2000
+SECONDS = 5
+
+
+def _respond(intake, stop: Event, waits: array, taken: list):
+    # Waits are written into an array allocated up front, so that recording
+    # them does not count towards the memory held.
+    interval = 1 / TAKEN_PER_SECOND
+    next_take = time.monotonic()
+
+    while not stop.is_set():
+        try:
+            message = intake.get(timeout=0.1)
+        except Empty:
+            continue
+
+        if message.text.startswith('seclopzbot') and taken[0] < len(waits):
+            waits[taken[0]] = time.monotonic() - message.received
+            taken[0] += 1
+
+        next_take += interval
+        delay = next_take - time.monotonic()
+
+        if delay > 0:
+            time.sleep(delay)
+
+
+def _run(name, intake):
+    rng = random.Random(0)
+    chatter = grammars.chat_messages(1000, rng)
+    stop = Event()
+    waits = array('d', [0.0]) * (TAKEN_PER_SECOND * (SECONDS + 1))
+    taken = [0]
+    responder = Thread(target=_respond, args=(intake, stop, waits, taken))
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    responder.start()
+    start = time.monotonic()
+    sent = 0
+    report = []
+
+    for second in range(1, SECONDS + 1):
+        while time.monotonic() - start < second:
+            for _ in range(100):
+                text = 'seclopzbot new hire' if sent % 20 == 0 else\
+                        chatter[sent % len(chatter)]
+
+                try:
+                    intake.put(Message(f'C{sent % 50}', text))
+                except Full:
+                    pass
+
+                sent += 1
+
+            target = start + sent / ARRIVALS_PER_SECOND
+            delay = target - time.monotonic()
+
+            if delay > 0:
+                time.sleep(delay)
+
+        held = tracemalloc.get_traced_memory()[0] - baseline
+        report.append(f'{held / 1024:>8.0f}K/{intake.qsize():<6}')
+
+    stop.set()
+    responder.join()
+    tracemalloc.stop()
+    waits = waits[:taken[0]]
+
+    print(f'{name:<12} {" ".join(report)} '
+          f'{percentile(waits, 50) * 1e3:>9.1f} '
+          f'{percentile(waits, 99) * 1e3:>9.1f}')
+
+
+def main():
+    print(f'{"intake":<12} {"memory/depth each second":<{16 * SECONDS - 1}} '
+          f'{"p50 ms":>9} {"p99 ms":>9}')
+
+    def is_command(text):
+        return text.startswith('seclopzbot')
+
+    _run('unbounded', Queue())
+
+    for policy in ['block', 'drop_oldest', 'reject']:
+        _run(policy, BoundedIntake(
+                1000, policy, is_command, timeout=0.001))
+
+
+if __name__ == '__main__':
+    main()
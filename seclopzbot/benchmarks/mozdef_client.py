@@ -0,0 +1,151 @@
+'''Benchmark of the `MozDefClient` against a `StubMozDef` server that takes a
+few milliseconds to answer each request, as MozDef would over a network.
+
+Threads standing in for the bot's callbacks add notes to, change the status
+of and look up a handful of investigations, first with a client that opens a
+new connection for every operation, then with a `MozDefClient` keeping as
+many connections alive as there are threads, and then only its default four,
+batching changes and caching lookups in turn.  The throughput, operation
+latencies and number of requests and connections MozDef had to answer are
+reported for each.
+
+Run with `python -m benchmarks.mozdef_client` from the `seclopzbot`
+directory.
+'''
+
+from concurrent.futures import ThreadPoolExecutor
+import http.client
+import json
+import random
+import time
+from typing import Callable, List, Tuple
+from urllib.parse import urlparse
+
+from benchmarks.stats import latency_summary
+from commands.mozdef import MozDefClient
+from commands.stub_mozdef import StubMozDef
+
+
+LATENCY = 0.005
+CONNECT_LATENCY = 0.010
+THREADS = 32
+OPERATIONS = 2000
+INVESTIGATIONS = 20
+
+
+class _Unpooled:
+    # Opens a new connection for every operation and sends each change in a
+    # request of its own.
+    def __init__(self, base_url: str):
+        target = urlparse(base_url)
+        self._host = target.hostname
+        self._port = target.port
+        self._path = target.path.rstrip('/')
+
+
+    def _request(self, method: str, path: str, body=None):
+        connection = http.client.HTTPConnection(self._host, self._port)
+
+        try:
+            data = None if body is None else json.dumps(body).encode()
+            connection.request(method, f'{self._path}/{path}', data)
+            return json.loads(connection.getresponse().read())
+        finally:
+            connection.close()
+
+
+    def get(self, id: str):
+        return self._request('GET', f'investigations/{id}')
+
+
+    def add_note(self, id: str, note: str):
+        self._request('POST', 'investigations/bulk', {
+            'operations': [{'id': id, 'note': note}],
+        })
+
+
+    def set_status(self, id: str, status: str):
+        self._request('POST', 'investigations/bulk', {
+            'operations': [{'id': id, 'status': status}],
+        })
+
+
+    def close(self):
+        pass
+
+
+def _workload(rng: random.Random) -> List[Tuple[str, str]]:
+    # Mostly notes, with some lookups and a few status changes.
+    operations = []
+
+    for n in range(OPERATIONS):
+        id = str(rng.randrange(INVESTIGATIONS) + 1)
+        kind = rng.choices(['note', 'get', 'status'], [6, 3, 1])[0]
+        operations.append((kind, id))
+
+    return operations
+
+
+def _run(name: str, make_client: Callable[[str], object]):
+    mozdef = StubMozDef(LATENCY, CONNECT_LATENCY)
+    mozdef.start()
+    client = make_client(mozdef.url)
+
+    setup = MozDefClient(mozdef.url)
+
+    for n in range(INVESTIGATIONS):
+        setup.create(f'investigation {n}')
+
+    setup.close()
+
+    mozdef.requests.clear()
+    mozdef.connections = 0
+    latencies: List[float] = []
+
+    def perform(operation):
+        (kind, id) = operation
+        start = time.monotonic()
+
+        if kind == 'note':
+            client.add_note(id, f'note about {id}')
+        elif kind == 'status':
+            client.set_status(id, 'escalated')
+        else:
+            client.get(id)
+
+        latencies.append(time.monotonic() - start)
+
+    operations = _workload(random.Random(0))
+    start = time.monotonic()
+
+    with ThreadPoolExecutor(THREADS) as pool:
+        list(pool.map(perform, operations))
+
+    elapsed = time.monotonic() - start
+    client.close()
+    mozdef.stop()
+    summary = latency_summary(latencies)
+
+    print(f'{name:<24} {OPERATIONS / elapsed:>8.0f} '
+          f'{summary["p50_ms"]:>8.1f} {summary["p99_ms"]:>8.1f} '
+          f'{sum(mozdef.requests.values()):>9} {mozdef.connections:>12}')
+
+
+def main():
+    print(f'{OPERATIONS} operations from {THREADS} threads, MozDef answering '
+          f'in {LATENCY * 1e3:.0f}ms after connecting in '
+          f'{CONNECT_LATENCY * 1e3:.0f}ms\n')
+    print(f'{"client":<24} {"ops/s":>8} {"p50 ms":>8} {"p99 ms":>8} '
+          f'{"requests":>9} {"connections":>12}')
+
+    _run('new connection each', _Unpooled)
+    _run(f'{THREADS} kept alive', lambda url: MozDefClient(
+            url, THREADS, batch_size=1, cache_ttl=0))
+    _run('4 kept alive', lambda url: MozDefClient(
+            url, 4, batch_size=1, cache_ttl=0))
+    _run('4 + batching', lambda url: MozDefClient(url, 4, cache_ttl=0))
+    _run('4 + batching + cache', lambda url: MozDefClient(url, 4))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+'''Benchmark of dispatching a realistic mix of chat messages to many commands,
+with and without the `KeywordIndex` prefilter, reporting how many parser runs
+it skips.
+
+Run with `python -m benchmarks.prefilter` from the `seclopzbot` directory.
+'''
+
+import random
+import time
+from typing import List
+
+from benchmarks import grammars
+from benchmarks.dispatch import synthetic_commands
+from commands.new_hire import new_hire
+from nli import Command, Dispatcher
+
+
+_FORMATS = [
+    'seclopzbot add note to <investigation> <words...>',
+    'seclopzbot close investigation <investigation>',
+    'seclopzbot assign <investigation> to <user>',
+    'deploy <service> to (staging | production)',
+    'rollback <service> [to <version>]',
+]
+
+
+def commands(synthetic: int) -> List[Command]:
+    '''The `new-hires` command, commands compiled from a few formats and
+    `synthetic` commands each accepting one chain of a synthetic grammar.
+    '''
+
+    formatted = [
+        Command(
+            name=f'format-{i}',
+            help='',
+            format=fmt,
+            callback=lambda args: 'ok')
+        for (i, fmt) in enumerate(_FORMATS)
+    ]
+
+    return [new_hire(['https://example.com'])] + formatted +\
+            synthetic_commands(synthetic, 5)
+
+
+def main():
+    rng = random.Random(0)
+    messages = grammars.chat_messages(5000, rng) + [
+        'seclopzbot add note to 12 looks like a false positive',
+        'deploy api to staging',
+        'new hires',
+    ] * 50
+
+    print(f'{"commands":>8} {"off us/msg":>11} {"on us/msg":>10} '
+          f'{"speedup":>8} {"skipped":>8}')
+
+    for count in [0, 10, 50, 200]:
+        outcomes = {'skipped': 0, 'parsed': 0}
+
+        def count_outcome(outcome, command):
+            outcomes[outcome] += 1
+
+        cmds = commands(count)
+        on = Dispatcher(cmds, counter=count_outcome)
+        off = Dispatcher(cmds, prefilter=False)
+
+        for message in messages:
+            assert list(on.matches(message)) == list(off.matches(message))
+
+        times = {}
+
+        for (name, dispatcher) in [('off', off), ('on', on)]:
+            dispatcher.counter = None
+            best = float('inf')
+
+            for _ in range(3):
+                start = time.perf_counter()
+
+                for message in messages:
+                    dispatcher.dispatch(message)
+
+                best = min(best, time.perf_counter() - start)
+
+            times[name] = best / len(messages) * 1e6
+
+        skipped = outcomes['skipped'] / sum(outcomes.values())
+
+        print(f'{len(cmds):>8} {times["off"]:>11.2f} {times["on"]:>10.2f} '
+              f'{times["off"] / times["on"]:>7.1f}x {skipped:>8.1%}')
+
+
+if __name__ == '__main__':
+    main()
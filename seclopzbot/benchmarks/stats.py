@@ -0,0 +1,29 @@
+'''Summary statistics shared by the benchmarks.
+'''
+
+from typing import Dict, Sequence
+
+
+def percentile(values: Sequence[float], p: float) -> float:
+    '''The `p`th percentile (0 to 100) of `values`, by the nearest-rank
+    method.  `values` need not be sorted.
+    '''
+
+    if len(values) == 0:
+        return float('nan')
+
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(p / 100 * len(ordered)) - 1))
+
+    return ordered[rank]
+
+
+def latency_summary(seconds: Sequence[float]) -> Dict[str, float]:
+    '''The p50, p95 and p99 of a list of latencies in seconds, in
+    milliseconds.
+    '''
+
+    return {
+        f'p{p}_ms': percentile(seconds, p) * 1e3
+        for p in [50, 95, 99]
+    }
@@ -0,0 +1,185 @@
+'''Throughput, latency and memory benchmarks for the parsing engine, with a
+check for regressions against a saved baseline.
+
+    python -m benchmarks.suite --output results.json
+    python -m benchmarks.suite --baseline results.json --threshold 10
+
+The second run exits with a non-zero status if any grammar's throughput
+dropped, or its p50 or p99 latency rose, by more than `--threshold` percent.
+Run from the `seclopzbot` directory.
+'''
+
+import gc
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from typing import Any, Dict, List
+
+import click
+
+from benchmarks import grammars
+from benchmarks.stats import percentile
+from nli import Parser, compile_parser
+from nli.parser import ParseError, tokenize
+
+
+VERSION = 1
+
+
+def corpora(rng: random.Random) -> Dict[str, Any]:
+    '''The grammars benchmarked, each with a mix of accepted and rejected
+    messages.
+    '''
+
+    synthetic = {}
+
+    for (chains, length) in [(50, 10), (200, 10)]:
+        synthetic[f'synthetic-{chains}x{length}'] = (
+            grammars.synthetic_parser(chains, length),
+            grammars.chat_messages(500, rng) + [
+                grammars.synthetic_message(chains, length, rng)
+                for _ in range(500)
+            ])
+
+    return {
+        'new-hires': (
+            grammars.new_hire_parser(),
+            grammars.chat_messages(1000, rng)),
+        'cargo': (
+            grammars.cargo_parser(),
+            grammars.chat_messages(1000, rng)),
+        **synthetic,
+    }
+
+
+def _parse(compiled, message: str):
+    try:
+        return compiled.parse(message)
+    except ParseError:
+        return None
+
+
+def measure(parser: Parser, messages: List[str], rounds: int) -> Dict:
+    '''Benchmark a parser on a list of messages.
+
+        * `tokens_per_second` is the number of tokens parsed per second over
+        all messages.
+        * `p50_us` and `p99_us` are per-message latencies in microseconds.
+        * `peak_bytes` is the most memory allocated at once by a parse, on
+        average, as traced by `tracemalloc`.
+    '''
+
+    compiled = compile_parser(parser)
+    tokens = sum(len(tokenize(message)) for message in messages)
+    latencies = []
+    total = 0.0
+
+    gc.disable()
+
+    try:
+        for _ in range(rounds):
+            for message in messages:
+                start = time.perf_counter()
+                _parse(compiled, message)
+                elapsed = time.perf_counter() - start
+                latencies.append(elapsed)
+                total += elapsed
+    finally:
+        gc.enable()
+
+    peaks = 0
+    tracemalloc.start()
+
+    try:
+        for message in messages:
+            tracemalloc.clear_traces()
+            _parse(compiled, message)
+            (_, peak) = tracemalloc.get_traced_memory()
+            peaks += peak
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'messages': len(messages),
+        'tokens_per_second': tokens * rounds / total,
+        'p50_us': percentile(latencies, 50) * 1e6,
+        'p99_us': percentile(latencies, 99) * 1e6,
+        'peak_bytes': peaks / len(messages),
+    }
+
+
+def regressions(
+        baseline: Dict,
+        results: Dict,
+        threshold: float) -> List[str]:
+    '''Describe every measurement in `results` that is more than `threshold`
+    percent worse than in `baseline`.
+    '''
+
+    found = []
+    limit = threshold / 100
+
+    for (name, current) in results['grammars'].items():
+        before = baseline['grammars'].get(name)
+
+        if before is None:
+            continue
+
+        change = 1 - current['tokens_per_second'] / before['tokens_per_second']
+
+        if change > limit:
+            found.append(f'{name}: throughput down {change:.1%}')
+
+        for key in ['p50_us', 'p99_us']:
+            change = current[key] / before[key] - 1
+
+            if change > limit:
+                found.append(f'{name}: {key} up {change:.1%}')
+
+    return found
+
+
+@click.command()
+@click.option('--output', help='File to save results to as JSON.')
+@click.option('--baseline', help='Results to check for regressions against.')
+@click.option('--threshold', default=10.0, help='Allowed regression in %.')
+@click.option('--rounds', default=5, help='Times to parse each corpus.')
+def main(output, baseline, threshold, rounds):
+    results = {
+        'version': VERSION,
+        'python': platform.python_version(),
+        'grammars': {},
+    }
+
+    for (name, (parser, messages)) in corpora(random.Random(0)).items():
+        results['grammars'][name] = measure(parser, messages, rounds)
+        r = results['grammars'][name]
+        print(f'{name:<20} {r["tokens_per_second"]:>12.0f} tok/s '
+              f'p50 {r["p50_us"]:>8.2f}us p99 {r["p99_us"]:>8.2f}us '
+              f'peak {r["peak_bytes"]:>8.0f}B')
+
+    if output is not None:
+        with open(output, 'w') as out:
+            json.dump(results, out, indent=2)
+
+    if baseline is not None:
+        with open(baseline) as saved:
+            previous = json.load(saved)
+
+        if previous.get('version') != VERSION:
+            sys.exit(f'{baseline} was saved by a different suite version.')
+
+        found = regressions(previous, results, threshold)
+
+        for regression in found:
+            print(f'REGRESSION {regression}')
+
+        if len(found) > 0:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
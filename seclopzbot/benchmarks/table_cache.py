@@ -0,0 +1,64 @@
+'''Benchmark of loading the parsers for a set of command formats, comparing
+compiling every format to reading them from a `TableCache` file.
+
+Run with `python -m benchmarks.table_cache` from the `seclopzbot` directory.
+'''
+
+import os
+import random
+import tempfile
+import time
+from typing import List
+
+from nli import compile_parser
+from nli.format import compile_format
+from nli.tablecache import TableCache
+
+
+def synthetic_formats(count: int, rng: random.Random) -> List[str]:
+    '''Formats of similar size to real commands, each with alternatives,
+    optional words and parameters.
+    '''
+
+    words = [f'w{i}' for i in range(200)]
+    formats = []
+
+    for i in range(count):
+        (a, b, c, d, e, f) = rng.sample(words, 6)
+        formats.append(
+            f'seclopzbot cmd{i} ({a} | {b} | {c} {d}) [{e}] {f} <first> '
+            f'<rest...>')
+
+    return formats
+
+
+def _load(formats: List[str], tables=None) -> float:
+    start = time.perf_counter()
+
+    for fmt in formats:
+        compile_parser(compile_format(fmt, tables=tables))
+
+    return time.perf_counter() - start
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'tables')
+
+        for count in [10, 100, 500]:
+            formats = synthetic_formats(count, random.Random(count))
+            compiled = _load(formats)
+
+            tables = TableCache(path)
+            _load(formats, tables)
+            tables.save()
+
+            cached = _load(formats, TableCache(path))
+
+            print(f'{count:>4} formats: compiled {compiled * 1e3:>8.2f}ms '
+                  f'cached {cached * 1e3:>8.2f}ms '
+                  f'file {os.path.getsize(path) / 1024:>7.1f}KiB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+'''Benchmark of tokenizing long messages, such as pasted logs, comparing the
+original per-character filter to `iter_tokens`.
+
+Run with `python -m benchmarks.tokenize` from the `seclopzbot` directory.
+'''
+
+import string
+import time
+from typing import Callable, List
+
+from benchmarks import grammars
+from nli import compile_parser
+from nli.parser import iter_tokens, tokenize
+
+
+TRACE = '''Traceback (most recent call last):
+  File "/srv/app/worker.py", line 212, in run
+    result = handler(payload["event"], context=self.context)
+  File "/srv/app/handlers.py", line 48, in handle
+    raise ValueError(f"unexpected event type: {kind!r}")
+ValueError: unexpected event type: 'member_joined_channel'
+'''
+
+
+def filter_tokenize(input_: str) -> List[str]:
+    '''The tokenizer `Parser` used before `iter_tokens`.
+    '''
+
+    tokens = []
+
+    for word in input_.split(' '):
+        if len(word) == 0:
+            continue
+
+        cleaned = ''.join(filter(
+            lambda char: char not in string.punctuation,
+            word))
+
+        if len(cleaned) == 0:
+            continue
+
+        tokens.append(cleaned)
+
+    return tokens
+
+
+def _time(run: Callable[[str], object], message: str, repeat: int) -> float:
+    start = time.perf_counter()
+
+    for _ in range(repeat):
+        run(message)
+
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    compiled = compile_parser(grammars.new_hire_parser())
+
+    print(f'{"message":<28} {"chars":>7} {"filter us":>10} '
+          f'{"list us":>10} {"parse us":>10}')
+
+    for (name, message) in [
+            ('short', 'is there a guide for new hires?'),
+            ('stack trace', TRACE),
+            ('stack trace x20', TRACE * 20),
+            ('new hire + stack trace x20', 'new hire ' + TRACE * 20)]:
+        assert filter_tokenize(message) == tokenize(message)
+
+        filtered = _time(filter_tokenize, message, 200)
+        listed = _time(tokenize, message, 200)
+        parsed = _time(
+                lambda m: compiled.accept(iter_tokens(m)), message, 200)
+
+        print(f'{name:<28} {len(message):>7} {filtered * 1e6:>10.2f} '
+              f'{listed * 1e6:>10.2f} {parsed * 1e6:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+'''Load test for the bot's Slack Events API webhook.
+
+Replays recorded event payloads against a running webhook at a target rate
+over persistent connections, rewriting event ids so that each replay is a new
+event unless it is deliberately sent as a retry.  Pass `--local` to test an
+`EventIngestor` served on a local threaded server instead of a running bot.
+
+Run with `python -m benchmarks.webhook_load --help` from the `seclopzbot`
+directory.
+'''
+
+import http.client
+import json
+import os
+from queue import Queue
+import random
+from threading import Thread
+import time
+from typing import Any, Dict, List
+from urllib.parse import urlparse
+
+import click
+
+from benchmarks.stats import latency_summary
+from bot import EventIngestor
+
+
+EVENTS = os.path.join(os.path.dirname(__file__), 'data', 'events.jsonl')
+
+
+def load_payloads(path: str) -> List[Dict[str, Any]]:
+    with open(path) as events:
+        return [json.loads(line) for line in events if line.strip()]
+
+
+def serve_locally(port: int) -> EventIngestor:
+    '''Serve an `EventIngestor` on a local threaded server, draining the
+    messages it queues, and return it.
+    '''
+
+    from flask import Flask, request
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class KeepAliveHandler(WSGIRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+    queue = Queue()
+    ingestor = EventIngestor(queue)
+    app = Flask('webhook_load')
+
+    @app.route('/', methods=['POST'])
+    def webhook():
+        return ingestor.handle(request.get_json(silent=True))
+
+    def drain():
+        while True:
+            queue.get()
+
+    server = make_server(
+            '127.0.0.1', port, app,
+            threaded=True, request_handler=KeepAliveHandler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    Thread(target=drain, daemon=True).start()
+
+    return ingestor
+
+
+def _sender(
+        url: str,
+        bodies: List[bytes],
+        interval: float,
+        latencies: List[float],
+        errors: List[int]):
+    target = urlparse(url)
+    connection = http.client.HTTPConnection(target.hostname, target.port)
+    headers = {'Content-Type': 'application/json'}
+    next_send = time.perf_counter()
+
+    for body in bodies:
+        delay = next_send - time.perf_counter()
+
+        if delay > 0:
+            time.sleep(delay)
+
+        next_send += interval
+        start = time.perf_counter()
+
+        try:
+            connection.request('POST', target.path or '/', body, headers)
+            response = connection.getresponse()
+            response.read()
+
+            if response.status != 200:
+                errors.append(response.status)
+        except (OSError, http.client.HTTPException):
+            errors.append(0)
+            connection.close()
+            connection = http.client.HTTPConnection(
+                    target.hostname, target.port)
+            continue
+
+        latencies.append(time.perf_counter() - start)
+
+    connection.close()
+
+
+@click.command()
+@click.option('--url', default='http://127.0.0.1:5000/')
+@click.option('--local', is_flag=True, help='Serve an EventIngestor locally.')
+@click.option('--events', default=EVENTS, help='Recorded payloads (JSON lines).')
+@click.option('--rate', default=2000, help='Target events per second.')
+@click.option('--duration', default=10.0, help='Seconds to send events for.')
+@click.option('--connections', default=16, help='Concurrent connections.')
+@click.option('--retries', default=0.05, help='Fraction of events resent.')
+def main(url, local, events, rate, duration, connections, retries):
+    rng = random.Random(0)
+    payloads = load_payloads(events)
+
+    if local:
+        port = urlparse(url).port or 5000
+        ingestor = serve_locally(port)
+        time.sleep(0.5)
+
+    total = int(rate * duration)
+    sent_ids = []
+    bodies = [[] for _ in range(connections)]
+
+    for n in range(total):
+        payload = dict(rng.choice(payloads))
+
+        if sent_ids and rng.random() < retries:
+            payload['event_id'] = rng.choice(sent_ids)
+        else:
+            payload['event_id'] = f'{payload["event_id"]}-{n}'
+            sent_ids.append(payload['event_id'])
+
+        bodies[n % connections].append(json.dumps(payload).encode())
+
+    latencies = []
+    errors = []
+    threads = [
+        Thread(
+            target=_sender,
+            args=(url, chunk, connections / rate, latencies, errors))
+        for chunk in bodies
+    ]
+    start = time.perf_counter()
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    elapsed = time.perf_counter() - start
+    report = {
+        'sent': total,
+        'errors': len(errors),
+        'seconds': elapsed,
+        'events_per_second': len(latencies) / elapsed,
+        **latency_summary(latencies),
+    }
+
+    if local:
+        report['ingested'] = dict(ingestor.counts)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
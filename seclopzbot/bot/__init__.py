@@ -1,2 +1,36 @@
-from bot.config import Config
-from bot.slackbot import Bot
+'''The bot's public classes, each imported from its module only when first
+used, so that a process pays only for the parts of the bot it runs.
+'''
+
+import importlib
+
+
+_EXPORTS = {
+    'Config': 'bot.config',
+    'Broker': 'bot.broker',
+    'EventIngestor': 'bot.events',
+    'BoundedIntake': 'bot.intake',
+    'Metrics': 'bot.metrics',
+    'Registry': 'bot.registry',
+    'ConfigWatcher': 'bot.reload',
+    'SlackSender': 'bot.sender',
+    'Bot': 'bot.slackbot',
+    'Message': 'bot.slackbot',
+    'Response': 'bot.slackbot',
+    'ResponderPool': 'bot.workers',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+    value = getattr(importlib.import_module(_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
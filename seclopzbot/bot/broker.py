@@ -0,0 +1,295 @@
+'''Exports a `Broker` class, a durable queue of `Message`s kept in a SQLite
+database, which lets several bot processes on one machine share the work of
+responding to messages.
+'''
+
+from concurrent.futures import Future
+from dataclasses import dataclass
+import os
+from queue import Queue
+import sqlite3
+from threading import Condition, Lock, Thread, local
+import time
+from typing import Callable, List, Optional
+
+from bot.slackbot import Message
+from bot.workers import ResponderPool
+
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS events (
+    event_id TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    channel TEXT NOT NULL,
+    text TEXT NOT NULL,
+    received REAL NOT NULL,
+    claimed_by TEXT,
+    claimed_at REAL
+);
+CREATE INDEX IF NOT EXISTS messages_by_channel ON messages (channel, id);
+'''
+
+# The oldest message in each channel, if it is not claimed by a process or its
+# claim has expired.
+_CLAIMABLE = '''
+SELECT id, channel, text, received FROM messages
+WHERE id IN (SELECT MIN(id) FROM messages GROUP BY channel)
+    AND (claimed_by IS NULL OR claimed_at < ?)
+ORDER BY id
+LIMIT ?
+'''
+
+
+@dataclass(frozen=True)
+class Claim:
+    '''A message claimed from a `Broker` by a process, which must `ack` it
+    once it has been handled.
+    '''
+
+    id: int
+    message: Message
+
+
+    @property
+    def channel(self) -> str:
+        return self.message.channel
+
+
+class Broker:
+    '''A queue of messages and a record of the Slack event ids already seen,
+    shared by every process that opens the same database `path`.
+
+        * Messages in the same channel are handed out one at a time, in the
+        order they were put, so each channel is answered in order even when
+        several processes are consuming, as long as a message is only
+        acknowledged once its reply has been posted.
+        * A claimed message that is not acknowledged within `lease` seconds,
+        such as when the process that claimed it exits, is handed out again.
+        * The most recent `dedupe_size` event ids are remembered.
+
+    Messages survive the processes putting and consuming them, so nothing
+    queued is lost when the bot restarts.
+    '''
+
+    def __init__(
+            self,
+            path: str,
+            lease: float = 60.0,
+            dedupe_size: int = 10000,
+            clock: Callable[[], float] = time.time):
+        self.path = path
+        self.lease = lease
+        self.dedupe_size = dedupe_size
+        self.worker_id = f'{os.uname().nodename}:{os.getpid()}'
+        self._clock = clock
+        self._local = local()
+        self._seen_since_prune = 0
+        self._lock = Lock()
+
+        self._connection().executescript(_SCHEMA)
+
+
+    def _connection(self) -> sqlite3.Connection:
+        # SQLite connections cannot be shared between threads, nor used in a
+        # process other than the one that opened them.
+        db = getattr(self._local, 'db', None)
+
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            (self._local.db, self._local.pid) = (db, os.getpid())
+
+        return db
+
+
+    def seen(self, event_id: str) -> bool:
+        '''Record an event id, returning whether it had already been recorded
+        by any process.
+        '''
+
+        db = self._connection()
+        inserted = db.execute(
+                'INSERT OR IGNORE INTO events (event_id) VALUES (?)',
+                (event_id,)).rowcount
+
+        with self._lock:
+            self._seen_since_prune += 1
+            prune = self._seen_since_prune >= self.dedupe_size // 10
+
+            if prune:
+                self._seen_since_prune = 0
+
+        if prune:
+            db.execute(
+                    'DELETE FROM events WHERE rowid <= '
+                    '(SELECT MAX(rowid) FROM events) - ?',
+                    (self.dedupe_size,))
+
+        return inserted == 0
+
+
+    def put_nowait(self, message: Message):
+        '''Add a message to the queue.
+
+        The queue is unbounded, so unlike `Queue.put_nowait` this never
+        raises `Full`.
+        '''
+
+        # Received times are kept as wall clock times, since monotonic times
+        # cannot be compared between processes.
+        received = self._clock() - (time.monotonic() - message.received)
+
+        self._connection().execute(
+                'INSERT INTO messages (channel, text, received) '
+                'VALUES (?, ?, ?)',
+                (message.channel, message.text, received))
+
+
+    def qsize(self) -> int:
+        '''The number of messages queued or claimed but not acknowledged.
+        '''
+
+        (count,) = self._connection().execute(
+                'SELECT COUNT(*) FROM messages').fetchone()
+
+        return count
+
+
+    def claim(self, limit: int = 1) -> List[Claim]:
+        '''Claim up to `limit` messages for this process, each from a
+        different channel.
+        '''
+
+        db = self._connection()
+        now = self._clock()
+        offset = now - time.monotonic()
+
+        db.execute('BEGIN IMMEDIATE')
+
+        try:
+            rows = db.execute(_CLAIMABLE, (now - self.lease, limit)).fetchall()
+            db.executemany(
+                    'UPDATE messages SET claimed_by = ?, claimed_at = ? '
+                    'WHERE id = ?',
+                    [(self.worker_id, now, row[0]) for row in rows])
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+
+        return [
+            Claim(id, Message(channel, text, received - offset))
+            for (id, channel, text, received) in rows
+        ]
+
+
+    def ack(self, claim_id: int):
+        '''Remove a handled message from the queue, letting the next message
+        in its channel be claimed.
+        '''
+
+        self._connection().execute(
+                'DELETE FROM messages WHERE id = ?', (claim_id,))
+
+
+    def consume(
+            self,
+            handler: Callable[[Message], Optional[Future]],
+            workers: int,
+            terminate: Queue,
+            poll: float = 0.05):
+        '''Claim messages and call `handler` on each on a `ResponderPool` of
+        `workers` threads, until a value is put on `terminate`.
+
+        Each message is acknowledged once `handler` returns or raises, or, if
+        it returns a `Future`, as `Bot.respond_later` does, once that is done,
+        leaving the thread free in the meantime.  Given a `SlackSender`,
+        that is once the reply has been posted, so the next message in the
+        channel is not claimed, by this process or another, until then, and a
+        reply lost in a crash is answered again once its lease expires.
+
+        At most `workers` messages are claimed at a time.  While that many
+        are being handled this waits for one to be acknowledged; otherwise,
+        when there is nothing to claim, it checks for messages put by other
+        processes every `poll` seconds.  This function blocks until the pool
+        has stopped.
+        '''
+
+        changed = Condition()
+        state = {'free': workers, 'acks': 0, 'stopping': False}
+
+        def finish(claim: Claim):
+            self.ack(claim.id)
+
+            with changed:
+                state['free'] += 1
+                state['acks'] += 1
+                changed.notify_all()
+
+        def handle(claim: Claim):
+            try:
+                result = handler(claim.message)
+            except BaseException:
+                finish(claim)
+                raise
+
+            if isinstance(result, Future):
+                result.add_done_callback(lambda _: finish(claim))
+            else:
+                finish(claim)
+
+        def watch():
+            terminate.get()
+
+            with changed:
+                state['stopping'] = True
+                changed.notify_all()
+
+        Thread(target=watch, name='broker-terminate', daemon=True).start()
+        pool = ResponderPool(handle, workers)
+        pool.start()
+
+        try:
+            while True:
+                with changed:
+                    changed.wait_for(
+                            lambda: state['stopping'] or state['free'] > 0)
+
+                    if state['stopping']:
+                        break
+
+                    (free, acks) = (state['free'], state['acks'])
+
+                claims = self.claim(free)
+
+                with changed:
+                    state['free'] -= len(claims)
+
+                for claim in claims:
+                    pool.submit(claim)
+
+                if len(claims) == 0:
+                    # An acknowledgement can make the next message in its
+                    # channel claimable; messages put by other processes can
+                    # only be found by looking.
+                    with changed:
+                        changed.wait_for(
+                                lambda: state['stopping'] or
+                                state['acks'] != acks,
+                                poll)
+        finally:
+            pool.stop()
+
+
+    def close(self):
+        '''Close this thread's connection to the database.
+        '''
+
+        db = getattr(self._local, 'db', None)
+
+        if db is not None:
+            db.close()
+            self._local.db = None
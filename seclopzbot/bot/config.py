@@ -1,21 +1,193 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field, fields
 import json
-from typing import List
+from typing import List, Optional
+
+
+# Fields read only when the bot starts, which a reload cannot change.
+RESTART_FIELDS = (
+    'workers', 'bot_user_id', 'dedupe_size', 'slack_api_url',
+    'send_connections', 'send_rate', 'send_burst', 'coalesce_replies',
+    'metrics', 'table_cache', 'processes', 'broker_path', 'broker_lease',
+    'reload_interval', 'reload_debounce', 'intake_size', 'intake_policy',
+    'intake_timeout',
+)
 
 
 @dataclass
 class Config:
     '''Configuration parameters required for a `Bot` to operate.
+
+        * `channels` are the Slack channels the bot joins.
+        * `new_hire_links` are sent in response to the `new-hires` command.
+        * `workers` is the number of threads responding to messages.
+        * `bot_user_id` is the bot's own Slack user id, whose messages are
+        ignored.
+        * `dedupe_size` is the number of recent Slack event ids remembered to
+        ignore retried events.
+        * `slack_api_url` is the base URL of the Slack Web API.
+        * `send_connections` is the number of connections kept open to Slack.
+        * `send_rate` and `send_burst` limit the messages sent per second to
+        each channel and the size of bursts allowed.
+        * `coalesce_replies` allows replies waiting to be sent to the same
+        channel to be joined into a single message.
+        * `cache_size` and `cache_ttl` bound the number of results cached for
+        each cacheable command and the number of seconds they are kept for.
+        * `metrics` enables timing the steps of responding to messages.
+        * `commands` are the paths to the factories of the commands the bot
+        supports, in priority order, as in `'commands.new_hire:from_config'`.
+        * `command_entry_points` adds the commands installed packages register
+        under the `seclopzbot.commands` entry point group.
+        * `table_cache` is the path to a file to cache the parsers compiled
+        from command formats in, shared by every bot process.
+        * `processes` is the number of processes responding to messages.
+        When more than one, messages are queued in a `Broker` database at
+        `broker_path`, held for `broker_lease` seconds by the process handling
+        them.
+        * `prefilter` skips the commands that a message cannot invoke because
+        it lacks a keyword they require, without parsing it.
+        * `reload_interval` is the number of seconds between checks for
+        changes to the configuration file, or `0` to never reload it.
+        Changes are applied once the file has been left alone for
+        `reload_debounce` seconds.
+        * `intake_size` bounds the number of messages waiting for a responder
+        in a single process bot, and `intake_policy` decides what happens to
+        messages arriving once it is reached: `'drop_oldest'` discards the
+        oldest waiting message that does not look like a command, `'reject'`
+        answers with a short busy reply instead, and `'block'` waits up to
+        `intake_timeout` seconds for room, except in the webhook, which
+        never waits and sheds as `'drop_oldest'` does.  Each channel's
+        messages are answered in the order they arrived.
+        * `mozdef_url` is the base URL of the MozDef API the investigation
+        commands use, over up to `mozdef_connections` connections.  Requests
+        to MozDef, and the commands waiting on them, give up after
+        `mozdef_timeout` seconds.  Up to `mozdef_batch_size` notes and status
+        changes are sent to MozDef in each request, and investigations looked
+        up are kept for `mozdef_cache_ttl` seconds.
+
+    The fields in `RESTART_FIELDS` only take effect when the bot restarts.
     '''
 
     channels: List[str]
     new_hire_links: List[str]
+    workers: int = field(default=4)
+    bot_user_id: Optional[str] = field(default=None)
+    dedupe_size: int = field(default=10000)
+    slack_api_url: str = field(default='https://slack.com/api/')
+    send_connections: int = field(default=4)
+    send_rate: float = field(default=1.0)
+    send_burst: int = field(default=3)
+    coalesce_replies: bool = field(default=True)
+    cache_size: int = field(default=128)
+    cache_ttl: float = field(default=300.0)
+    metrics: bool = field(default=True)
+    commands: List[str] =\
+            field(default_factory=lambda: ['commands.new_hire:from_config'])
+    command_entry_points: bool = field(default=True)
+    table_cache: Optional[str] = field(default=None)
+    processes: int = field(default=1)
+    broker_path: str = field(default='seclopzbot-queue.sqlite3')
+    broker_lease: float = field(default=60.0)
+    prefilter: bool = field(default=True)
+    reload_interval: float = field(default=1.0)
+    reload_debounce: float = field(default=0.5)
+    intake_size: int = field(default=1000)
+    intake_policy: str = field(default='drop_oldest')
+    intake_timeout: float = field(default=1.0)
+    mozdef_url: Optional[str] = field(default=None)
+    mozdef_connections: int = field(default=4)
+    mozdef_timeout: float = field(default=10.0)
+    mozdef_batch_size: int = field(default=50)
+    mozdef_cache_ttl: float = field(default=5.0)
 
 
     def load(file_path: str) -> 'Config':
         '''Load a bot configuration from a JSON file.
+
+        A `ValueError` is raised if the file is not a valid configuration.
         '''
 
         with open(file_path) as cfg_file:
-            return Config(**json.load(cfg_file))
+            values = json.load(cfg_file)
+
+        if not isinstance(values, dict):
+            raise ValueError(f'{file_path} does not contain a JSON object.')
+
+        unknown = set(values) - {f.name for f in fields(Config)}
+
+        if len(unknown) > 0:
+            raise ValueError(
+                f'{file_path} has unknown fields: '
+                f'{", ".join(sorted(unknown))}')
+
+        try:
+            conf = Config(**values)
+        except TypeError as err:
+            raise ValueError(
+                f'{file_path} is not a valid configuration: {err}')
+
+        conf.validate()
+        return conf
+
+
+    def validate(self):
+        '''Raise a `ValueError` describing every field with an invalid value.
+        '''
+
+        problems = []
+
+        def check(ok: bool, name: str, expected: str):
+            if not ok:
+                value = getattr(self, name)
+                problems.append(f'`{name}` must be {expected}, not {value!r}')
+
+        def strings(value) -> bool:
+            return isinstance(value, list) and\
+                    all(isinstance(item, str) for item in value)
+
+        def number(value) -> bool:
+            return isinstance(value, (int, float)) and\
+                    not isinstance(value, bool)
+
+        check(strings(self.channels) and len(self.channels) > 0,
+              'channels', 'a non-empty list of strings')
+        check(strings(self.new_hire_links),
+              'new_hire_links', 'a list of strings')
+        check(strings(self.commands) and
+              all(':' in path for path in self.commands),
+              'commands', 'a list of "module:function" paths')
+
+        check(self.mozdef_url is None or isinstance(self.mozdef_url, str),
+              'mozdef_url', 'a URL')
+        check(self.intake_policy in ('block', 'drop_oldest', 'reject'),
+              'intake_policy', "one of 'block', 'drop_oldest' or 'reject'")
+
+        for name in ['workers', 'dedupe_size', 'send_connections',
+                     'send_burst', 'cache_size', 'processes', 'intake_size',
+                     'mozdef_connections', 'mozdef_batch_size']:
+            value = getattr(self, name)
+            check(number(value) and value == int(value) and value >= 1,
+                  name, 'a positive integer')
+
+        for name in ['send_rate', 'broker_lease', 'mozdef_timeout']:
+            value = getattr(self, name)
+            check(number(value) and value > 0, name, 'a positive number')
+
+        for name in ['cache_ttl', 'reload_interval', 'reload_debounce',
+                     'intake_timeout', 'mozdef_cache_ttl']:
+            value = getattr(self, name)
+            check(number(value) and value >= 0, name, 'a non-negative number')
+
+        if problems:
+            raise ValueError('Invalid configuration: ' + '; '.join(problems))
+
+
+
+def restart_required(old: Config, new: Config) -> List[str]:
+    '''The fields changed between two configurations that only take effect
+    when the bot restarts.
+    '''
 
+    return [
+        name for name in RESTART_FIELDS
+        if getattr(old, name) != getattr(new, name)
+    ]
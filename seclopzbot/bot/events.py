@@ -0,0 +1,131 @@
+'''Exports an `EventIngestor` class that turns Slack Events API payloads into
+`Message`s queued for the bot to respond to.
+'''
+
+from collections import OrderedDict
+from queue import Full, Queue
+from threading import Lock
+from typing import Any, Callable, Dict, Optional
+
+from bot.slackbot import Message
+
+
+QUEUED = 'queued'
+DUPLICATE = 'duplicate'
+IGNORED = 'ignored'
+DROPPED = 'dropped'
+
+
+class EventIngestor:
+    '''Accepts payloads POSTed to the bot's webhook by the Slack Events API.
+
+    Slack expects every event to be acknowledged within three seconds and
+    retries events that are not, so an `EventIngestor` never does more than
+    filter an event and queue it without blocking.
+
+        * Events are deduplicated by their `event_id`, remembering the most
+        recent `dedupe_size` ids.  If `seen` is given, it is called instead to
+        record each id and return whether it was already recorded, such as by
+        `Broker.seen` to share ids between processes.
+        * Only plain messages posted by users are queued.  Messages posted by
+        bots, including the bot whose user id is `bot_user_id`, and message
+        subtypes such as edits and channel joins are ignored.
+        * If `queue` is full, the message is dropped.
+    '''
+
+    def __init__(
+            self,
+            queue: Queue,
+            bot_user_id: Optional[str] = None,
+            dedupe_size: int = 10000,
+            seen: Optional[Callable[[str], bool]] = None):
+        self.queue = queue
+        self.bot_user_id = bot_user_id
+        self.dedupe_size = dedupe_size
+        self._seen_by = seen
+        self.counts = {QUEUED: 0, DUPLICATE: 0, IGNORED: 0, DROPPED: 0}
+        self._seen: 'OrderedDict[str, None]' = OrderedDict()
+        self._lock = Lock()
+
+
+    def _is_duplicate(self, event_id: Optional[str]) -> bool:
+        if event_id is None:
+            return False
+
+        if self._seen_by is not None:
+            return self._seen_by(event_id)
+
+        with self._lock:
+            if event_id in self._seen:
+                self._seen.move_to_end(event_id)
+                return True
+
+            self._seen[event_id] = None
+
+            if len(self._seen) > self.dedupe_size:
+                self._seen.popitem(last=False)
+
+            return False
+
+
+    def _message(self, event: Dict[str, Any]) -> Optional[Message]:
+        if event.get('type') != 'message' or 'subtype' in event:
+            return None
+
+        if 'bot_id' in event or event.get('user') == self.bot_user_id:
+            return None
+
+        if 'channel' not in event or not event.get('text'):
+            return None
+
+        return Message(event['channel'], event['text'])
+
+
+    def _count(self, outcome: str) -> str:
+        with self._lock:
+            self.counts[outcome] += 1
+
+        return outcome
+
+
+    def ingest(self, payload: Dict[str, Any]) -> str:
+        '''Queue the message carried by an `event_callback` payload.
+
+        Returns one of `QUEUED`, `DUPLICATE`, `IGNORED` or `DROPPED`.
+        '''
+
+        if payload.get('type') != 'event_callback':
+            return self._count(IGNORED)
+
+        message = self._message(payload.get('event', {}))
+
+        if message is None:
+            return self._count(IGNORED)
+
+        if self._is_duplicate(payload.get('event_id')):
+            return self._count(DUPLICATE)
+
+        try:
+            self.queue.put_nowait(message)
+        except Full:
+            return self._count(DROPPED)
+
+        return self._count(QUEUED)
+
+
+    def handle(self, payload: Optional[Dict[str, Any]]) -> str:
+        '''Handle a payload POSTed to the webhook, returning the body to
+        respond with.
+
+        Answers the `url_verification` handshake with its `challenge` and
+        acknowledges everything else.
+        '''
+
+        if payload is None:
+            return 'Ok'
+
+        if 'challenge' in payload:
+            return payload['challenge']
+
+        self.ingest(payload)
+        return 'Ok'
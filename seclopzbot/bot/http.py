@@ -0,0 +1,165 @@
+'''Exports a `ConnectionPool` class that keeps persistent HTTP connections to a
+single host open for reuse across threads.
+'''
+
+from dataclasses import dataclass
+import http.client
+import json
+from threading import Condition
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+
+@dataclass
+class HttpResponse:
+    '''The parts of an HTTP response the bot makes use of.
+    '''
+
+    status: int
+    headers: Dict[str, str]
+    body: bytes
+
+
+    def json(self) -> Any:
+        return json.loads(self.body.decode('utf-8'))
+
+
+    def header(self, name: str, default: Optional[str] = None)\
+            -> Optional[str]:
+        '''The value of a header, whatever the case of its name.
+        '''
+
+        name = name.lower()
+
+        for (key, value) in self.headers.items():
+            if key.lower() == name:
+                return value
+
+        return default
+
+
+def _stale(error: Exception, sent: bool) -> bool:
+    # Whether a request failed because the server had already closed the
+    # kept-alive connection it was made on, and so can be safely made again.
+    # A request that was written and then timed out may have been acted on.
+    if isinstance(error, TimeoutError):
+        return False
+
+    if not sent:
+        return True
+
+    return isinstance(
+            error, (http.client.RemoteDisconnected, BrokenPipeError))
+
+
+class ConnectionPool:
+    '''Up to `size` keep-alive connections to the host of `base_url`.
+
+    Requests are made on an idle connection if there is one, otherwise on a
+    new connection while fewer than `size` are open, otherwise once another
+    request returns its connection to the pool.  A request that fails because
+    the server closed an idle connection is retried once on a new connection,
+    but only if it failed before it was written or the server hung up without
+    answering.  Requests on new connections, and requests that time out, are
+    never retried, since the server may have acted on them.
+    '''
+
+    def __init__(self, base_url: str, size: int = 4, timeout: float = 10.0):
+        target = urlparse(base_url)
+
+        self.base_path = target.path.rstrip('/')
+        self.size = size
+        self._https = target.scheme == 'https'
+        self._host = target.hostname
+        self._port = target.port
+        self._timeout = timeout
+        self._idle: List[http.client.HTTPConnection] = []
+        self._open = 0
+        self._available = Condition()
+
+
+    def _connect(self) -> http.client.HTTPConnection:
+        if self._https:
+            return http.client.HTTPSConnection(
+                    self._host, self._port, timeout=self._timeout)
+
+        return http.client.HTTPConnection(
+                self._host, self._port, timeout=self._timeout)
+
+
+    def _acquire(self) -> Tuple[http.client.HTTPConnection, bool]:
+        # An open connection, and whether it has been used before.
+        with self._available:
+            while len(self._idle) == 0 and self._open >= self.size:
+                self._available.wait()
+
+            if len(self._idle) > 0:
+                return (self._idle.pop(), True)
+
+            self._open += 1
+
+        return (self._connect(), False)
+
+
+    def _release(self, connection: Optional[http.client.HTTPConnection]):
+        with self._available:
+            if connection is None:
+                self._open -= 1
+            else:
+                self._idle.append(connection)
+
+            self._available.notify()
+
+
+    def request(
+            self,
+            method: str,
+            path: str,
+            body: Optional[bytes] = None,
+            headers: Optional[Dict[str, str]] = None) -> HttpResponse:
+        '''Make a request for a path relative to the pool's `base_url`.
+        '''
+
+        (connection, reused) = self._acquire()
+        url = f'{self.base_path}/{path.lstrip("/")}'
+
+        while True:
+            sent = False
+
+            try:
+                connection.request(method, url, body, headers or {})
+                sent = True
+                response = connection.getresponse()
+                result = HttpResponse(
+                        response.status,
+                        dict(response.getheaders()),
+                        response.read())
+            except (OSError, http.client.HTTPException) as err:
+                connection.close()
+
+                if not reused or not _stale(err, sent):
+                    self._release(None)
+                    raise
+
+                (connection, reused) = (self._connect(), False)
+                continue
+
+            if response.will_close:
+                connection.close()
+                self._release(None)
+            else:
+                self._release(connection)
+
+            return result
+
+
+    def close(self):
+        '''Close all idle connections.
+        '''
+
+        with self._available:
+            for connection in self._idle:
+                connection.close()
+
+            self._open -= len(self._idle)
+            self._idle.clear()
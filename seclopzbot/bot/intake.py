@@ -0,0 +1,296 @@
+'''Exports a `BoundedIntake` class, a bounded queue of `Message`s waiting for a
+responder, which sheds load by a configurable policy when it is full and
+serves channels waiting on messages that look like commands ahead of other
+chatter.
+'''
+
+from collections import deque
+from dataclasses import dataclass
+import heapq
+from queue import Empty, Full
+from threading import Condition
+import time
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from bot.slackbot import Message
+
+
+BLOCK = 'block'
+DROP_OLDEST = 'drop_oldest'
+REJECT = 'reject'
+
+POLICIES = (BLOCK, DROP_OLDEST, REJECT)
+
+BUSY_REPLY = 'I\'m too busy to answer right now, sorry. '\
+        'Please try again in a minute.'
+
+
+@dataclass(eq=False)
+class _Waiting:
+    # A message held by the intake, in the order it arrived.
+    sequence: int
+    message: Message
+    command: bool
+    taken: bool = False
+
+
+class BoundedIntake:
+    '''Holds up to `size` messages.  Messages that `is_command` recognizes as
+    likely commands are served first, but never ahead of an earlier message
+    in the same channel, so that each channel is still answered in order:
+    the channel whose oldest waiting message is the oldest command goes
+    first, then the channel whose oldest waiting message is the oldest of
+    the rest.
+
+    When a message arrives while the intake is full, `policy` decides what
+    happens:
+
+        * `'block'` makes `put` wait up to `timeout` seconds for a responder
+        to take a message, then refuse the new one.  `put_nowait`, which the
+        webhook uses, never waits, and sheds as `'drop_oldest'` does instead.
+        * `'drop_oldest'` discards the oldest message that is not a command to
+        make room.  If every message held is a command, a new command is
+        refused and other messages are discarded.
+        * `'reject'` refuses the new message.  `on_reject` is called with it
+        so that its sender can be told the bot is busy, at most once for
+        each channel until a message from that channel is accepted again.
+
+    Refused messages raise `Full` from `put_nowait` and `put`, as with a
+    `Queue`.  `counts` records how many messages were accepted, shed from
+    the intake and refused.  Values that are not `Message`s, such as the
+    sentinel put by `ResponderPool.consume` to stop it, are always accepted,
+    and are only taken once no messages are waiting.
+    '''
+
+    def __init__(
+            self,
+            size: int = 1000,
+            policy: str = DROP_OLDEST,
+            is_command: Callable[[str], bool] = lambda text: False,
+            timeout: float = 1.0,
+            on_reject: Optional[Callable[[Message], None]] = None):
+        if policy not in POLICIES:
+            raise ValueError(
+                f'Unknown intake policy {policy!r}, expected one of '
+                f'{", ".join(POLICIES)}.')
+
+        if size < 1:
+            raise ValueError('A BoundedIntake must hold at least one message.')
+
+        self.size = size
+        self.policy = policy
+        self.timeout = timeout
+        self.on_reject = on_reject
+        self.counts = {'accepted': 0, 'shed': 0, 'refused': 0}
+        self._is_command = is_command
+        self._sequence = 0
+        self._depths = {'commands': 0, 'chatter': 0}
+        # The messages waiting in each channel, and the channels whose oldest
+        # message is a command or not, by when that message arrived.
+        # Entries for messages no longer at the head of their channel are
+        # skipped when they reach the top of a heap.
+        self._channels: Dict[str, Deque[_Waiting]] = {}
+        self._command_heads: List[Tuple[int, str]] = []
+        self._chatter_heads: List[Tuple[int, str]] = []
+        # Every message that is not a command, oldest first, to shed from.
+        self._chatter: Deque[_Waiting] = deque()
+        self._last: Deque[Any] = deque()
+        self._busy: Set[str] = set()
+        self._changed = Condition()
+
+
+    def qsize(self) -> int:
+        with self._changed:
+            return self._depths['commands'] + self._depths['chatter']
+
+
+    def depths(self) -> Dict[str, int]:
+        '''The number of messages waiting that do and do not look like
+        commands.
+        '''
+
+        with self._changed:
+            return dict(self._depths)
+
+
+    def _full(self) -> bool:
+        return self._depths['commands'] + self._depths['chatter'] >=\
+                self.size
+
+
+    def _push_head(self, channel: str):
+        # Must be called while holding `self._changed`.
+        head = self._channels[channel][0]
+        heap = self._command_heads if head.command else self._chatter_heads
+        heapq.heappush(heap, (head.sequence, channel))
+
+
+    def _forget_taken(self):
+        # Must be called while holding `self._changed`.  Chatter is not
+        # always taken oldest first, so the messages already taken are
+        # skipped here, and cleared out if they build up behind one that
+        # has waited longer.
+        while self._chatter and self._chatter[0].taken:
+            self._chatter.popleft()
+
+        if len(self._chatter) > 2 * self.size:
+            self._chatter = deque(
+                    waiting for waiting in self._chatter
+                    if not waiting.taken)
+
+
+    def _shed(self) -> bool:
+        # Must be called while holding `self._changed`.  Discards the oldest
+        # message that is not a command, returning whether there was one.
+        self._forget_taken()
+
+        if not self._chatter:
+            return False
+
+        waiting = self._chatter.popleft()
+        channel = self._channels[waiting.message.channel]
+        was_head = channel[0] is waiting
+        channel.remove(waiting)
+        self._depths['chatter'] -= 1
+        self.counts['shed'] += 1
+
+        if not channel:
+            del self._channels[waiting.message.channel]
+        elif was_head:
+            self._push_head(waiting.message.channel)
+
+        return True
+
+
+    def _make_room(self, wait: bool) -> bool:
+        # Must be called while holding `self._changed`.  Returns whether the
+        # new message can be added.
+        if not self._full():
+            return True
+
+        if self.policy == BLOCK and wait:
+            deadline = time.monotonic() + self.timeout
+
+            while self._full():
+                remaining = deadline - time.monotonic()
+
+                if remaining <= 0:
+                    return False
+
+                self._changed.wait(remaining)
+
+            return True
+
+        if self.policy in (BLOCK, DROP_OLDEST):
+            return self._shed()
+
+        return False
+
+
+    def _add(self, message: Message, wait: bool):
+        command = self._is_command(message.text)
+        reply = False
+
+        with self._changed:
+            if self._make_room(wait):
+                self._sequence += 1
+                waiting = _Waiting(self._sequence, message, command)
+                channel = self._channels.setdefault(message.channel, deque())
+                channel.append(waiting)
+
+                if len(channel) == 1:
+                    self._push_head(message.channel)
+
+                if not command:
+                    self._chatter.append(waiting)
+
+                self._depths['commands' if command else 'chatter'] += 1
+                self.counts['accepted'] += 1
+                self._busy.discard(message.channel)
+                self._changed.notify_all()
+                return
+
+            self.counts['refused'] += 1
+
+            if self.policy == REJECT and message.channel not in self._busy:
+                self._busy.add(message.channel)
+                reply = self.on_reject is not None
+
+        if reply:
+            self.on_reject(message)
+
+        raise Full()
+
+
+    def put_nowait(self, message: Any):
+        '''Add a message, applying the policy without waiting if the intake
+        is full, and raise `Full` if it is refused.
+        '''
+
+        if not isinstance(message, Message):
+            self.put(message)
+            return
+
+        self._add(message, wait=False)
+
+
+    def put(self, item: Any):
+        '''Add a message, applying the policy if the intake is full, and
+        raise `Full` if it is refused.  Any other value is taken once no
+        messages are waiting, ignoring the bound.
+        '''
+
+        if isinstance(item, Message):
+            self._add(item, wait=True)
+            return
+
+        with self._changed:
+            self._last.append(item)
+            self._changed.notify_all()
+
+
+    def _take(self) -> Optional[Message]:
+        # Must be called while holding `self._changed`.
+        for heap in (self._command_heads, self._chatter_heads):
+            while heap:
+                (sequence, name) = heapq.heappop(heap)
+                channel = self._channels.get(name)
+
+                if channel is None or channel[0].sequence != sequence:
+                    continue
+
+                waiting = channel.popleft()
+                self._depths[
+                    'commands' if waiting.command else 'chatter'] -= 1
+
+                if not waiting.command:
+                    waiting.taken = True
+                    self._forget_taken()
+
+                if channel:
+                    self._push_head(name)
+                else:
+                    del self._channels[name]
+
+                return waiting.message
+
+        return None
+
+
+    def get(self, timeout: Optional[float] = None) -> Any:
+        '''Take the next message, as described above, waiting up to
+        `timeout` seconds for one to arrive before raising `Empty`.
+        '''
+
+        with self._changed:
+            if not self._changed.wait_for(
+                    lambda: self._channels or self._last, timeout):
+                raise Empty()
+
+            item = self._take()
+
+            if item is None:
+                item = self._last.popleft()
+
+            self._changed.notify_all()
+            return item
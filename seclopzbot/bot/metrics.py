@@ -0,0 +1,206 @@
+'''Exports a `Metrics` class that aggregates timings into histograms and
+renders them in the Prometheus text exposition format.
+'''
+
+from bisect import bisect_left
+from threading import Lock
+import time
+from typing import Callable, ContextManager, Dict, List, Optional, Tuple
+
+
+BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    '''Counts observed values into buckets by upper bound, keeping their sum.
+    '''
+
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = Lock()
+
+
+    def observe(self, value: float):
+        i = bisect_left(self.buckets, value)
+
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+
+class _Timer:
+    __slots__ = ('_histogram', '_start')
+
+
+    def __init__(self, histogram: Optional[Histogram]):
+        self._histogram = histogram
+
+
+    def __enter__(self):
+        if self._histogram is not None:
+            self._start = time.perf_counter()
+
+        return self
+
+
+    def __exit__(self, *exc_info):
+        if self._histogram is not None:
+            self._histogram.observe(time.perf_counter() - self._start)
+
+        return False
+
+
+_NULL_TIMER = _Timer(None)
+
+
+def _label_str(labels: Labels, extra: str = '') -> str:
+    parts = [f'{name}="{value}"' for (name, value) in labels]
+
+    if extra:
+        parts.append(extra)
+
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+class Metrics:
+    '''A registry of histograms, counters and gauges.
+
+    When `enabled` is `False`, `time` returns a shared context manager that
+    does nothing and `observe` and `increment` return immediately, so that
+    instrumented code pays almost nothing.
+    '''
+
+    def __init__(self, enabled: bool = True, prefix: str = 'seclopzbot'):
+        self.enabled = enabled
+        self.prefix = prefix
+        self._help: Dict[str, str] = {}
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._gauges: Dict[str, Callable[[], float]] = {}
+        self._lock = Lock()
+
+
+    def describe(self, name: str, help: str):
+        '''Set the help text rendered for a metric.
+        '''
+
+        self._help[name] = help
+
+
+    def _histogram(self, name: str, labels: Labels) -> Histogram:
+        try:
+            return self._histograms[name][labels]
+        except KeyError:
+            with self._lock:
+                series = self._histograms.setdefault(name, {})
+                return series.setdefault(labels, Histogram())
+
+
+    def observe(self, name: str, seconds: float, **labels: str):
+        '''Record a duration in the histogram `name`.
+        '''
+
+        if not self.enabled:
+            return
+
+        self._histogram(name, tuple(sorted(labels.items()))).observe(seconds)
+
+
+    def time(self, name: str, **labels: str) -> ContextManager:
+        '''A context manager recording how long its body takes in the
+        histogram `name`.
+        '''
+
+        if not self.enabled:
+            return _NULL_TIMER
+
+        key = tuple(sorted(labels.items())) if labels else ()
+        return _Timer(self._histogram(name, key))
+
+
+    def increment(self, name: str, amount: float = 1, **labels: str):
+        '''Add to the counter `name`.
+        '''
+
+        if not self.enabled:
+            return
+
+        key = tuple(sorted(labels.items()))
+
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+
+    def gauge(self, name: str, read: Callable[[], float], help: str = ''):
+        '''Register a gauge whose value is read by calling `read` whenever
+        the metrics are rendered.
+        '''
+
+        self._gauges[name] = read
+
+        if help:
+            self.describe(name, help)
+
+
+    def render(self) -> str:
+        '''Render every metric in the Prometheus text exposition format.
+        '''
+
+        lines: List[str] = []
+
+        def header(name: str, kind: str):
+            full = f'{self.prefix}_{name}'
+
+            if name in self._help:
+                lines.append(f'# HELP {full} {self._help[name]}')
+
+            lines.append(f'# TYPE {full} {kind}')
+            return full
+
+        with self._lock:
+            histograms = {n: dict(s) for (n, s) in self._histograms.items()}
+            counters = {n: dict(s) for (n, s) in self._counters.items()}
+
+        for (name, series) in sorted(histograms.items()):
+            full = header(name, 'histogram')
+
+            for (labels, histogram) in sorted(series.items()):
+                cumulative = 0
+
+                for (bound, count) in zip(
+                        histogram.buckets + (float('inf'),),
+                        histogram.counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    bucket = _label_str(labels, 'le="' + le + '"')
+                    lines.append(f'{full}_bucket{bucket} {cumulative}')
+
+                lines.append(f'{full}_sum{_label_str(labels)} {histogram.sum}')
+                lines.append(f'{full}_count{_label_str(labels)} {cumulative}')
+
+        for (name, series) in sorted(counters.items()):
+            full = header(name, 'counter')
+
+            for (labels, value) in sorted(series.items()):
+                lines.append(f'{full}{_label_str(labels)} {value}')
+
+        for (name, read) in sorted(self._gauges.items()):
+            full = header(name, 'gauge')
+            lines.append(f'{full} {read()}')
+
+        return '\n'.join(lines) + '\n'
+
+
+DISABLED = Metrics(enabled=False)
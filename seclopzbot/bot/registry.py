@@ -0,0 +1,283 @@
+'''Exports a `Registry` of the commands a `Bot` supports, which are found by
+path in its `Config` or through entry points, and only imported when needed.
+
+A command is named by the path to a factory function, as in
+`'commands.new_hire:from_config'`, which is called with the bot's `Config` and
+returns a `Command`.  Installed packages can add commands by listing factories
+under the `seclopzbot.commands` entry point group.
+'''
+
+from importlib import import_module
+from threading import Lock, Thread
+from typing import Callable, Dict, List, Optional, Sequence
+
+from bot.config import Config
+from nli.cache import ResultCache
+from nli.command import Command
+from nli.compiled import CompiledParser
+from nli.tablecache import TableCache, open_table_cache
+
+
+ENTRY_POINT_GROUP = 'seclopzbot.commands'
+
+# The built in commands' package was named `cmd` until it was found to shadow
+# the standard library module of that name wherever both were importable.
+LEGACY_PACKAGE = 'cmd'
+
+Factory = Callable[[Config], Command]
+
+_reload_hooks: List[Callable[[Config], None]] = []
+
+
+class CommandLoadError(ImportError):
+    '''Raised by `Registry.warm` when any of its commands cannot be built,
+    with the exception raised for each path in `failures`.  It is an
+    `ImportError`, as raised when a single command fails to load.
+    '''
+
+    def __init__(self, failures: Dict[str, Exception]):
+        super().__init__(
+            'Failed to load commands: ' + '; '.join(
+                f'{path} ({err!r})' for (path, err) in failures.items()))
+        self.failures = failures
+
+
+class Warmup(Thread):
+    '''A daemon thread running `target`, whose `join` raises whatever
+    `target` raised, so that a failure to load commands in the background
+    is not lost.
+    '''
+
+    def __init__(self, target: Callable[[], None]):
+        super().__init__(target=target, name='command-warmup', daemon=True)
+        self._error: Optional[Exception] = None
+
+
+    def run(self):
+        try:
+            super().run()
+        except Exception as err:
+            self._error = err
+
+
+    def join(self, timeout: Optional[float] = None):
+        super().join(timeout)
+
+        if self._error is not None:
+            raise self._error
+
+
+def load_factory(path: str) -> Factory:
+    '''Import the factory function named by a `'module:function'` path.
+
+    A `ValueError` is raised if the path is not written in that form and an
+    `ImportError` if the module or function cannot be found.  Paths in the
+    `cmd` package, which the built in commands used to be kept in, are read
+    as paths in `commands`.
+    '''
+
+    (module_name, sep, attr) = path.partition(':')
+
+    if sep == '' or module_name == '' or attr == '':
+        raise ValueError(
+            f'Command path {path!r} must be written as "module:function".')
+
+    if module_name.startswith(LEGACY_PACKAGE + '.'):
+        module_name = 'commands' + module_name[len(LEGACY_PACKAGE):]
+
+    module = import_module(module_name)
+
+    try:
+        return getattr(module, attr)
+    except AttributeError:
+        raise ImportError(f'{module_name} has no command factory {attr!r}.')
+
+
+def on_reload(hook: Callable[[Config], None]) -> Callable[[Config], None]:
+    '''Register a function to be called with a bot's new `Config` after it
+    is reloaded, for command modules to release what only the replaced
+    commands used, such as clients for settings that have changed.
+
+    Returns `hook`, so that this can be used as a decorator.
+    '''
+
+    _reload_hooks.append(hook)
+    return hook
+
+
+def run_reload_hooks(conf: Config):
+    '''Call every function registered with `on_reload`, reporting any that
+    fail rather than raising.
+    '''
+
+    for hook in list(_reload_hooks):
+        try:
+            hook(conf)
+        except Exception as err:
+            print(f'Failed to release resources after reloading: {err!r}')
+
+
+def entry_point_paths(group: str = ENTRY_POINT_GROUP) -> List[str]:
+    '''The paths to the command factories registered by installed packages.
+    '''
+
+    from importlib.metadata import entry_points
+
+    found = entry_points()
+
+    if hasattr(found, 'select'):
+        points = found.select(group=group)
+    else:
+        points = found.get(group, [])
+
+    return [point.value for point in points]
+
+
+def table_cache(conf: Config) -> Optional[TableCache]:
+    '''The `TableCache` factories should give the commands they build, if
+    the bot is configured with one.
+    '''
+
+    if conf.table_cache is None:
+        return None
+
+    return open_table_cache(conf.table_cache)
+
+
+class LazyCommand:
+    '''Stands in for a `Command` whose module is not imported, nor its parser
+    compiled, until it is first used to parse or answer a message.
+
+    A `LazyCommand` can be used by a `Dispatcher` anywhere a `Command` can.
+    '''
+
+    def __init__(
+            self,
+            path: str,
+            conf: Config,
+            load: Callable[[str], Factory] = load_factory):
+        self.path = path
+        self._conf = conf
+        self._load = load
+        self._command: Optional[Command] = None
+        self._lock = Lock()
+
+
+    @property
+    def loaded(self) -> bool:
+        return self._command is not None
+
+
+    @property
+    def command(self) -> Command:
+        '''The `Command`, built by its factory the first time it is needed.
+        '''
+
+        command = self._command
+
+        if command is not None:
+            return command
+
+        with self._lock:
+            if self._command is None:
+                self._command = self._load(self.path)(self._conf)
+
+            return self._command
+
+
+    @property
+    def name(self) -> str:
+        return self.command.name
+
+
+    @property
+    def compiled(self) -> CompiledParser:
+        return self.command.compiled
+
+
+    @property
+    def cache(self) -> Optional[ResultCache]:
+        return self.command.cache
+
+
+    def cached(self, key):
+        return self.command.cached(key)
+
+
+    def invoke(self, args, key=None):
+        return self.command.invoke(args, key)
+
+
+    async def invoke_async(self, args, key=None):
+        return await self.command.invoke_async(args, key)
+
+
+    def __repr__(self) -> str:
+        return f'LazyCommand({self.path!r}, loaded={self.loaded})'
+
+
+class Registry:
+    '''The commands supported by a bot, in priority order.
+
+    Commands listed in `Config.commands` come first, followed by any
+    registered through entry points that are not already listed.  None of
+    them are imported until `warm` is called or they are first used.
+    '''
+
+    def __init__(
+            self,
+            conf: Config,
+            paths: Optional[Sequence[str]] = None,
+            load: Callable[[str], Factory] = load_factory):
+        if paths is None:
+            paths = list(conf.commands)
+
+            if conf.command_entry_points:
+                paths += [
+                    path for path in entry_point_paths()
+                    if path not in paths
+                ]
+
+        self.commands = [LazyCommand(path, conf, load) for path in paths]
+        self.tables = table_cache(conf)
+
+
+    def warm(self, background: bool = True) -> Optional[Warmup]:
+        '''Import every command and compile its parser, in priority order,
+        raising a `CommandLoadError` naming every command that could not be
+        built, so that a bot configured with a bad path fails as it starts.
+
+        With `background` set, this happens on a `Warmup` thread, which is
+        returned, so that the bot can start accepting messages meanwhile, and
+        the error is raised by its `join`.  A message arriving before a
+        command is ready waits only for the commands it needs.
+
+        Any parsers newly compiled from formats are then saved to the bot's
+        `TableCache`, for processes started later to read.
+        '''
+
+        def load_all():
+            failures = {}
+
+            for command in self.commands:
+                try:
+                    command.command
+                except Exception as err:
+                    failures[command.path] = err
+
+            if self.tables is not None and self.tables.changed:
+                try:
+                    self.tables.save()
+                except OSError as err:
+                    print(f'Failed to save {self.tables.path}: {err!r}')
+
+            if failures:
+                raise CommandLoadError(failures)
+
+        if not background:
+            load_all()
+            return None
+
+        thread = Warmup(load_all)
+        thread.start()
+        return thread
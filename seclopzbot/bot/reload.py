@@ -0,0 +1,117 @@
+'''Exports a `ConfigWatcher` class that watches a bot's configuration file and
+hands each valid new `Config` written to it to a callback, such as
+`Bot.reload`.
+'''
+
+import os
+from threading import Event, Thread
+import time
+from typing import Callable, Optional, Tuple
+
+from bot.config import Config
+
+
+# What is compared to tell whether a file has changed.
+Signature = Optional[Tuple[int, int, int]]
+
+
+def _signature(path: str) -> Signature:
+    try:
+        info = os.stat(path)
+    except OSError:
+        return None
+
+    return (info.st_ino, info.st_size, info.st_mtime_ns)
+
+
+class ConfigWatcher:
+    '''Checks the file at `path` for changes every `interval` seconds, by the
+    file's inode, size and modification time.
+
+    Once a change has been left alone for `debounce` seconds, so that an
+    editor or deployment tool has finished writing it, the file is loaded
+    and validated.  `on_change` is then called with the new `Config`, on the
+    watcher's thread.  Files that fail to load are reported with `on_error`
+    and otherwise ignored, keeping the configuration already in use.
+    '''
+
+    def __init__(
+            self,
+            path: str,
+            on_change: Callable[[Config], None],
+            interval: float = 1.0,
+            debounce: float = 0.5,
+            on_error: Optional[Callable[[Exception], None]] = None,
+            clock: Callable[[], float] = time.monotonic):
+        self.path = path
+        self.interval = interval
+        self.debounce = debounce
+        self.reloads = 0
+        self.failures = 0
+        self._on_change = on_change
+        self._on_error = on_error or (
+                lambda err: print(f'Failed to reload {path}: {err}'))
+        self._clock = clock
+        self._loaded = _signature(path)
+        self._pending: Signature = self._loaded
+        self._pending_since = clock()
+        self._stop = Event()
+        self._thread: Optional[Thread] = None
+
+
+    def poll(self) -> bool:
+        '''Check the file once, loading it if it has changed and has since
+        been left alone long enough.  Returns whether `on_change` was called.
+        '''
+
+        signature = _signature(self.path)
+        now = self._clock()
+
+        if signature != self._pending:
+            (self._pending, self._pending_since) = (signature, now)
+            return False
+
+        if signature == self._loaded or signature is None or\
+                now - self._pending_since < self.debounce:
+            return False
+
+        self._loaded = signature
+
+        try:
+            conf = Config.load(self.path)
+        except (OSError, ValueError) as err:
+            self.failures += 1
+            self._on_error(err)
+            return False
+
+        self.reloads += 1
+        self._on_change(conf)
+        return True
+
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as err:
+                self.failures += 1
+                self._on_error(err)
+
+
+    def start(self):
+        '''Start checking the file on a daemon thread.
+        '''
+
+        self._thread = Thread(
+                target=self._watch, name='config-watcher', daemon=True)
+        self._thread.start()
+
+
+    def stop(self):
+        '''Stop checking the file and wait for any reload in progress.
+        '''
+
+        self._stop.set()
+
+        if self._thread is not None:
+            self._thread.join()
@@ -0,0 +1,330 @@
+'''Exports a `SlackSender` class that posts the bot's responses to Slack with
+per-channel rate limiting.
+'''
+
+from collections import deque
+from concurrent.futures import Future
+import heapq
+import http.client
+import json
+from threading import Condition, Thread
+import time
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from bot.http import ConnectionPool, HttpResponse
+from bot.metrics import DISABLED, Metrics
+from bot.slackbot import Response
+
+
+SLACK_API_URL = 'https://slack.com/api/'
+
+
+class TokenBucket:
+    '''Allows `rate` events per second on average and bursts of up to `burst`
+    events at once.
+    '''
+
+    def __init__(self, rate: float, burst: int, now: float):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = now
+
+
+    def _refill(self, now: float):
+        elapsed = max(0.0, now - self._updated)
+        self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+        self._updated = now
+
+
+    def ready_at(self, now: float) -> float:
+        '''The earliest time at which an event will be allowed.
+        '''
+
+        self._refill(now)
+
+        if self._tokens >= 1:
+            return now
+
+        return now + (1 - self._tokens) / self.rate
+
+
+    def take(self, now: float):
+        '''Use up one event's worth of the allowance.
+        '''
+
+        self._refill(now)
+        self._tokens -= 1
+
+
+def _retry_after(value: Optional[str]) -> float:
+    # The seconds to wait given by a `Retry-After` header, or one second if
+    # it is missing or not a number of seconds.
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError):
+        return 1.0
+
+    return seconds if 0 <= seconds < float('inf') else 1.0
+
+
+class SlackSender:
+    '''Posts `Response`s to Slack from a pool of sender threads.
+
+        * Requests share a `ConnectionPool` of `connections` keep-alive
+        connections to `api_url`.
+        * Messages to each channel are rate limited by a `TokenBucket` allowing
+        `rate` messages per second in bursts of up to `burst`.
+        * When Slack answers with HTTP 429, nothing more is sent to that
+        channel until the number of seconds given in `Retry-After` has passed,
+        and the messages are retried.  Other failures, including responses
+        Slack marks as not `ok`, are reported and counted in `counts` as
+        `failed`.
+        * When `coalesce` is `True`, messages waiting to be sent to the same
+        channel are joined into a single message of at most `max_length`
+        characters.
+
+    Messages sent to a channel are posted in the order they were given to
+    `send`, and only one request to a channel is in flight at a time.  The
+    latency of each post is recorded in `metrics` as `slack_send_seconds`.
+    '''
+
+    def __init__(
+            self,
+            token: str,
+            api_url: str = SLACK_API_URL,
+            connections: int = 4,
+            rate: float = 1.0,
+            burst: int = 3,
+            coalesce: bool = True,
+            max_length: int = 4000,
+            clock: Callable[[], float] = time.monotonic,
+            metrics: Metrics = DISABLED):
+        self.pool = ConnectionPool(api_url, connections)
+        self.metrics = metrics
+        self.rate = rate
+        self.burst = burst
+        self.coalesce = coalesce
+        self.max_length = max_length
+        self.counts = {'sent': 0, 'posts': 0, 'rate_limited': 0, 'failed': 0}
+        self._token = token
+        self._clock = clock
+        self._pending: Dict[str, Deque[Tuple[str, Future]]] = {}
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._hold: Dict[str, float] = {}
+        self._ready: List[Tuple[float, int, str]] = []
+        self._scheduled: Set[str] = set()
+        self._sequence = 0
+        self._stopping = False
+        self._changed = Condition()
+        self._threads = [
+            Thread(target=self._work, daemon=True)
+            for _ in range(connections)
+        ]
+
+
+    def call(self, method: str, **params) -> HttpResponse:
+        '''Call a Slack Web API method synchronously.
+        '''
+
+        return self.pool.request(
+                'POST',
+                method,
+                json.dumps(params).encode('utf-8'),
+                {
+                    'Authorization': f'Bearer {self._token}',
+                    'Content-Type': 'application/json; charset=utf-8'
+                })
+
+
+    def _schedule(self, channel: str):
+        # Must be called while holding `self._changed`.
+        now = self._clock()
+        bucket = self._buckets.setdefault(
+                channel, TokenBucket(self.rate, self.burst, now))
+        at = max(bucket.ready_at(now), self._hold.get(channel, now))
+
+        self._sequence += 1
+        self._scheduled.add(channel)
+        heapq.heappush(self._ready, (at, self._sequence, channel))
+        self._changed.notify()
+
+
+    def send(self, response: Response) -> 'Future[bool]':
+        '''Queue a response to be posted to its channel, returning a
+        `Future` that is done once Slack has answered the post, with whether
+        it was accepted.  The `Future` of a response still waiting when the
+        sender is stopped is never done.
+        '''
+
+        posted: Future = Future()
+
+        with self._changed:
+            self._pending.setdefault(response.channel, deque())\
+                    .append((response.message, posted))
+
+            if response.channel not in self._scheduled:
+                self._schedule(response.channel)
+
+        return posted
+
+
+    def _take_messages(self, channel: str) -> List[Tuple[str, Future]]:
+        pending = self._pending[channel]
+        messages = [pending.popleft()]
+
+        if not self.coalesce:
+            return messages
+
+        length = len(messages[0][0])
+
+        while pending and\
+                length + 2 + len(pending[0][0]) <= self.max_length:
+            length += 2 + len(pending[0][0])
+            messages.append(pending.popleft())
+
+        return messages
+
+
+    def _next_channel(self) -> Optional[str]:
+        # Must be called while holding `self._changed`.
+        while True:
+            if len(self._ready) == 0:
+                if self._stopping:
+                    return None
+
+                self._changed.wait()
+                continue
+
+            delay = self._ready[0][0] - self._clock()
+
+            if delay > 0:
+                self._changed.wait(delay)
+                continue
+
+            (_, _, channel) = heapq.heappop(self._ready)
+            return channel
+
+
+    def _post(
+            self,
+            channel: str,
+            messages: List[str]) -> Tuple[Optional[float], bool]:
+        # Returns the number of seconds to hold the channel for if rate
+        # limited, or `None` once the messages are sent or have failed, and
+        # whether they were sent.
+        try:
+            with self.metrics.time('slack_send_seconds'):
+                result = self.call(
+                        'chat.postMessage',
+                        channel=channel,
+                        text='\n\n'.join(messages))
+
+            if result.status == 429:
+                return (_retry_after(result.header('Retry-After')), False)
+
+            if result.status != 200:
+                error = f'HTTP {result.status}'
+            else:
+                # Slack reports most failures in the body of a 200 response.
+                body = result.json()
+
+                if not isinstance(body, dict):
+                    error = 'unexpected response'
+                elif body.get('ok') is not True:
+                    error = body.get('error', 'not ok')
+                else:
+                    error = None
+        except (OSError, http.client.HTTPException, ValueError) as err:
+            error = repr(err)
+
+        if error is not None:
+            print(f'Failed to post to {channel}: {error}')
+
+            with self._changed:
+                self.counts['failed'] += 1
+
+        return (None, error is None)
+
+
+    def _work(self):
+        while True:
+            with self._changed:
+                channel = self._next_channel()
+
+                if channel is None:
+                    return
+
+                messages = self._take_messages(channel)
+                self._buckets[channel].take(self._clock())
+
+            (hold, sent) = (None, False)
+
+            try:
+                (hold, sent) = self._post(
+                        channel, [text for (text, _) in messages])
+            finally:
+                # Release the channel even if posting raised, so that its
+                # later messages are still sent and `stop` does not wait on
+                # it.
+                with self._changed:
+                    if hold is None:
+                        self.counts['posts'] += 1
+                        self.counts['sent'] += len(messages)
+                    else:
+                        self.counts['rate_limited'] += 1
+                        self._hold[channel] = self._clock() + hold
+                        self._pending[channel].extendleft(reversed(messages))
+
+                    if len(self._pending[channel]) > 0:
+                        self._schedule(channel)
+                    else:
+                        self._scheduled.discard(channel)
+                        self._changed.notify_all()
+
+                if hold is None:
+                    for (_, posted) in messages:
+                        posted.set_result(sent)
+
+
+    def start(self):
+        '''Start the sender threads.
+        '''
+
+        for thread in self._threads:
+            thread.start()
+
+
+    def pending(self) -> int:
+        '''The number of messages waiting to be posted.
+        '''
+
+        with self._changed:
+            return sum(len(messages) for messages in self._pending.values())
+
+
+    def stop(self, timeout: Optional[float] = None):
+        '''Post the messages already queued, waiting up to `timeout` seconds
+        for them to be sent, then stop the sender threads.
+        '''
+
+        deadline = None if timeout is None else self._clock() + timeout
+
+        with self._changed:
+            while len(self._scheduled) > 0:
+                remaining = None if deadline is None\
+                        else deadline - self._clock()
+
+                if remaining is not None and remaining <= 0:
+                    break
+
+                self._changed.wait(remaining)
+
+            self._stopping = True
+            self._ready.clear()
+            self._changed.notify_all()
+
+        for thread in self._threads:
+            thread.join()
+
+        self.pool.close()
@@ -1,52 +1,326 @@
-from dataclasses import dataclass
-from typing import List, Optional
+import asyncio
+from concurrent.futures import Future, wait
+from dataclasses import dataclass, field, replace
+import re
+from threading import Lock
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
 
 from bot import Config
-import cmd
-from nli.command import CmdError
-from nli.parser import ParseError
+from bot.config import restart_required
+from bot.metrics import DISABLED, Metrics
+from bot.registry import Registry, Warmup, run_reload_hooks
+from nli import CallbackRunner, Dispatch, Dispatcher
+from nli.runner import default_runner
 
 
 _INVALID_CMD = 'I didn\'t understand your command, sorry.\n'\
         'Please try asking for help with "seclopzbot help"'
 
+# Messages naming the bot that invoke no command are told so.  Other chatter
+# is left unanswered.
+_ADDRESSED = re.compile(r'\bseclopzbot\b', re.IGNORECASE)
+
+
+_METRIC_NAMES = {
+    'tokenize': 'tokenize_seconds',
+    'parse': 'parse_seconds',
+    'callback': 'callback_seconds',
+}
+
+
+@dataclass
+class Message:
+    '''A message received from Slack, to be responded to.
+
+    `received` is the `time.monotonic()` time at which it was received.
+    '''
+
+    channel: str
+    text: str
+    received: float = field(default_factory=time.monotonic, compare=False)
+
 
 @dataclass
 class Response:
-    '''Simple container for the data needed to send a message to Slack.
+    '''Simple container for the data needed to send a message to Slack, and
+    the name of the command that answered, if any.
     '''
 
     channel: str
     message: str
+    command: Optional[str] = field(default=None, compare=False)
+
+
+@dataclass(frozen=True)
+class _Snapshot:
+    # A configuration and the commands built from it, which are replaced
+    # together when the bot is reloaded.
+    configuration: Config
+    registry: Registry
+    dispatcher: Dispatcher
+
+
+def _response(
+        conf: Config,
+        msg: str,
+        channel: Optional[str],
+        dispatch: Optional[Dispatch]) -> Optional[Response]:
+    if channel is None:
+        channel = conf.channels[0]
+
+    if dispatch is not None:
+        return Response(channel, dispatch.message, dispatch.command.name)
+
+    if _ADDRESSED.search(msg) is not None:
+        return Response(channel, _INVALID_CMD)
+
+    return None
 
 
 class Bot:
     '''The main interface into the set of commands supported by Seclopz-bot.
+
+    Commands are found through a `Registry` and are only imported when a
+    message first needs them, or when `warm` is called.
+
+    The configuration and the commands built from it can be replaced while
+    the bot is answering messages with `reload`.  Each message is answered
+    entirely by the commands in use when it arrived.
     '''
 
-    def __init__(self, token: str, conf: Config):
+    def __init__(
+            self,
+            token: str,
+            conf: Config,
+            metrics: Metrics = DISABLED,
+            runner: Optional[CallbackRunner] = None):
         self.slack_token = token
-        self.configuration = conf
-        self._commands = [
-            cmd.new_hire(self.configuration.new_hire_links)
-        ]
+        self.metrics = metrics
+        self.runner = runner if runner is not None else default_runner()
+        self._snapshot = self._build(conf)
+        self._reload_lock = Lock()
+        self._replies: Dict[str, Future] = {}
+        self._replies_lock = Lock()
+
+
+    @property
+    def configuration(self) -> Config:
+        return self._snapshot.configuration
+
+
+    def _timer(self, step: str, **labels: str):
+        return self.metrics.time(_METRIC_NAMES[step], **labels)
+
+
+    def _count(self, outcome: str, **labels: str):
+        self.metrics.increment(f'prefilter_{outcome}_total', **labels)
+
+
+    def _build(self, conf: Config) -> _Snapshot:
+        registry = Registry(conf)
+        dispatcher = Dispatcher(
+                registry.commands,
+                self._timer if self.metrics.enabled else None,
+                conf.prefilter,
+                self._count if self.metrics.enabled else None)
+
+        return _Snapshot(conf, registry, dispatcher)
+
+
+    def warm(self, background: bool = True) -> Optional[Warmup]:
+        '''Import every command, compile its parser and index the keywords
+        the commands require ahead of the first message, on a background
+        thread unless `background` is `False`.
+
+        A `CommandLoadError` is raised if any command cannot be built, by
+        the returned thread's `join` when loading in the background.
+        '''
+
+        snapshot = self._snapshot
+
+        def load_all():
+            snapshot.registry.warm(background=False)
+            snapshot.dispatcher.index
+
+        if not background:
+            load_all()
+            return None
+
+        thread = Warmup(load_all)
+        thread.start()
+        return thread
+
+
+    def is_command(self, msg: str) -> bool:
+        '''Whether a message contains a keyword that one of the bot's
+        commands requires, making it likely to invoke a command.  Commands
+        are only considered once loaded, as by `warm`.
+        '''
+
+        return self._snapshot.dispatcher.recognizes(msg)
+
 
+    def reload(self, conf: Config) -> List[str]:
+        '''Replace the bot's configuration, rebuilding its commands.
 
-    def respond_to_message(self, msg: str) -> Optional[Response]:
+        The new commands are built, and their parsers compiled or read from
+        the `TableCache`, on the calling thread before any message is given
+        to them.  Messages already being answered finish with the old
+        commands.  If the commands cannot be built, the exception is raised
+        and the old commands are kept.
+
+        Once the new commands are in use, the functions command modules
+        registered with `on_reload` are called to release what only the old
+        ones used.
+
+        Returns the changed fields that will not take effect until the bot
+        restarts.
+        '''
+
+        conf.validate()
+
+        with self._reload_lock:
+            snapshot = self._build(conf)
+            snapshot.registry.warm(background=False)
+            snapshot.dispatcher.index
+
+            old = self._snapshot
+            self._snapshot = snapshot
+            run_reload_hooks(conf)
+
+        return restart_required(old.configuration, conf)
+
+
+    def set_new_hire_links(self, links: List[str]):
+        '''Change the links sent in response to the `new-hires` command,
+        discarding any cached responses.
+        '''
+
+        self.reload(replace(self.configuration, new_hire_links=links))
+
+
+    def respond_to_message(
+            self,
+            msg: str,
+            channel: Optional[str] = None) -> Optional[Response]:
         '''Determine if a message invokes any of the commands registered to the
         bot, returning the output of the first successfully invoked command.
+
+        The response is addressed to `channel`, or to the first configured
+        channel if none is given.  A message invoking no command is only
+        answered, with a pointer to `seclopzbot help`, if it names the bot;
+        otherwise `None` is returned, so that the bot does not reply to
+        every message in its channels.
+        '''
+
+        snapshot = self._snapshot
+        dispatch = snapshot.dispatcher.dispatch(msg)
+        return _response(snapshot.configuration, msg, channel, dispatch)
+
+
+    async def respond_to_message_async(
+            self,
+            msg: str,
+            channel: Optional[str] = None) -> Optional[Response]:
+        '''Like `respond_to_message`, but without blocking the event loop it
+        is awaited on while command callbacks run.
+        '''
+
+        snapshot = self._snapshot
+        dispatch = await snapshot.dispatcher.dispatch_async(msg)
+        return _response(snapshot.configuration, msg, channel, dispatch)
+
+
+    def respond_later(
+            self,
+            message: Message,
+            send: Callable[[Response], Optional[Future]]) -> 'Future[None]':
+        '''Answer a message on the `runner`'s event loop and give the
+        response to `send`, returning at once with a `Future` that is done
+        once it has been sent, or once it is known there is no response.  If
+        `send` returns a `Future`, as `SlackSender.send` does, the response
+        is only sent once that is done.
+
+        The calling thread is not held up while command callbacks wait, so
+        that a few threads can answer many messages with slow callbacks.
+        Responses to a channel are given to `send` in the order their
+        messages were given, even when a later one is ready first.
         '''
 
-        for command in self._commands:
-            try:
-                message = command.execute(msg)
-                return Response(self.configuration.channels[0], message)
-            except CmdError:
-                continue
-            except ParseError:
-                continue
+        with self._replies_lock:
+            previous = self._replies.get(message.channel)
+            handed = self.runner.submit(
+                    self._respond(message, send, previous))
+            self._replies[message.channel] = handed
+
+        def forget(done: Future):
+            with self._replies_lock:
+                if self._replies.get(message.channel) is done:
+                    del self._replies[message.channel]
+
+        handed.add_done_callback(forget)
+        answered: Future = Future()
+
+        def settle(done: Future):
+            if done.exception() is not None:
+                answered.set_exception(done.exception())
+            elif isinstance(done.result(), Future):
+                done.result().add_done_callback(settle)
+            else:
+                answered.set_result(None)
+
+        handed.add_done_callback(settle)
+        return answered
+
+
+    def wait_for_replies(self, timeout: Optional[float] = None):
+        '''Wait up to `timeout` seconds for the response to every message
+        given to `respond_later` to be given to its `send`.
+        '''
+
+        with self._replies_lock:
+            # Each channel's last reply waits for the ones before it.
+            pending = list(self._replies.values())
+
+        wait(pending, timeout)
 
-        return Response(self.configuration.channels[0], _INVALID_CMD)
+
+    async def _respond(
+            self,
+            message: Message,
+            send: Callable[[Response], Optional[Future]],
+            previous: Optional[Future]) -> Optional[Future]:
+        # Returns what `send` returned, once the response to the previous
+        # message in the channel has been given to it.
+        response = await self.respond_to_message_async(
+                message.text, message.channel)
+
+        if previous is not None:
+            # Whether or not the previous reply could be sent.
+            await asyncio.wait([asyncio.wrap_future(previous)])
+
+        if response is None:
+            return None
+
+        return send(response)
+
+
+    def classify_batch(
+            self,
+            messages: Sequence[str]
+            ) -> List[Optional[Tuple[str, Dict[str, Optional[str]]]]]:
+        '''Determine which command each of many messages invokes, such as
+        when replaying a channel's history, without invoking any of them.
+
+        Returns the name of the first command accepting each message and the
+        parameters parsed for it, or `None` if no command accepts it.
+        '''
+
+        return [
+            None if match is None else (match[0].name, match[1])
+            for match in self._snapshot.dispatcher.classify_many(messages)
+        ]
 
 
     def channels_to_join(self) -> List[str]:
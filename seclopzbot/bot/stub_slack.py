@@ -0,0 +1,147 @@
+'''Exports a `StubSlack` class, a local stand-in for the Slack Web API used to
+test and benchmark the bot without talking to Slack.
+'''
+
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+from threading import Lock, Thread
+import time
+from typing import List
+
+
+@dataclass
+class Post:
+    '''A request received by a `StubSlack` server.
+    '''
+
+    method: str
+    params: dict
+    received: float
+
+
+class StubSlack:
+    '''Serves the Slack Web API on `127.0.0.1` from a background thread.
+
+    Every request is answered with `{"ok": true}` after `latency` seconds,
+    except that the next `limit_next` requests are answered with HTTP 429 and
+    a `Retry-After` header of `retry_after` seconds, and the next `fail_next`
+    after those with `{"ok": false}`, as Slack reports most errors.  All
+    requests that are not rate limited are recorded in `posts`, and
+    `connections` counts the connections clients have opened.
+    '''
+
+    def __init__(self, latency: float = 0.0, retry_after: int = 1):
+        self.latency = latency
+        self.retry_after = retry_after
+        self.limit_next = 0
+        self.fail_next = 0
+        self.posts: List[Post] = []
+        self.connections = 0
+        self._lock = Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = Thread(
+                target=self._server.serve_forever,
+                kwargs={'poll_interval': 0.05},
+                daemon=True)
+
+
+    @property
+    def url(self) -> str:
+        (host, port) = self._server.server_address
+        return f'http://{host}:{port}/api/'
+
+
+    def posted(self, method: str = 'chat.postMessage') -> List[Post]:
+        '''All requests received for an API method, in order.
+        '''
+
+        with self._lock:
+            return [post for post in self.posts if post.method == method]
+
+
+    def texts(self, channel: str) -> List[str]:
+        '''The texts of all messages posted to a channel, in order.
+        '''
+
+        with self._lock:
+            return [
+                post.params['text'] for post in self.posts
+                if post.method == 'chat.postMessage' and
+                post.params.get('channel') == channel
+            ]
+
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body are written separately, which would otherwise
+            # wait on the client's delayed acknowledgement.
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+
+                with stub._lock:
+                    stub.connections += 1
+
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, status: int, body: dict, **headers):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+
+                for (name, value) in headers.items():
+                    self.send_header(name, value)
+
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                params = json.loads(self.rfile.read(length) or b'{}')
+                method = self.path.rsplit('/', 1)[-1]
+
+                if stub.latency > 0:
+                    time.sleep(stub.latency)
+
+                with stub._lock:
+                    limited = stub.limit_next > 0
+                    failed = not limited and stub.fail_next > 0
+
+                    if limited:
+                        stub.limit_next -= 1
+                    else:
+                        stub.posts.append(
+                            Post(method, params, time.monotonic()))
+
+                    if failed:
+                        stub.fail_next -= 1
+
+                if limited:
+                    self._reply(
+                        429,
+                        {'ok': False, 'error': 'ratelimited'},
+                        **{'Retry-After': str(stub.retry_after)})
+                elif failed:
+                    self._reply(
+                        200, {'ok': False, 'error': 'channel_not_found'})
+                else:
+                    self._reply(200, {'ok': True})
+
+        return Handler
+
+
+    def start(self):
+        self._thread.start()
+
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
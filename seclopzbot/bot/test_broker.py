@@ -0,0 +1,253 @@
+from concurrent.futures import Future
+import multiprocessing
+import os
+from queue import Queue
+import tempfile
+from threading import Lock, Thread
+import time
+import unittest
+
+from bot.broker import Broker
+from bot.config import Config
+from bot.events import DUPLICATE, QUEUED, EventIngestor
+from bot.sender import SlackSender
+from bot.slackbot import Bot, Message
+from bot.stub_slack import StubSlack
+
+
+def _consume_into(path, results):
+    # Runs in a child process, sending each message handled back to the test
+    # with the time it was handled, until the queue is empty.
+    broker = Broker(path)
+    terminate = Queue()
+
+    def handler(message):
+        results.put((time.time(), message.channel, message.text))
+
+    def wait_until_empty():
+        while broker.qsize() > 0:
+            time.sleep(0.01)
+
+        terminate.put(True)
+
+    Thread(target=wait_until_empty, daemon=True).start()
+    broker.consume(handler, workers=2, terminate=terminate, poll=0.01)
+
+
+class BrokerTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'queue.sqlite3')
+
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+
+    def test_one_message_claimed_per_channel(self):
+        broker = Broker(self.path)
+
+        for text in ['1', '2', '3']:
+            for channel in ['a', 'b']:
+                broker.put_nowait(Message(channel, text))
+
+        claims = broker.claim(limit=10)
+
+        assert [(c.channel, c.message.text) for c in claims] ==\
+                [('a', '1'), ('b', '1')]
+        assert broker.claim(limit=10) == []
+
+        broker.ack(claims[0].id)
+        assert [c.message.text for c in broker.claim(limit=10)] == ['2']
+        assert broker.qsize() == 5
+
+
+    def test_messages_survive_reopening(self):
+        Broker(self.path).put_nowait(Message('a', 'hello'))
+
+        claims = Broker(self.path).claim()
+
+        assert [c.message for c in claims] == [Message('a', 'hello')]
+
+
+    def test_expired_claims_handed_out_again(self):
+        now = [1000.0]
+        first = Broker(self.path, lease=30, clock=lambda: now[0])
+        second = Broker(self.path, lease=30, clock=lambda: now[0])
+        first.put_nowait(Message('a', 'hello'))
+
+        assert len(first.claim()) == 1
+        now[0] += 10
+        assert second.claim() == []
+        now[0] += 30
+        assert [c.message.text for c in second.claim()] == ['hello']
+
+
+    def test_event_ids_shared(self):
+        first = Broker(self.path)
+        second = Broker(self.path)
+
+        assert not first.seen('E1')
+        assert second.seen('E1')
+        assert not second.seen('E2')
+
+
+    def test_old_event_ids_forgotten(self):
+        broker = Broker(self.path, dedupe_size=10)
+
+        for i in range(30):
+            broker.seen(f'E{i}')
+
+        assert broker.seen('E29')
+        assert not broker.seen('E0')
+
+
+    def test_ingestor_shares_deduplication(self):
+        broker = Broker(self.path)
+        payload = {
+            'type': 'event_callback',
+            'event_id': 'E1',
+            'event': {'type': 'message', 'channel': 'C1', 'user': 'U1',
+                      'text': 'new hire'},
+        }
+
+        first = EventIngestor(broker, seen=broker.seen)
+        second = EventIngestor(Broker(self.path), seen=broker.seen)
+
+        assert first.ingest(payload) == QUEUED
+        assert second.ingest(payload) == DUPLICATE
+        assert broker.qsize() == 1
+
+
+    def test_consume_keeps_channel_order(self):
+        broker = Broker(self.path)
+        terminate = Queue()
+        handled = {}
+        lock = Lock()
+
+        for i in range(50):
+            for channel in ['a', 'b', 'c']:
+                broker.put_nowait(Message(channel, str(i)))
+
+        def handler(message):
+            with lock:
+                handled.setdefault(message.channel, []).append(message.text)
+
+                if sum(map(len, handled.values())) == 150:
+                    terminate.put(True)
+
+        consumer = Thread(
+                target=broker.consume,
+                args=(handler, 3, terminate),
+                kwargs={'poll': 0.01})
+        consumer.start()
+        consumer.join(timeout=10)
+
+        assert not consumer.is_alive()
+        assert broker.qsize() == 0
+
+        for channel in ['a', 'b', 'c']:
+            assert handled[channel] == [str(i) for i in range(50)]
+
+
+    def test_acknowledged_once_future_done(self):
+        broker = Broker(self.path)
+        terminate = Queue()
+        pending = []
+
+        for channel in ['a', 'a', 'b']:
+            broker.put_nowait(Message(channel, 'hi'))
+
+        def handler(message):
+            pending.append(Future())
+
+            if len(pending) == 2:
+                terminate.put(True)
+
+            return pending[-1]
+
+        consumer = Thread(
+                target=broker.consume,
+                args=(handler, 2, terminate),
+                kwargs={'poll': 0.01})
+        consumer.start()
+        consumer.join(timeout=5)
+
+        # Handlers have returned, but the second message to `a` waits for
+        # the first to be acknowledged.
+        assert len(pending) == 2
+        assert broker.qsize() == 3
+
+        for future in pending:
+            future.set_result(None)
+
+        assert broker.qsize() == 1
+
+
+    def test_acknowledged_once_reply_posted(self):
+        slack = StubSlack(latency=0.3)
+        slack.start()
+        self.addCleanup(slack.stop)
+        sender = SlackSender('token', slack.url, rate=1000, burst=1000)
+        sender.start()
+        bot = Bot('token', Config(['general'], ['link']))
+        broker = Broker(self.path)
+        terminate = Queue()
+
+        for text in ['new hire', 'new hires']:
+            broker.put_nowait(Message('a', text))
+
+        consumer = Thread(
+                target=broker.consume,
+                args=(lambda m: bot.respond_later(m, sender.send), 2,
+                      terminate))
+        consumer.start()
+        time.sleep(0.15)
+
+        # The first reply is being posted, and the second message waits for
+        # it to be acknowledged.
+        assert broker.qsize() == 2
+        assert len(slack.posts) == 0
+
+        while broker.qsize() > 0:
+            time.sleep(0.01)
+
+        terminate.put(True)
+        consumer.join(timeout=5)
+        sender.stop(timeout=5)
+
+        assert not consumer.is_alive()
+        assert len(slack.texts('a')) == 2
+
+
+    def test_processes_share_queue_in_channel_order(self):
+        broker = Broker(self.path)
+
+        for i in range(40):
+            for channel in ['a', 'b', 'c', 'd']:
+                broker.put_nowait(Message(channel, str(i)))
+
+        context = multiprocessing.get_context('spawn')
+        results = context.Queue()
+        processes = [
+            context.Process(target=_consume_into, args=(self.path, results))
+            for _ in range(2)
+        ]
+
+        for process in processes:
+            process.start()
+
+        handled = sorted(results.get(timeout=30) for _ in range(160))
+
+        for process in processes:
+            process.join(timeout=30)
+
+        by_channel = {}
+
+        for (_, channel, text) in handled:
+            by_channel.setdefault(channel, []).append(text)
+
+        for channel in ['a', 'b', 'c', 'd']:
+            assert by_channel[channel] == [str(i) for i in range(40)]
+
+        assert broker.qsize() == 0
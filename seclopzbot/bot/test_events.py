@@ -0,0 +1,99 @@
+from queue import Queue
+import unittest
+
+from bot.config import Config
+from bot.events import DROPPED, DUPLICATE, IGNORED, QUEUED, EventIngestor
+from bot.sender import SlackSender
+from bot.slackbot import Bot, Message
+from bot.stub_slack import StubSlack
+
+
+def _payload(event_id, text='hello', **event):
+    event.setdefault('type', 'message')
+    event.setdefault('channel', 'C1')
+    event.setdefault('user', 'U1')
+    event['text'] = text
+
+    return {'type': 'event_callback', 'event_id': event_id, 'event': event}
+
+
+class EventIngestorTests(unittest.TestCase):
+    def test_challenge_answered(self):
+        ingestor = EventIngestor(Queue())
+
+        body = ingestor.handle(
+                {'type': 'url_verification', 'challenge': 'abc'})
+        assert body == 'abc'
+
+
+    def test_message_queued(self):
+        queue = Queue()
+        ingestor = EventIngestor(queue)
+
+        assert ingestor.ingest(_payload('E1', 'new hire?')) == QUEUED
+        assert queue.get_nowait() == Message('C1', 'new hire?')
+
+
+    def test_retried_event_deduplicated(self):
+        queue = Queue()
+        ingestor = EventIngestor(queue)
+
+        assert ingestor.ingest(_payload('E1')) == QUEUED
+        assert ingestor.ingest(_payload('E1')) == DUPLICATE
+        assert queue.qsize() == 1
+
+
+    def test_dedupe_bounded(self):
+        ingestor = EventIngestor(Queue(), dedupe_size=2)
+
+        for event_id in ['E1', 'E2', 'E3']:
+            ingestor.ingest(_payload(event_id))
+
+        assert ingestor.ingest(_payload('E3')) == DUPLICATE
+        assert ingestor.ingest(_payload('E1')) == QUEUED
+
+
+    def test_bot_messages_ignored(self):
+        queue = Queue()
+        ingestor = EventIngestor(queue, bot_user_id='UBOT')
+
+        assert ingestor.ingest(_payload('E1', user='UBOT')) == IGNORED
+        assert ingestor.ingest(_payload('E2', bot_id='B1')) == IGNORED
+        assert ingestor.ingest(
+                _payload('E3', subtype='message_changed')) == IGNORED
+        assert queue.empty()
+
+
+    def test_full_queue_drops_without_blocking(self):
+        ingestor = EventIngestor(Queue(maxsize=1))
+
+        assert ingestor.ingest(_payload('E1')) == QUEUED
+        assert ingestor.ingest(_payload('E2')) == DROPPED
+        assert ingestor.counts[DROPPED] == 1
+
+
+class ChatterTests(unittest.TestCase):
+    def test_chatter_not_answered(self):
+        slack = StubSlack()
+        slack.start()
+        self.addCleanup(slack.stop)
+        sender = SlackSender('token', slack.url, coalesce=False)
+        sender.start()
+        queue = Queue()
+        ingestor = EventIngestor(queue)
+        bot = Bot('token', Config(['general'], ['link']))
+
+        for (event_id, text) in enumerate(['lunch anyone?', 'new hires',
+                                           'seclopzbot lunch?']):
+            ingestor.ingest(_payload(f'E{event_id}', text))
+
+        while not queue.empty():
+            bot.respond_later(queue.get_nowait(), sender.send)
+
+        bot.wait_for_replies(timeout=5)
+        sender.stop(timeout=5)
+        texts = slack.texts('C1')
+
+        assert len(texts) == 2
+        assert 'link' in texts[0]
+        assert texts[1].startswith('I didn\'t understand')
@@ -0,0 +1,137 @@
+import http.client
+import socket
+import socketserver
+from threading import Lock, Thread
+import time
+import unittest
+
+from bot.http import ConnectionPool, HttpResponse
+
+
+ANSWER = b'HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok'
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    # Answers the requests on each connection in turn as told by `actions`:
+    # 'answer', 'close' after answering, 'hang' without answering, or
+    # 'garbage' with a line that is not HTTP.
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, actions):
+        self.actions = list(actions)
+        self.requests = 0
+        self._lock = Lock()
+        super().__init__(('127.0.0.1', 0), _Handler)
+        Thread(target=self.serve_forever, kwargs={'poll_interval': 0.05},
+               daemon=True).start()
+
+
+    @property
+    def url(self):
+        (host, port) = self.server_address
+        return f'http://{host}:{port}/'
+
+
+    def next_action(self):
+        with self._lock:
+            self.requests += 1
+            return self.actions.pop(0) if self.actions else 'answer'
+
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            # Requests are sent without a body.
+            line = self.rfile.readline()
+
+            if not line:
+                return
+
+            while self.rfile.readline() not in (b'\r\n', b''):
+                pass
+
+            action = self.server.next_action()
+
+            if action == 'hang':
+                time.sleep(1)
+                return
+
+            if action == 'garbage':
+                self.wfile.write(b'not http\r\n')
+                return
+
+            self.wfile.write(ANSWER)
+
+            if action == 'close':
+                # Hang up without saying so, as idle connections are closed.
+                self.request.shutdown(socket.SHUT_RDWR)
+                return
+
+
+class ConnectionPoolTests(unittest.TestCase):
+    def _serve(self, *actions):
+        server = _Server(actions)
+        self.addCleanup(server.stop)
+        return server
+
+
+    def _pool(self, server, **kwargs):
+        pool = ConnectionPool(server.url, size=1, **kwargs)
+        self.addCleanup(pool.close)
+        return pool
+
+
+    def test_stale_connection_retried(self):
+        server = self._serve('close')
+        pool = self._pool(server)
+
+        assert pool.request('GET', 'a').body == b'ok'
+        time.sleep(0.1)
+        assert pool.request('GET', 'b').body == b'ok'
+        assert server.requests == 2
+
+
+    def test_timeout_not_retried(self):
+        server = self._serve('hang')
+        pool = self._pool(server, timeout=0.2)
+
+        with self.assertRaises(TimeoutError):
+            pool.request('POST', 'a')
+
+        assert server.requests == 1
+
+
+    def test_timeout_on_reused_connection_not_retried(self):
+        server = self._serve('answer', 'hang')
+        pool = self._pool(server, timeout=0.2)
+        pool.request('POST', 'a')
+
+        with self.assertRaises(TimeoutError):
+            pool.request('POST', 'b')
+
+        assert server.requests == 2
+
+
+    def test_bad_response_not_retried(self):
+        server = self._serve('garbage')
+        pool = self._pool(server)
+
+        with self.assertRaises(http.client.HTTPException):
+            pool.request('POST', 'a')
+
+        assert server.requests == 1
+        # The connection is given back.
+        assert pool.request('POST', 'b').body == b'ok'
+
+
+    def test_header_case_insensitive(self):
+        response = HttpResponse(200, {'retry-after': '3'}, b'')
+
+        assert response.header('Retry-After') == '3'
+        assert response.header('X-Missing', '1') == '1'
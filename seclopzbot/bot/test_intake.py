@@ -0,0 +1,189 @@
+from queue import Empty, Full, Queue
+from threading import Thread
+import time
+import tracemalloc
+import unittest
+
+from bot.config import Config
+from bot.events import DROPPED, QUEUED, EventIngestor
+from bot.intake import BoundedIntake
+from bot.slackbot import Bot, Message
+from bot.test_events import _payload
+from bot.workers import ResponderPool
+
+
+def _is_command(text):
+    return text.startswith('cmd')
+
+
+def _fill(intake, texts, channel='C1'):
+    for text in texts:
+        intake.put_nowait(Message(channel, text))
+
+
+def _drain(intake):
+    taken = []
+
+    while True:
+        try:
+            taken.append(intake.get(timeout=0).text)
+        except Empty:
+            return taken
+
+
+class BoundedIntakeTests(unittest.TestCase):
+    def test_commands_taken_first(self):
+        intake = BoundedIntake(10, is_command=_is_command)
+        _fill(intake, ['a'], 'C1')
+        _fill(intake, ['cmd 1'], 'C2')
+        _fill(intake, ['b'], 'C3')
+        _fill(intake, ['cmd 2'], 'C4')
+
+        assert intake.depths() == {'commands': 2, 'chatter': 2}
+        assert _drain(intake) == ['cmd 1', 'cmd 2', 'a', 'b']
+
+
+    def test_channel_order_kept(self):
+        intake = BoundedIntake(10, is_command=_is_command)
+        _fill(intake, ['a', 'cmd 1', 'b'], 'C1')
+        _fill(intake, ['c', 'cmd 2'], 'C2')
+        _fill(intake, ['cmd 3', 'd'], 'C3')
+
+        # Only C3 has a command waiting at its head, and once it is taken
+        # the oldest message waiting at the head of a channel goes next.
+        assert _drain(intake) == ['cmd 3', 'a', 'cmd 1', 'b', 'c', 'cmd 2',
+                                  'd']
+
+
+    def test_drop_oldest_sheds_chatter(self):
+        intake = BoundedIntake(3, 'drop_oldest', _is_command)
+        _fill(intake, ['a', 'cmd 1', 'b', 'c', 'cmd 2'])
+
+        assert intake.counts == {'accepted': 5, 'shed': 2, 'refused': 0}
+        assert _drain(intake) == ['cmd 1', 'c', 'cmd 2']
+
+
+    def test_drop_oldest_keeps_commands(self):
+        intake = BoundedIntake(2, 'drop_oldest', _is_command)
+        _fill(intake, ['cmd 1', 'cmd 2'])
+
+        for text in ['cmd 3', 'a']:
+            with self.assertRaises(Full):
+                intake.put_nowait(Message('C1', text))
+
+        assert intake.counts['refused'] == 2
+        assert _drain(intake) == ['cmd 1', 'cmd 2']
+
+
+    def test_block_waits_for_room(self):
+        intake = BoundedIntake(1, 'block', timeout=0.05)
+        _fill(intake, ['a'])
+
+        start = time.monotonic()
+
+        with self.assertRaises(Full):
+            intake.put(Message('C1', 'b'))
+
+        assert time.monotonic() - start >= 0.05
+
+        intake.timeout = 5
+        taker = Thread(target=lambda: (time.sleep(0.05), intake.get()))
+        taker.start()
+        intake.put(Message('C1', 'c'))
+        taker.join()
+
+        assert _drain(intake) == ['c']
+
+
+    def test_block_put_nowait_sheds(self):
+        intake = BoundedIntake(2, 'block', _is_command, timeout=5)
+        _fill(intake, ['a', 'cmd 1'])
+
+        start = time.monotonic()
+        intake.put_nowait(Message('C1', 'cmd 2'))
+
+        with self.assertRaises(Full):
+            intake.put_nowait(Message('C1', 'b'))
+
+        assert time.monotonic() - start < 1
+        assert intake.counts == {'accepted': 3, 'shed': 1, 'refused': 1}
+        assert _drain(intake) == ['cmd 1', 'cmd 2']
+
+
+    def test_reject_replies_once_per_channel(self):
+        rejected = []
+        intake = BoundedIntake(1, 'reject', on_reject=rejected.append)
+        _fill(intake, ['a'])
+
+        for channel in ['C1', 'C1', 'C2']:
+            with self.assertRaises(Full):
+                intake.put_nowait(Message(channel, 'b'))
+
+        assert [m.channel for m in rejected] == ['C1', 'C2']
+
+        intake.get()
+        _fill(intake, ['c'])
+        intake.get()
+        _fill(intake, ['d'])
+
+        with self.assertRaises(Full):
+            intake.put_nowait(Message('C1', 'e'))
+
+        assert [m.channel for m in rejected] == ['C1', 'C2', 'C1']
+
+
+    def test_ingestor_counts_refused_as_dropped(self):
+        intake = BoundedIntake(1, 'reject')
+        ingestor = EventIngestor(intake)
+
+        assert ingestor.ingest(_payload('E1')) == QUEUED
+        assert ingestor.ingest(_payload('E2')) == DROPPED
+
+
+    def test_pool_stops_after_waiting_messages(self):
+        handled = []
+        intake = BoundedIntake(10, is_command=_is_command)
+        terminate = Queue()
+        pool = ResponderPool(lambda message: handled.append(message.text), 1)
+        _fill(intake, ['a'], 'C1')
+        _fill(intake, ['cmd 1'], 'C2')
+        terminate.put(True)
+
+        pool.start()
+        pool.consume(intake, terminate)
+
+        assert handled == ['cmd 1', 'a']
+
+
+    def test_bot_recognizes_commands(self):
+        bot = Bot('token', Config(['general'], ['link']))
+        bot.warm(background=False)
+
+        assert bot.is_command('seclopzbot is there a guide for new hires?')
+        assert not bot.is_command('lunch in 10 minutes, who is in?')
+
+
+    def test_memory_flat_under_overload(self):
+        # Messages arrive far faster than they are taken, so all but the
+        # newest are shed and the memory held stops growing.
+        intake = BoundedIntake(500, 'drop_oldest', _is_command)
+        text = 'chatter ' * 20
+        tracemalloc.start()
+
+        try:
+            sizes = []
+
+            for rounds in range(4):
+                for i in range(5000):
+                    intake.put_nowait(Message(f'C{i % 50}', text + str(i)))
+
+                    if i % 100 == 0:
+                        intake.get()
+
+                sizes.append(tracemalloc.get_traced_memory()[0])
+        finally:
+            tracemalloc.stop()
+
+        assert intake.qsize() == 500
+        assert intake.counts['shed'] > 15000
+        assert sizes[-1] - sizes[0] < 50 * 1024, sizes
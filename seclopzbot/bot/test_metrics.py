@@ -0,0 +1,59 @@
+import unittest
+
+from bot.config import Config
+from bot.metrics import Histogram, Metrics
+from bot.slackbot import Bot
+
+
+class HistogramTests(unittest.TestCase):
+    def test_values_bucketed_by_upper_bound(self):
+        h = Histogram(buckets=(0.1, 1.0))
+        h.observe(0.1)
+        h.observe(0.5)
+        h.observe(2.0)
+
+        assert h.counts == [1, 1, 1]
+        assert h.count == 3 and h.sum == 2.6
+
+
+class MetricsTests(unittest.TestCase):
+    def test_render_prometheus_text(self):
+        m = Metrics()
+        m.describe('parse_seconds', 'Time spent parsing.')
+        m.observe('parse_seconds', 0.002, command='new-hires')
+        m.increment('skipped_total')
+        m.gauge('depth', lambda: 3)
+
+        text = m.render()
+
+        assert '# HELP seclopzbot_parse_seconds Time spent parsing.' in text
+        assert '# TYPE seclopzbot_parse_seconds histogram' in text
+        assert 'seclopzbot_parse_seconds_bucket{command="new-hires",le="0.0025"} 1' in text
+        assert 'seclopzbot_parse_seconds_bucket{command="new-hires",le="0.001"} 0' in text
+        assert 'seclopzbot_parse_seconds_count{command="new-hires"} 1' in text
+        assert 'seclopzbot_skipped_total 1' in text
+        assert 'seclopzbot_depth 3' in text
+
+
+    def test_disabled_records_nothing(self):
+        m = Metrics(enabled=False)
+
+        with m.time('parse_seconds'):
+            pass
+
+        m.observe('parse_seconds', 1)
+        m.increment('skipped_total')
+
+        assert m.render() == '\n'
+
+
+    def test_bot_steps_timed(self):
+        m = Metrics()
+        bot = Bot('token', Config(['general'], ['link']), m)
+        bot.respond_to_message('new hire')
+
+        text = m.render()
+
+        assert 'seclopzbot_tokenize_seconds_count 1' in text
+        assert 'seclopzbot_parse_seconds_count{command="new-hires"} 1' in text
+        assert 'seclopzbot_callback_seconds_count{command="new-hires"} 1' in text
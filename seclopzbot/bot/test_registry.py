@@ -0,0 +1,121 @@
+import unittest
+
+from bot.config import Config
+from bot.registry import CommandLoadError, Registry, load_factory
+from bot.slackbot import Bot
+from commands import new_hire
+from nli import Dispatcher
+
+
+def _conf(**kwargs):
+    return Config(['general'], ['link'], command_entry_points=False, **kwargs)
+
+
+class LoadFactoryTests(unittest.TestCase):
+    def test_loads_module_function(self):
+        assert load_factory('commands.new_hire:from_config')(_conf()).name ==\
+                'new-hires'
+
+
+    def test_legacy_package_paths(self):
+        assert load_factory('cmd.new_hire:from_config') is\
+                load_factory('commands.new_hire:from_config')
+
+
+    def test_bad_paths(self):
+        with self.assertRaises(ValueError):
+            load_factory('commands.new_hire')
+
+        with self.assertRaises(ImportError):
+            load_factory('commands.new_hire:missing')
+
+        with self.assertRaises(ImportError):
+            load_factory('commands.missing:from_config')
+
+
+class RegistryTests(unittest.TestCase):
+    def setUp(self):
+        self.loaded = []
+
+        def load(path):
+            self.loaded.append(path)
+            return lambda conf: new_hire(conf.new_hire_links)
+
+        self.load = load
+
+
+    def test_commands_loaded_when_first_used(self):
+        registry = Registry(_conf(), ['a:f', 'b:f'], self.load)
+
+        assert self.loaded == []
+        assert registry.commands[0].compiled.accept(['new', 'hire']) == {}
+        assert self.loaded == ['a:f']
+
+        registry.commands[0].invoke({})
+        assert self.loaded == ['a:f']
+
+
+    def test_warm_loads_every_command(self):
+        registry = Registry(_conf(), ['a:f', 'b:f'], self.load)
+        registry.warm(background=True).join()
+
+        assert self.loaded == ['a:f', 'b:f']
+        assert all(command.loaded for command in registry.commands)
+
+
+    def test_warm_raises_for_bad_paths(self):
+        paths = [
+            'commands.new_hire:from_config',
+            'commands.missing:from_config',
+            'commands.new_hire',
+        ]
+
+        for background in [False, True]:
+            registry = Registry(_conf(), paths)
+
+            with self.assertRaises(CommandLoadError) as raised:
+                warming = registry.warm(background)
+
+                if warming is not None:
+                    warming.join()
+
+            assert list(raised.exception.failures) == paths[1:]
+            assert registry.commands[0].loaded
+
+        bot = Bot('token', _conf(commands=paths))
+
+        with self.assertRaises(CommandLoadError):
+            bot.warm().join()
+
+
+    def test_prefilter_loads_only_commands_run(self):
+        counts = []
+        registry = Registry(_conf(), ['a:f', 'b:f'], self.load)
+        d = Dispatcher(
+                registry.commands,
+                counter=lambda outcome, command: counts.append(outcome))
+
+        assert d.dispatch('new hire') is not None
+        assert self.loaded == ['a:f']
+        assert counts == ['parsed']
+
+        registry.warm(background=False)
+        counts.clear()
+
+        assert d.dispatch('lunch?') is None
+        assert counts == ['skipped', 'skipped']
+
+
+    def test_commands_listed_in_config(self):
+        registry = Registry(_conf(commands=['x:f', 'y:f']), load=self.load)
+
+        assert [c.path for c in registry.commands] == ['x:f', 'y:f']
+
+
+    def test_bot_loads_commands_lazily(self):
+        bot = Bot('token', _conf())
+        commands = bot._snapshot.registry.commands
+
+        assert not any(command.loaded for command in commands)
+        assert 'link' in bot.respond_to_message('new hire').message
+        assert all(command.loaded for command in commands)
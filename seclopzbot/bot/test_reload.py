@@ -0,0 +1,243 @@
+import json
+import os
+import tempfile
+from threading import Event, Thread
+import unittest
+
+from bot.config import Config, restart_required
+from bot.reload import ConfigWatcher
+from bot.slackbot import Bot
+from commands.new_hire import new_hire
+from nli import Command
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+_entered = Event()
+_gate = Event()
+
+
+def _gated_command(conf: Config) -> Command:
+    # Answers `new hire` with the configured links once `_gate` is set,
+    # setting `_entered` while it waits.
+    command = new_hire(conf.new_hire_links)
+    respond = command.callback
+
+    def callback(args):
+        _entered.set()
+        _gate.wait(5)
+        return respond(args)
+
+    return Command(
+            name=command.name,
+            help=command.help,
+            format=command.format,
+            callback=callback,
+            parser=command.parser)
+
+
+def _conf(links, **kwargs):
+    return Config(['general'], links, command_entry_points=False, **kwargs)
+
+
+class ConfigTests(unittest.TestCase):
+    def test_validate(self):
+        _conf(['link']).validate()
+
+        for bad in [
+                {'channels': []},
+                {'channels': 'general'},
+                {'workers': 0},
+                {'send_rate': -1},
+                {'commands': ['commands.new_hire']}]:
+            conf = _conf(['link'])
+
+            for (name, value) in bad.items():
+                setattr(conf, name, value)
+
+            with self.assertRaises(ValueError):
+                conf.validate()
+
+
+    def test_load_rejects_unknown_fields(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'config.json')
+
+            with open(path, 'w') as cfg_file:
+                json.dump({'channels': ['a'], 'new_hire_links': [], 'x': 1},
+                          cfg_file)
+
+            with self.assertRaises(ValueError):
+                Config.load(path)
+
+
+    def test_restart_required(self):
+        old = _conf(['link'])
+        new = _conf(['other'], workers=8)
+        new.channels = ['a', 'b']
+
+        assert restart_required(old, new) == ['workers']
+
+
+class ConfigWatcherTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'config.json')
+        self.write(['first'])
+        self.clock = _Clock()
+        self.loaded = []
+        self.errors = []
+        self.watcher = ConfigWatcher(
+                self.path,
+                self.loaded.append,
+                debounce=1.0,
+                on_error=self.errors.append,
+                clock=self.clock)
+
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+
+    def write(self, links, raw=None):
+        # Written under a new name and moved into place, as deployment tools
+        # do, so that the file's inode always changes.
+        temp = self.path + '.tmp'
+
+        with open(temp, 'w') as cfg_file:
+            if raw is None:
+                json.dump({'channels': ['general'], 'new_hire_links': links},
+                          cfg_file)
+            else:
+                cfg_file.write(raw)
+
+        os.replace(temp, self.path)
+
+
+    def test_unchanged_file_not_loaded(self):
+        for _ in range(3):
+            self.clock.now += 5
+            assert not self.watcher.poll()
+
+        assert self.loaded == []
+
+
+    def test_change_loaded_after_debounce(self):
+        self.write(['second'])
+        assert not self.watcher.poll()
+
+        self.clock.now += 0.5
+        assert not self.watcher.poll()
+
+        self.clock.now += 0.5
+        assert self.watcher.poll()
+        assert [conf.new_hire_links for conf in self.loaded] == [['second']]
+
+        self.clock.now += 5
+        assert not self.watcher.poll()
+
+
+    def test_repeated_writes_debounced(self):
+        for i in range(5):
+            self.write([f'link-{i}'])
+            self.watcher.poll()
+            self.clock.now += 0.5
+
+        assert self.loaded == []
+
+        self.watcher.poll()
+        self.clock.now += 1
+        self.watcher.poll()
+
+        assert [conf.new_hire_links for conf in self.loaded] == [['link-4']]
+
+
+    def test_invalid_config_ignored(self):
+        for raw in ['{"channels": ', '{"channels": [], "new_hire_links": []}']:
+            self.write(None, raw)
+            self.watcher.poll()
+            self.clock.now += 1
+            assert not self.watcher.poll()
+
+        assert self.loaded == []
+        assert len(self.errors) == 2
+        assert all(isinstance(err, ValueError) for err in self.errors)
+
+        self.write(['fixed'])
+        self.watcher.poll()
+        self.clock.now += 1
+        assert self.watcher.poll()
+        assert self.loaded[0].new_hire_links == ['fixed']
+
+
+class BotReloadTests(unittest.TestCase):
+    def setUp(self):
+        _entered.clear()
+        _gate.clear()
+
+
+    def tearDown(self):
+        _gate.set()
+
+
+    def test_in_flight_message_keeps_old_commands(self):
+        commands = [f'{__name__}:_gated_command']
+        bot = Bot('token', _conf(['old'], commands=commands))
+        bot.warm(background=False)
+        responses = []
+        answering = Thread(
+                target=lambda: responses.append(
+                    bot.respond_to_message('new hire')))
+        answering.start()
+        assert _entered.wait(5)
+
+        assert bot.reload(_conf(['new'], commands=commands)) == []
+        _gate.set()
+        answering.join()
+
+        assert 'old' in responses[0].message
+        assert 'new' in bot.respond_to_message('new hire').message
+
+
+    def test_no_messages_dropped_during_reloads(self):
+        _gate.set()
+        bot = Bot('token', _conf(['link-0']))
+        stop = Event()
+        responses = []
+
+        def answer():
+            while not stop.is_set():
+                responses.append(bot.respond_to_message('new hire').message)
+
+        answering = Thread(target=answer)
+        answering.start()
+
+        for i in range(1, 20):
+            bot.reload(_conf([f'link-{i}']))
+
+        stop.set()
+        answering.join()
+
+        assert len(responses) > 0
+        assert all('link-' in response for response in responses)
+        assert 'link-19' in bot.respond_to_message('new hire').message
+
+
+    def test_failed_reload_keeps_old_commands(self):
+        bot = Bot('token', _conf(['link']))
+
+        with self.assertRaises(ValueError):
+            bot.reload(_conf(['other'], workers=0))
+
+        with self.assertRaises(ImportError):
+            bot.reload(_conf(
+                ['other'], commands=['commands.missing:from_config']))
+
+        assert bot.configuration.new_hire_links == ['link']
+        assert 'link' in bot.respond_to_message('new hire').message
@@ -0,0 +1,152 @@
+import time
+import unittest
+
+from bot.sender import SlackSender, TokenBucket, _retry_after
+from bot.slackbot import Response
+from bot.stub_slack import StubSlack
+from bot.test_http import _Server
+
+
+class TokenBucketTests(unittest.TestCase):
+    def test_burst_then_rate(self):
+        bucket = TokenBucket(rate=2.0, burst=2, now=0.0)
+
+        bucket.take(0.0)
+        bucket.take(0.0)
+        assert bucket.ready_at(0.0) == 0.5
+        assert bucket.ready_at(0.5) == 0.5
+
+
+class RetryAfterTests(unittest.TestCase):
+    def test_unusable_values_wait_one_second(self):
+        assert _retry_after('3') == 3
+        assert _retry_after('0.5') == 0.5
+
+        for value in [None, '', 'soon', '-1', 'inf', 'nan']:
+            assert _retry_after(value) == 1
+
+
+class SlackSenderTests(unittest.TestCase):
+    def setUp(self):
+        self.slack = StubSlack()
+        self.slack.start()
+
+
+    def tearDown(self):
+        self.slack.stop()
+
+
+    def _sender(self, **kwargs):
+        sender = SlackSender('token', self.slack.url, **kwargs)
+        sender.start()
+        return sender
+
+
+    def test_messages_posted_in_order(self):
+        sender = self._sender(rate=1000, burst=1000, coalesce=False)
+
+        for i in range(20):
+            sender.send(Response('a', str(i)))
+            sender.send(Response('b', str(i)))
+
+        sender.stop(timeout=5)
+
+        assert self.slack.texts('a') == [str(i) for i in range(20)]
+        assert self.slack.texts('b') == [str(i) for i in range(20)]
+
+
+    def test_connections_reused(self):
+        sender = self._sender(connections=2, rate=1000, burst=1000)
+
+        for i in range(20):
+            sender.send(Response(f'c{i}', 'hi'))
+
+        sender.stop(timeout=5)
+
+        assert len(self.slack.posts) == 20
+        assert self.slack.connections <= 2
+
+
+    def test_pending_messages_coalesced(self):
+        self.slack.latency = 0.2
+        sender = self._sender(rate=1000, burst=1000)
+
+        for i in range(5):
+            sender.send(Response('a', str(i)))
+
+        sender.stop(timeout=5)
+
+        assert '\n\n'.join(self.slack.texts('a')) ==\
+                '\n\n'.join(str(i) for i in range(5))
+        assert len(self.slack.texts('a')) < 5
+
+
+    def test_rate_limited_per_channel(self):
+        sender = self._sender(rate=10, burst=1, coalesce=False)
+        start = time.monotonic()
+
+        for i in range(4):
+            sender.send(Response('a', str(i)))
+
+        sender.stop(timeout=5)
+
+        assert len(self.slack.texts('a')) == 4
+        assert time.monotonic() - start >= 0.3
+
+
+    def test_retry_after_honored(self):
+        self.slack.limit_next = 1
+        self.slack.retry_after = 1
+        sender = self._sender(rate=1000, burst=1000)
+        start = time.monotonic()
+
+        sender.send(Response('a', 'hi'))
+        sender.stop(timeout=5)
+
+        assert self.slack.texts('a') == ['hi']
+        assert self.slack.posts[0].received - start >= 1
+        assert sender.counts['rate_limited'] == 1
+
+
+    def test_not_ok_counted_as_failed(self):
+        self.slack.fail_next = 1
+        sender = self._sender(rate=1000, burst=1000, coalesce=False)
+
+        sender.send(Response('a', 'lost'))
+        sender.send(Response('a', 'hi'))
+        sender.stop(timeout=5)
+
+        assert sender.counts['failed'] == 1
+        assert sender.counts['posts'] == 2
+
+
+    def test_send_done_once_posted(self):
+        self.slack.latency = 0.2
+        self.slack.fail_next = 1
+        sender = self._sender(rate=1000, burst=1000, coalesce=False)
+
+        lost = sender.send(Response('a', 'lost'))
+        posted = sender.send(Response('a', 'hi'))
+
+        assert not posted.done()
+        assert lost.result(timeout=5) is False
+        assert posted.result(timeout=5) is True
+        assert self.slack.texts('a') == ['lost', 'hi']
+        sender.stop(timeout=5)
+
+
+    def test_broken_server_does_not_stop_sender(self):
+        server = _Server(['garbage'] * 4)
+        self.addCleanup(server.stop)
+        sender = SlackSender('token', server.url, connections=1, rate=1000,
+                             burst=1000, coalesce=False)
+        sender.start()
+
+        for i in range(3):
+            sender.send(Response('a', str(i)))
+
+        sender.stop(timeout=2)
+
+        assert sender.pending() == 0
+        assert sender.counts['failed'] == 3
+        assert sender._scheduled == set()
@@ -0,0 +1,152 @@
+import asyncio
+from concurrent.futures import Future
+from queue import Queue
+from threading import Barrier, Lock, Thread
+import time
+import unittest
+
+from bot.config import Config
+from bot.slackbot import Bot, Message
+from bot.workers import ResponderPool
+from nli import CallbackRunner, Command
+
+
+def _sleep_command(conf):
+    async def sleep(args):
+        await asyncio.sleep(int(args['ms']) / 1000)
+        return args['ms']
+
+    return Command('sleep', 'Sleeps.', 'sleep <ms>', sleep)
+
+
+class ResponderPoolTests(unittest.TestCase):
+    def test_order_kept_within_channel(self):
+        handled = {}
+        lock = Lock()
+
+        def handler(message):
+            with lock:
+                handled.setdefault(message.channel, []).append(message.text)
+
+        pool = ResponderPool(handler, workers=3)
+        pool.start()
+
+        for i in range(100):
+            for channel in ['a', 'b', 'c', 'd']:
+                pool.submit(Message(channel, str(i)))
+
+        pool.stop()
+
+        for channel in ['a', 'b', 'c', 'd']:
+            assert handled[channel] == [str(i) for i in range(100)]
+
+
+    def test_channels_handled_in_parallel(self):
+        # Both handlers must be running at once for the barrier to release.
+        barrier = Barrier(2, timeout=5)
+        pool = ResponderPool(lambda message: barrier.wait(), workers=2)
+        pool.start()
+
+        channels = [f'channel-{i}' for i in range(50)]
+        workers = {hash(c) % 2: c for c in channels}
+        assert len(workers) == 2
+
+        for channel in workers.values():
+            pool.submit(Message(channel, 'hi'))
+
+        pool.stop()
+        assert not barrier.broken
+
+
+    def test_handler_errors_do_not_stop_worker(self):
+        handled = []
+
+        def handler(message):
+            if message.text == 'bad':
+                raise RuntimeError('bad message')
+            handled.append(message.text)
+
+        pool = ResponderPool(handler, workers=1)
+        pool.start()
+        pool.submit(Message('a', 'bad'))
+        pool.submit(Message('a', 'good'))
+        pool.stop()
+
+        assert handled == ['good']
+
+
+    def test_consume_until_terminated(self):
+        handled = []
+        source = Queue()
+        terminate = Queue(maxsize=1)
+        pool = ResponderPool(lambda message: handled.append(message.text))
+        pool.start()
+
+        consumer = Thread(target=pool.consume, args=(source, terminate))
+        consumer.start()
+
+        for i in range(10):
+            source.put(Message('a', str(i)))
+
+        terminate.put(True)
+        consumer.join(timeout=5)
+
+        assert not consumer.is_alive()
+        assert handled == [str(i) for i in range(10)]
+
+
+class RespondLaterTests(unittest.TestCase):
+    def setUp(self):
+        self.runner = CallbackRunner()
+        self.bot = Bot(
+                'token',
+                Config(['general'], [],
+                       commands=['bot.test_workers:_sleep_command'],
+                       command_entry_points=False),
+                runner=self.runner)
+        self.sent = []
+
+
+    def tearDown(self):
+        self.runner.close()
+
+
+    def test_returns_while_callbacks_wait(self):
+        start = time.monotonic()
+        answered = [
+            self.bot.respond_later(
+                    Message(f'c{i}', 'sleep 300'), self.sent.append)
+            for i in range(20)
+        ]
+
+        assert time.monotonic() - start < 0.2
+
+        for reply in answered:
+            reply.result(timeout=5)
+
+        assert time.monotonic() - start < 1.0
+        assert len(self.sent) == 20
+
+
+    def test_replies_sent_in_channel_order(self):
+        self.bot.respond_later(Message('a', 'sleep 300'), self.sent.append)
+        self.bot.respond_later(Message('a', 'sleep 0'), self.sent.append)
+        self.bot.respond_later(Message('b', 'sleep 100'), self.sent.append)
+        self.bot.wait_for_replies(timeout=5)
+
+        assert [(r.channel, r.message) for r in self.sent] ==\
+                [('b', '100'), ('a', '300'), ('a', '0')]
+        assert self.bot._replies == {}
+
+
+    def test_done_once_send_is_done(self):
+        posted = Future()
+        answered = self.bot.respond_later(
+                Message('a', 'sleep 0'), lambda response: posted)
+        self.bot.wait_for_replies(timeout=5)
+
+        assert not answered.done()
+
+        posted.set_result(True)
+
+        assert answered.result(timeout=1) is None
@@ -0,0 +1,96 @@
+'''Exports a `ResponderPool` class that handles incoming messages on a pool of
+worker threads.
+'''
+
+from queue import Queue
+from threading import Thread
+from typing import Any, Callable, List
+
+
+_STOP = object()  # Sentinel telling a worker or consumer loop to exit.
+
+
+class ResponderPool:
+    '''A fixed-size pool of threads that each call a `handler` on messages.
+
+    Every message is routed to a worker chosen by its `channel` attribute, so
+    that messages sent to the same channel are handled one at a time and in
+    the order they were submitted, while messages to different channels can
+    be handled in parallel.  Workers block while they have nothing to do.
+    '''
+
+    def __init__(self, handler: Callable[[Any], None], workers: int = 4):
+        if workers < 1:
+            raise ValueError('A ResponderPool needs at least one worker.')
+
+        self._handler = handler
+        self._queues: List[Queue] = [Queue() for _ in range(workers)]
+        self._threads = [
+            Thread(target=self._work, args=(queue,), daemon=True)
+            for queue in self._queues
+        ]
+
+
+    def _work(self, queue: Queue):
+        while True:
+            message = queue.get()
+
+            if message is _STOP:
+                return
+
+            try:
+                self._handler(message)
+            except Exception as err:
+                print(f'Failed to handle message {message}: {err!r}')
+
+
+    def start(self):
+        '''Start the pool's worker threads.
+        '''
+
+        for thread in self._threads:
+            thread.start()
+
+
+    def submit(self, message: Any):
+        '''Queue a message to be handled by the worker for its channel.
+        '''
+
+        worker = hash(message.channel) % len(self._queues)
+        self._queues[worker].put(message)
+
+
+    def stop(self):
+        '''Let the workers finish the messages already submitted to them and
+        wait for them to exit.
+        '''
+
+        for queue in self._queues:
+            queue.put(_STOP)
+
+        for thread in self._threads:
+            thread.join()
+
+
+    def consume(self, source: Queue, terminate: Queue):
+        '''Submit every message put on `source` to the pool until a value is
+        put on `terminate`, then stop the pool.
+
+        This function blocks until the pool has stopped.
+        '''
+
+        def wait_for_termination():
+            terminate.get()
+            source.put(_STOP)
+
+        Thread(target=wait_for_termination, daemon=True).start()
+
+        while True:
+            message = source.get()
+
+            if message is _STOP:
+                break
+
+            self.submit(message)
+
+        self.stop()
@@ -1 +0,0 @@
-from cmd.new_hire import new_hire
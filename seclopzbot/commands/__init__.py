@@ -0,0 +1 @@
+from commands.new_hire import new_hire
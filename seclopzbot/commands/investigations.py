@@ -0,0 +1,292 @@
+'''Commands that create, annotate, change the status of and show investigations
+kept in MozDef.
+
+Each command has its own factory, to list under `commands` in the bot's
+configuration, and every command built from the same MozDef settings shares
+one `MozDefClient`, so that its connections, batches and cache are shared
+too.
+'''
+
+from threading import Lock
+from typing import Callable, Dict, Optional, Tuple
+
+from bot.config import Config
+from bot.registry import on_reload
+from commands.mozdef import (
+    STATUSES, Investigation, MozDefClient, MozDefError, NotFound, Operation)
+from nli import Command
+
+
+_clients: Dict[Tuple, MozDefClient] = {}
+_clients_lock = Lock()
+
+
+def _settings(conf: Config) -> Tuple:
+    # The settings a `MozDefClient` is built from.
+    return (
+        conf.mozdef_url, conf.mozdef_connections, conf.mozdef_timeout,
+        conf.mozdef_batch_size, conf.mozdef_cache_ttl,
+    )
+
+
+def client_for(conf: Config) -> MozDefClient:
+    '''The `MozDefClient` for the MozDef settings in a bot's `Config`, created
+    the first time they are used.
+
+    A `ValueError` is raised if `mozdef_url` is not set.
+    '''
+
+    if conf.mozdef_url is None:
+        raise ValueError(
+            '`mozdef_url` must be set to use the investigation commands.')
+
+    key = _settings(conf)
+
+    with _clients_lock:
+        client = _clients.get(key)
+
+        if client is None:
+            client = MozDefClient(
+                    conf.mozdef_url,
+                    connections=conf.mozdef_connections,
+                    timeout=conf.mozdef_timeout,
+                    batch_size=conf.mozdef_batch_size,
+                    cache_ttl=conf.mozdef_cache_ttl)
+            _clients[key] = client
+
+        return client
+
+
+@on_reload
+def close_superseded_clients(conf: Config):
+    '''Close the clients for any MozDef settings other than those in `conf`,
+    once a bot has been reloaded with it, after sending the changes already
+    queued on them.
+    '''
+
+    with _clients_lock:
+        superseded = [
+            _clients.pop(key) for key in list(_clients)
+            if key != _settings(conf)
+        ]
+
+    for client in superseded:
+        client.close()
+
+
+def _command(
+        name: str,
+        help: str,
+        format: str,
+        callback: Callable[[Dict[str, Optional[str]]], str],
+        timeout: Optional[float],
+        anchored: bool = False) -> Command:
+    # Every investigation command waits on MozDef with a blocking client.
+    # Commands that change investigations are anchored, so that a message
+    # such as "don't close investigation 12" does not close it.
+    def respond(args):
+        try:
+            return callback(args)
+        except MozDefError as err:
+            return f'Sorry, something went wrong talking to MozDef. {err}'
+
+    return Command(
+            name=name,
+            help=help,
+            format=format,
+            callback=respond,
+            anchored=anchored,
+            blocking=True,
+            timeout=timeout)
+
+
+def start_investigation(
+        client: MozDefClient,
+        timeout: Optional[float] = None) -> Command:
+    '''Creates a `Command` that opens a new investigation.
+    '''
+
+    def callback(args):
+        investigation = client.create(args.get('title') or 'Untitled')
+        return f'Opened investigation {investigation.id}: '\
+                f'{investigation.title}'
+
+    return _command(
+            'start-investigation',
+            'Opens a new investigation in MozDef',
+            'seclopzbot (start | open) [a new | an] investigation '
+            '[(into | called | named) <title...>]',
+            callback,
+            timeout)
+
+
+def add_note(
+        client: MozDefClient,
+        timeout: Optional[float] = None) -> Command:
+    '''Creates a `Command` that adds a note to an investigation.
+    '''
+
+    def callback(args):
+        try:
+            client.add_note(args['id'], args['text'])
+        except NotFound:
+            return _missing(args['id'])
+
+        return f'Added your note to investigation {args["id"]}.'
+
+    return _command(
+            'add-note',
+            'Adds a note to an investigation in MozDef',
+            'seclopzbot add [a] note to investigation <id> <text...>',
+            callback,
+            timeout)
+
+
+def set_status(
+        client: MozDefClient,
+        timeout: Optional[float] = None) -> Command:
+    '''Creates a `Command` that changes the status of one or more
+    investigations at once.
+    '''
+
+    def callback(args):
+        status = args['status'].lower()
+
+        if status not in STATUSES:
+            return f'Investigations can be {_choices()}, not {status}.'
+
+        return _change(client, args['ids'].split(), status)
+
+    return _command(
+            'set-investigation-status',
+            'Changes the status of investigations in MozDef',
+            'seclopzbot mark investigation[s] <ids...> as <status>',
+            callback,
+            timeout,
+            anchored=True)
+
+
+def close_investigations(
+        client: MozDefClient,
+        timeout: Optional[float] = None) -> Command:
+    '''Creates a `Command` that closes one or more investigations at once.
+    '''
+
+    def callback(args):
+        return _change(client, args['ids'].split(), 'closed')
+
+    return _command(
+            'close-investigations',
+            'Closes investigations in MozDef',
+            'seclopzbot close investigation[s] <ids...>',
+            callback,
+            timeout,
+            anchored=True)
+
+
+def show_investigation(
+        client: MozDefClient,
+        timeout: Optional[float] = None) -> Command:
+    '''Creates a `Command` that summarizes an investigation.
+    '''
+
+    def callback(args):
+        try:
+            return _summary(client.get(args['id']))
+        except NotFound:
+            return _missing(args['id'])
+
+    return _command(
+            'show-investigation',
+            'Summarizes an investigation in MozDef',
+            'seclopzbot show investigation <id>',
+            callback,
+            timeout)
+
+
+def start_from_config(conf: Config) -> Command:
+    '''Creates the `start-investigation` command for a bot's `Config`.
+    '''
+
+    return start_investigation(client_for(conf), conf.mozdef_timeout)
+
+
+def note_from_config(conf: Config) -> Command:
+    '''Creates the `add-note` command for a bot's `Config`.
+    '''
+
+    return add_note(client_for(conf), conf.mozdef_timeout)
+
+
+def status_from_config(conf: Config) -> Command:
+    '''Creates the `set-investigation-status` command for a bot's `Config`.
+    '''
+
+    return set_status(client_for(conf), conf.mozdef_timeout)
+
+
+def close_from_config(conf: Config) -> Command:
+    '''Creates the `close-investigations` command for a bot's `Config`.
+    '''
+
+    return close_investigations(client_for(conf), conf.mozdef_timeout)
+
+
+def show_from_config(conf: Config) -> Command:
+    '''Creates the `show-investigation` command for a bot's `Config`.
+    '''
+
+    return show_investigation(client_for(conf), conf.mozdef_timeout)
+
+
+def _change(client: MozDefClient, ids, status: str) -> str:
+    # The changes are queued together, so they are sent in as few requests as
+    # the batch size allows, and the failures are reported together.  Nothing
+    # is changed unless every id is a number.
+    invalid = [id for id in ids if not (id.isascii() and id.isdigit())]
+
+    if invalid:
+        return f'Investigation ids are numbers, not {", ".join(invalid)}, '\
+                f'so nothing was changed.'
+
+    errors = client.apply([Operation(id, status=status) for id in ids])
+    changed = [id for (id, error) in zip(ids, errors) if error is None]
+    missing = [id for (id, error) in zip(ids, errors)
+               if isinstance(error, NotFound)]
+    failed = [error for error in errors
+              if error is not None and not isinstance(error, NotFound)]
+    lines = []
+
+    if changed:
+        lines.append(f'Marked investigation{_plural(changed)} '
+                     f'{", ".join(changed)} as {status}.')
+
+    if missing:
+        lines.append(f'There is no investigation {", ".join(missing)}.')
+
+    if failed:
+        lines.append(
+            f'Sorry, something went wrong talking to MozDef. {failed[0]}')
+
+    return '\n'.join(lines)
+
+
+def _summary(investigation: Investigation) -> str:
+    lines = [
+        f'Investigation {investigation.id}: {investigation.title} '
+        f'({investigation.status})'
+    ]
+    lines += [f'  * {note}' for note in investigation.notes]
+    return '\n'.join(lines)
+
+
+def _missing(id: str) -> str:
+    return f'There is no investigation {id}.'
+
+
+def _plural(items) -> str:
+    return 's' if len(items) > 1 else ''
+
+
+def _choices() -> str:
+    return ', '.join(STATUSES[:-1]) + ' or ' + STATUSES[-1]
@@ -0,0 +1,377 @@
+'''Exports a `MozDefClient` class for the investigations kept by MozDef, which
+the investigation commands are built on.
+
+The client expects MozDef to serve the following under its base URL:
+
+    * `POST investigations` with `{"title": ...}` creates an investigation and
+    answers `201` with it.
+    * `GET investigations/<id>` answers with an investigation, or `404`.
+    * `POST investigations/bulk` with `{"operations": [...]}`, where each
+    operation is `{"id": ..., "note": ...}` or `{"id": ..., "status": ...}`,
+    applies them in order and answers `{"results": [...]}`, with one
+    `{"ok": true}` or `{"ok": false, "error": ...}` for each.
+
+Investigations are JSON objects with an `id`, `title`, `status` and a list of
+`notes`.
+'''
+
+from concurrent.futures import Future, TimeoutError as WaitTimeout
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+import http.client
+import json
+from queue import Empty, Queue
+from threading import Lock, Thread
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from bot.http import ConnectionPool, HttpResponse
+from nli.cache import ResultCache
+
+
+STATUSES = ('open', 'escalated', 'closed')
+
+
+class MozDefError(Exception):
+    '''Raised when MozDef cannot be reached or refuses a request.
+    '''
+
+
+class NotFound(MozDefError):
+    '''Raised when an investigation does not exist.
+    '''
+
+
+@dataclass
+class Investigation:
+    '''An investigation as MozDef describes it.
+    '''
+
+    id: str
+    title: str
+    status: str
+    notes: List[str] = field(default_factory=list)
+
+
+    def from_json(values: Dict[str, Any]) -> 'Investigation':
+        return Investigation(
+                str(values['id']),
+                values.get('title', ''),
+                values.get('status', 'open'),
+                list(values.get('notes', [])))
+
+
+@dataclass
+class Operation:
+    '''A change to an investigation that can be sent to MozDef in a batch:
+    adding a `note`, or setting its `status`.
+    '''
+
+    id: str
+    note: Optional[str] = field(default=None)
+    status: Optional[str] = field(default=None)
+
+
+    def to_json(self) -> Dict[str, str]:
+        if self.note is not None:
+            return {'id': self.id, 'note': self.note}
+
+        return {'id': self.id, 'status': self.status}
+
+
+class MozDefClient:
+    '''Talks to MozDef at `base_url` over up to `connections` keep-alive
+    connections.
+
+        * Notes and status changes are queued and sent by `connections`
+        background threads, each of which sends every operation waiting, up to
+        `batch_size` of them, in a single bulk request.  When MozDef is slow,
+        operations queue up behind the requests in flight and go out together,
+        while a lone operation is sent at once.  Waiting `batch_delay`
+        seconds for more operations before sending trades latency for fewer
+        requests.
+        * Investigations looked up with `get` are kept for `cache_ttl`
+        seconds, in a cache of up to `cache_size`, and dropped from it when
+        this client changes them.  Changes made elsewhere can take up to
+        `cache_ttl` seconds to be seen, so it should be kept short.
+        * A client closed while calls to it are still waiting on MozDef is
+        only shut down once the last of them returns.
+    '''
+
+    def __init__(
+            self,
+            base_url: str,
+            connections: int = 4,
+            timeout: float = 10.0,
+            batch_size: int = 50,
+            batch_delay: float = 0.0,
+            cache_size: int = 256,
+            cache_ttl: float = 5.0,
+            pool: Optional[ConnectionPool] = None):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.requests = 0
+        self.pool = pool if pool is not None else\
+                ConnectionPool(base_url, connections, timeout)
+        self.cache = ResultCache(cache_size, cache_ttl)
+        self._pending: Queue = Queue()
+        self._senders: List[Thread] = []
+        self._users = 0
+        self._closing = False
+        self._lock = Lock()
+
+
+    def _request(
+            self,
+            method: str,
+            path: str,
+            body: Optional[Any] = None) -> HttpResponse:
+        data = None if body is None else json.dumps(body).encode('utf-8')
+        headers = {'Content-Type': 'application/json'} if data else {}
+
+        with self._lock:
+            self.requests += 1
+
+        try:
+            response = self.pool.request(method, path, data, headers)
+        except (OSError, http.client.HTTPException) as err:
+            raise MozDefError(f'Could not reach MozDef: {err}')
+
+        if response.status == 404:
+            raise NotFound(f'MozDef has no {path}.')
+
+        if response.status >= 300:
+            raise MozDefError(
+                f'MozDef answered {method} {path} with {response.status}.')
+
+        return response
+
+
+    @contextmanager
+    def _using(self):
+        # Counts the calls in progress, so that `close` can leave shutting
+        # the client down to the last of them.
+        with self._lock:
+            self._users += 1
+
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._users -= 1
+                last = self._closing and self._users == 0
+
+            if last:
+                self._shutdown()
+
+
+    def create(self, title: str) -> Investigation:
+        '''Open a new investigation.
+        '''
+
+        with self._using():
+            response = self._request(
+                    'POST', 'investigations', {'title': title})
+            return Investigation.from_json(response.json())
+
+
+    def get(self, id: str) -> Investigation:
+        '''Look up an investigation, raising `NotFound` if there is none.
+        '''
+
+        investigation = self.cache.get(id)
+
+        if investigation is None:
+            with self._using():
+                response = self._request('GET', f'investigations/{id}')
+                investigation = Investigation.from_json(response.json())
+
+            self.cache.put(id, investigation)
+
+        return investigation
+
+
+    def add_note(self, id: str, note: str):
+        '''Add a note to an investigation.
+        '''
+
+        self._raise_first(self.apply([Operation(id, note=note)]))
+
+
+    def set_status(self, id: str, status: str):
+        '''Change the status of an investigation.
+        '''
+
+        self._raise_first(self.apply([Operation(id, status=status)]))
+
+
+    def apply(
+            self,
+            operations: Sequence[Operation],
+            timeout: Optional[float] = None) -> List[Optional[MozDefError]]:
+        '''Queue operations to be sent in batches and wait up to `timeout`
+        seconds, or the client's `timeout` if not given, for all of them to be
+        applied, returning the error each failed with, or `None` for those
+        that succeeded.
+
+        Operations not applied in time fail with a `MozDefError`, though they
+        may still be applied later.
+        '''
+
+        if timeout is None:
+            timeout = self.timeout
+
+        with self._using():
+            futures = [self._submit(operation) for operation in operations]
+            deadline = time.monotonic() + timeout
+            errors: List[Optional[MozDefError]] = []
+
+            for (operation, future) in zip(operations, futures):
+                try:
+                    errors.append(future.exception(
+                            max(0.0, deadline - time.monotonic())))
+                except WaitTimeout:
+                    errors.append(MozDefError(
+                        f'MozDef did not change investigation {operation.id} '
+                        f'within {timeout} seconds.'))
+
+            return errors
+
+
+    def _raise_first(self, errors: List[Optional[MozDefError]]):
+        for error in errors:
+            if error is not None:
+                raise error
+
+
+    def _submit(self, operation: Operation) -> Future:
+        future: Future = Future()
+
+        with self._lock:
+            if len(self._senders) == 0:
+                self._senders = [
+                    Thread(
+                        target=self._send,
+                        args=(self._pending,),
+                        name='mozdef-batch',
+                        daemon=True)
+                    for _ in range(self.pool.size)
+                ]
+
+                for sender in self._senders:
+                    sender.start()
+
+            # Queued while holding the lock, so that the operation goes to
+            # the senders just checked, and not to a queue `close` has
+            # replaced since.
+            self._pending.put((operation, future))
+
+        return future
+
+
+    def _next_batch(
+            self,
+            pending: Queue) -> Optional[List[Tuple[Operation, Future]]]:
+        first = pending.get()
+
+        if first is None:
+            pending.put(None)
+            return None
+
+        batch = [first]
+
+        while len(batch) < self.batch_size:
+            try:
+                if self.batch_delay > 0:
+                    item = pending.get(timeout=self.batch_delay)
+                else:
+                    item = pending.get_nowait()
+            except Empty:
+                break
+
+            if item is None:
+                pending.put(None)
+                break
+
+            batch.append(item)
+
+        return batch
+
+
+    def _send(self, pending: Queue):
+        while True:
+            batch = self._next_batch(pending)
+
+            if batch is None:
+                return
+
+            try:
+                response = self._request('POST', 'investigations/bulk', {
+                    'operations': [op.to_json() for (op, _) in batch],
+                })
+                results = response.json()['results']
+
+                if not isinstance(results, list):
+                    raise MozDefError(
+                        f'Bad answer from MozDef: {results!r} is not a list '
+                        f'of results.')
+            except Exception as err:
+                for (_, future) in batch:
+                    future.set_exception(
+                        err if isinstance(err, MozDefError) else
+                        MozDefError(f'Bad answer from MozDef: {err!r}'))
+                continue
+
+            for ((operation, future), result) in zip(batch, results):
+                self.cache.discard(operation.id)
+
+                if not isinstance(result, dict):
+                    future.set_exception(MozDefError(
+                        f'Bad answer from MozDef for investigation '
+                        f'{operation.id}: {result!r}'))
+                elif result.get('ok'):
+                    future.set_result(None)
+                elif result.get('error') == 'not_found':
+                    future.set_exception(NotFound(
+                        f'There is no investigation {operation.id}.'))
+                else:
+                    future.set_exception(MozDefError(
+                        f'MozDef refused to change investigation '
+                        f'{operation.id}: {result.get("error")}'))
+
+            for (_, future) in batch[len(results):]:
+                future.set_exception(
+                    MozDefError('MozDef did not answer every operation.'))
+
+
+    def close(self):
+        '''Stop the background senders once the operations already queued
+        are sent, and close the client's connections.
+
+        If calls to the client are in progress, this is left to the last of
+        them to finish.  Calls made after the client is closed still work,
+        and the last of those closes it again.
+        '''
+
+        with self._lock:
+            self._closing = True
+            idle = self._users == 0
+
+        if idle:
+            self._shutdown()
+
+
+    def _shutdown(self):
+        with self._lock:
+            (senders, pending) = (self._senders, self._pending)
+            (self._senders, self._pending) = ([], Queue())
+
+        if len(senders) > 0:
+            pending.put(None)
+
+        for sender in senders:
+            sender.join()
+
+        self.pool.close()
@@ -1,11 +1,16 @@
 from typing import Callable, Dict, List, Optional
 
-from nli import Command, Parser, Transition
+from bot.config import Config
+from nli import Command, Parser, ResultCache, Transition
 
 
-def new_hire(links: Optional[List[str]] = None) -> Command:
+def new_hire(
+        links: Optional[List[str]] = None,
+        cache: Optional[ResultCache] = None) -> Command:
     '''Creates a `Command` that, when invoked, produces a message with links
     to useful documents for new hires to read about security practices.
+
+    The response only depends on `links`, so it can be served from `cache`.
     '''
 
     return Command(
@@ -13,6 +18,7 @@ def new_hire(links: Optional[List[str]] = None) -> Command:
         help='Links to useful security information for new hires',
         format='(...) new hire[s]',
         callback=_respond(links),
+        cache=cache,
         parser=Parser(
             start='start',
             end='hire',
@@ -25,6 +31,16 @@ def new_hire(links: Optional[List[str]] = None) -> Command:
         ))
 
 
+def from_config(conf: Config) -> Command:
+    '''Creates the `new-hires` command from the links in a bot's `Config`,
+    caching its responses as configured.
+    '''
+
+    return new_hire(
+            conf.new_hire_links,
+            ResultCache(conf.cache_size, conf.cache_ttl))
+
+
 def _respond(links: Optional[List[str]]) -> Callable[[Dict[str, str]], str]:
     def callback(args):
         if links is None:
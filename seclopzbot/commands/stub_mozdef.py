@@ -0,0 +1,177 @@
+'''Exports a `StubMozDef` class, a local stand-in for the MozDef investigations
+API used to test and benchmark the investigation commands without MozDef.
+'''
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+from threading import Lock, Thread
+import time
+from typing import Dict, List
+
+from commands.mozdef import STATUSES
+
+
+class _Server(ThreadingHTTPServer):
+    # Clients that open a connection for every request can have many waiting
+    # to be accepted at once.
+    request_queue_size = 128
+    daemon_threads = True
+
+
+class StubMozDef:
+    '''Serves the investigations API described in `commands.mozdef` on
+    `127.0.0.1` from a background thread, keeping investigations in memory.
+
+    Every request is answered after `latency` seconds, however many
+    operations it carries, and every new connection waits a further
+    `connect_latency` seconds before its first request is read, as a TLS
+    handshake would.  The results of the next `garble_next` bulk operations
+    are answered with `null` rather than a JSON object, as a broken server
+    might.  `requests` counts the requests received by method and path, with
+    investigation ids replaced by `<id>`, and `connections` counts the
+    connections clients have opened.
+    '''
+
+    def __init__(self, latency: float = 0.0, connect_latency: float = 0.0):
+        self.latency = latency
+        self.connect_latency = connect_latency
+        self.garble_next = 0
+        self.investigations: Dict[str, dict] = {}
+        self.requests: Dict[str, int] = {}
+        self.connections = 0
+        self._lock = Lock()
+        self._server = _Server(('127.0.0.1', 0), self._handler())
+        self._thread = Thread(
+                target=self._server.serve_forever,
+                kwargs={'poll_interval': 0.05},
+                daemon=True)
+
+
+    @property
+    def url(self) -> str:
+        (host, port) = self._server.server_address
+        return f'http://{host}:{port}/api/'
+
+
+    def notes(self, id: str) -> List[str]:
+        with self._lock:
+            return list(self.investigations[id]['notes'])
+
+
+    def _apply(self, operation: dict) -> dict:
+        # Must be called while holding `self._lock`.
+        investigation = self.investigations.get(str(operation.get('id')))
+
+        if investigation is None:
+            return {'ok': False, 'error': 'not_found'}
+
+        if 'note' in operation:
+            investigation['notes'].append(operation['note'])
+        elif operation.get('status') in STATUSES:
+            investigation['status'] = operation['status']
+        else:
+            return {'ok': False, 'error': 'invalid_operation'}
+
+        return {'ok': True}
+
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+
+                with stub._lock:
+                    stub.connections += 1
+
+                if stub.connect_latency > 0:
+                    time.sleep(stub.connect_latency)
+
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, status: int, body: dict):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _route(self) -> List[str]:
+                parts = self.path.strip('/').split('/')[1:]
+
+                with stub._lock:
+                    key = ' '.join([self.command] + [
+                        '<id>' if i == 1 and part != 'bulk' else part
+                        for (i, part) in enumerate(parts)
+                    ])
+                    stub.requests[key] = stub.requests.get(key, 0) + 1
+
+                if stub.latency > 0:
+                    time.sleep(stub.latency)
+
+                return parts
+
+            def do_GET(self):
+                parts = self._route()
+
+                with stub._lock:
+                    found = None if len(parts) != 2 else\
+                            stub.investigations.get(parts[1])
+                    found = None if found is None else dict(
+                            found, notes=list(found['notes']))
+
+                if found is None:
+                    self._reply(404, {'error': 'not_found'})
+                else:
+                    self._reply(200, found)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                body = json.loads(self.rfile.read(length) or b'{}')
+                parts = self._route()
+
+                if parts == ['investigations']:
+                    with stub._lock:
+                        id = str(len(stub.investigations) + 1)
+                        stub.investigations[id] = {
+                            'id': id,
+                            'title': body.get('title', ''),
+                            'status': 'open',
+                            'notes': [],
+                        }
+                        created = dict(stub.investigations[id], notes=[])
+
+                    self._reply(201, created)
+                elif parts == ['investigations', 'bulk']:
+                    with stub._lock:
+                        results = [
+                            stub._apply(operation)
+                            for operation in body.get('operations', [])
+                        ]
+
+                        for i in range(min(stub.garble_next, len(results))):
+                            results[i] = None
+
+                        stub.garble_next -= min(
+                                stub.garble_next, len(results))
+
+                    self._reply(200, {'results': results})
+                else:
+                    self._reply(404, {'error': 'not_found'})
+
+        return Handler
+
+
+    def start(self):
+        self._thread.start()
+
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
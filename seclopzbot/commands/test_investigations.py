@@ -0,0 +1,205 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from threading import Thread
+import time
+import unittest
+
+from bot.config import Config
+from bot.slackbot import Bot
+from commands import investigations
+from commands.mozdef import MozDefClient, Operation
+from commands.stub_mozdef import StubMozDef
+from nli.parser import ParseError
+
+
+class InvestigationTests(unittest.TestCase):
+    def setUp(self):
+        self.mozdef = StubMozDef()
+        self.mozdef.start()
+        self.client = MozDefClient(self.mozdef.url, connections=2)
+        self.start = investigations.start_investigation(self.client)
+        self.note = investigations.add_note(self.client)
+        self.status = investigations.set_status(self.client)
+        self.close = investigations.close_investigations(self.client)
+        self.show = investigations.show_investigation(self.client)
+
+
+    def tearDown(self):
+        self.client.close()
+        self.mozdef.stop()
+
+
+    def test_investigation_lifecycle(self):
+        assert self.start.execute(
+                'seclopzbot start a new investigation into phishing at '
+                'the paris office') ==\
+            'Opened investigation 1: phishing at the paris office'
+        assert self.note.execute(
+                'seclopzbot add a note to investigation 1 the login came '
+                'from a known VPN') ==\
+            'Added your note to investigation 1.'
+        assert self.status.execute(
+                'seclopzbot mark investigation 1 as escalated') ==\
+            'Marked investigation 1 as escalated.'
+        assert self.show.execute('seclopzbot show investigation 1') ==\
+            'Investigation 1: phishing at the paris office (escalated)\n'\
+            '  * the login came from a known VPN'
+
+        assert self.close.execute('seclopzbot close investigation 1') ==\
+            'Marked investigation 1 as closed.'
+        assert self.mozdef.investigations['1']['status'] == 'closed'
+
+
+    def test_missing_investigations(self):
+        self.start.execute('seclopzbot open an investigation')
+
+        assert self.show.execute('seclopzbot show investigation 9') ==\
+            'There is no investigation 9.'
+        assert self.note.execute('seclopzbot add note to investigation 9 x')\
+            == 'There is no investigation 9.'
+        assert self.close.execute('seclopzbot close investigations 1 8 9')\
+            == 'Marked investigation 1 as closed.\n'\
+            'There is no investigation 8, 9.'
+
+
+    def test_unknown_status(self):
+        self.start.execute('seclopzbot open an investigation')
+
+        assert self.status.execute('seclopzbot mark investigation 1 as done')\
+            == 'Investigations can be open, escalated or closed, not done.'
+        assert self.mozdef.investigations['1']['status'] == 'open'
+
+
+    def test_changes_refused_unless_exactly_as_written(self):
+        self.start.execute('seclopzbot open an investigation')
+
+        for (command, message) in [
+                (self.close, 'seclopzbot don\'t close investigation 1'),
+                (self.status, 'seclopzbot mark investigation 1 as closed now'),
+                ]:
+            with self.assertRaises(ParseError):
+                command.compiled.parse(message)
+
+        assert self.close.execute('seclopzbot close investigation 1 yet') ==\
+            'Investigation ids are numbers, not yet, so nothing was changed.'
+        assert self.mozdef.investigations['1']['status'] == 'open'
+        assert self.mozdef.requests.get('POST investigations bulk') is None
+
+
+    def test_lookups_cached_until_changed(self):
+        self.start.execute('seclopzbot open an investigation')
+
+        for _ in range(3):
+            self.show.execute('seclopzbot show investigation 1')
+
+        assert self.mozdef.requests['GET investigations <id>'] == 1
+
+        self.note.execute('seclopzbot add a note to investigation 1 seen')
+
+        assert 'seen' in self.show.execute('seclopzbot show investigation 1')
+        assert self.mozdef.requests['GET investigations <id>'] == 2
+
+
+    def test_bulk_changes_sent_together(self):
+        for _ in range(5):
+            self.start.execute('seclopzbot open an investigation')
+
+        self.close.execute('seclopzbot close investigations 1 2 3 4 5')
+
+        assert self.mozdef.requests['POST investigations bulk'] == 1
+        assert all(
+            investigation['status'] == 'closed'
+            for investigation in self.mozdef.investigations.values())
+
+
+    def test_concurrent_notes_batched_over_kept_alive_connections(self):
+        self.mozdef.latency = 0.02
+        self.client.create('phishing')
+        texts = [f'note {i}' for i in range(40)]
+
+        with ThreadPoolExecutor(20) as pool:
+            list(pool.map(lambda text: self.client.add_note('1', text), texts))
+
+        assert sorted(self.mozdef.notes('1')) == sorted(texts)
+        assert self.mozdef.requests['POST investigations bulk'] <= 10
+        assert self.mozdef.connections <= 2
+
+
+    def test_unreachable_mozdef(self):
+        self.mozdef.stop()
+
+        assert self.show.execute('seclopzbot show investigation 1')\
+            .startswith('Sorry, something went wrong talking to MozDef.')
+        assert self.close.execute('seclopzbot close investigation 1')\
+            .startswith('Sorry, something went wrong talking to MozDef.')
+
+
+    def test_commands_share_a_client(self):
+        conf = Config(['general'], [], mozdef_url=self.mozdef.url)
+
+        assert investigations.client_for(conf) is\
+            investigations.client_for(Config(['other'], [],
+                                             mozdef_url=self.mozdef.url))
+
+        with self.assertRaises(ValueError):
+            investigations.show_from_config(Config(['general'], []))
+
+
+    def test_apply_gives_up_after_timeout(self):
+        self.client.create('slow')
+        self.mozdef.latency = 0.5
+        errors = self.client.apply([Operation('1', note='late')], timeout=0.1)
+
+        assert 'within 0.1 seconds' in str(errors[0])
+
+
+    def test_reload_closes_superseded_clients(self):
+        other = StubMozDef()
+        other.start()
+        self.addCleanup(other.stop)
+        conf = Config(['general'], [], mozdef_url=self.mozdef.url,
+                      commands=['commands.investigations:note_from_config'],
+                      command_entry_points=False)
+        bot = Bot('token', conf)
+        bot.warm(background=False)
+        old = investigations.client_for(conf)
+        old.create('first')
+        old.add_note('1', 'hi')
+
+        bot.reload(replace(conf, mozdef_url=other.url))
+
+        assert old._senders == []
+        assert old not in investigations._clients.values()
+        assert self.mozdef.notes('1') == ['hi']
+
+
+    def test_malformed_result_fails_only_its_operation(self):
+        self.client.create('first')
+        self.mozdef.garble_next = 1
+        errors = self.client.apply(
+                [Operation('1', note='lost'), Operation('1', note='kept')],
+                timeout=2)
+
+        assert 'Bad answer from MozDef' in str(errors[0])
+        assert errors[1] is None
+        assert self.client.apply([Operation('1', note='later')],
+                                 timeout=2) == [None]
+
+
+    def test_closed_once_calls_in_progress_finish(self):
+        self.client.create('slow')
+        self.mozdef.latency = 0.3
+        errors = []
+        call = Thread(target=lambda: errors.extend(
+                self.client.apply([Operation('1', note='in flight')])))
+        call.start()
+
+        while self.client._users == 0:
+            time.sleep(0.01)
+
+        self.client.close()
+        errors += self.client.apply([Operation('1', note='late')])
+        call.join()
+
+        assert errors == [None, None]
+        assert self.client._senders == []
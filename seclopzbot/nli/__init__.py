@@ -1,3 +1,8 @@
+from nli.cache import ResultCache
 from nli.command import Command
+from nli.compiled import CompiledParser, compile_parser
+from nli.dispatch import Dispatch, Dispatcher
+from nli.format import FormatError, check_parser, compile_format
 from nli.parser import Parser
+from nli.runner import CallbackRunner
 from nli.transition import Transition
@@ -0,0 +1,83 @@
+'''Exports a `ResultCache` class, a size and time bounded cache of `Command`
+callback results.
+'''
+
+from collections import OrderedDict
+from threading import Lock
+import time
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+
+class ResultCache:
+    '''A least recently used cache of up to `size` entries, each of which
+    expires `ttl` seconds after it was stored.
+
+    `hits` and `misses` count the lookups that did and did not find an entry.
+    '''
+
+    def __init__(
+            self,
+            size: int = 128,
+            ttl: float = 300.0,
+            clock: Callable[[], float] = time.monotonic):
+        self.size = size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._entries: 'OrderedDict[Hashable, Tuple[float, Any]]' =\
+                OrderedDict()
+        self._lock = Lock()
+
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        '''Look up the value stored for `key`, or `None` if there is no
+        unexpired entry for it.
+        '''
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None or entry[0] <= self._clock():
+                if entry is not None:
+                    del self._entries[key]
+
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+
+    def put(self, key: Hashable, value: Any):
+        '''Store a value for `key`, evicting the least recently used entry if
+        the cache is full.
+        '''
+
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+
+            if len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+
+    def discard(self, key: Hashable):
+        '''Remove the entry for `key`, if there is one.
+        '''
+
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+    def clear(self):
+        '''Remove every entry.
+        '''
+
+        with self._lock:
+            self._entries.clear()
+
+
+    def __len__(self) -> int:
+        return len(self._entries)
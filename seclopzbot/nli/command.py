@@ -2,14 +2,26 @@
 of processing.
 '''
 
+import asyncio
 from dataclasses import dataclass, field
-from typing import Callable, Dict, Generic, List, Optional, TypeVar
+import inspect
+from typing import\
+    Awaitable, Callable, Dict, Generic, Optional, Tuple, TypeVar, Union
 
-from nli.parser import Parser
+from nli.cache import ResultCache
+from nli.compiled import CompiledParser, compile_parser
+from nli.format import compile_format
+from nli.parser import Parser, tokenize
+from nli.runner import CallbackRunner, default_runner
+from nli.tablecache import TableCache
 
 
 E = TypeVar('E', bound=Exception)  # Generic type that subclasses `Exception`.
 
+# The tokens of an input string, which the results of a `Command` with a cache
+# are cached under.
+CacheKey = Tuple[str, ...]
+
 
 @dataclass
 class CmdError(Exception, Generic[E]):
@@ -30,28 +42,224 @@ class Command:
         * `format` describes the expected input format using the conventions
         defined in [The NLI doc](seclopzbot/docs/nli.md#documentation).
         * `callback` is a function that will be called with all parsed parameters
-        and is expected to return a string message to write back to Slack.
+        and is expected to return a string message to write back to Slack.  It
+        may be a coroutine function, in which case it is run on a
+        `CallbackRunner`'s event loop alongside the callbacks of other
+        messages.
         * `parser` is a description of the deterministic pushdown automaton (DPDA)
         that parses input conforming to the expected format for the command.
+        If it is not given, it is compiled from `format` by `compile_format`.
+        * `cache` is an optional `ResultCache` for commands whose callbacks
+        always return the same message for the same parameters.  Results are
+        cached by the tokens of the input, so that input answered before is
+        answered again without being parsed.
+        * `tables` is an optional `TableCache` to read the parser compiled
+        from `format` from, when no `parser` is given.
+        * `anchored` compiles `format` so that input with words the format
+        has no place for is rejected rather than having them skipped, for
+        commands that should not act on a message like "don't close it".
+        * `blocking` marks a callback that is an ordinary function which
+        blocks, such as on network I/O, so that it is run on the
+        `CallbackRunner`'s threads rather than the thread invoking it.
+        * `timeout` is the number of seconds a coroutine or `blocking`
+        callback may take before the invocation fails with a `CmdError`.
+        * `concurrency` limits how many coroutine or `blocking` callbacks of
+        commands of the same name run at once.
+        * `runner` is the `CallbackRunner` that coroutine and `blocking`
+        callbacks run on, or the one shared by every command if not given.
+
+    The `parser` is compiled into a `CompiledParser` when the `Command` is
+    created, and it is the compiled form that is used to parse input.
     '''
 
     name: str
     help: str
     format: str
-    callback: Callable[[Dict[str, Optional[str]]], str]
-    parser: Parser
+    callback: Callable[
+            [Dict[str, Optional[str]]], Union[str, Awaitable[str]]]
+    parser: Optional[Parser] = field(default=None)
+    cache: Optional[ResultCache] =\
+            field(default=None, repr=False, compare=False)
+    tables: Optional[TableCache] =\
+            field(default=None, repr=False, compare=False)
+    anchored: bool = field(default=False)
+    blocking: bool = field(default=False)
+    timeout: Optional[float] = field(default=None)
+    concurrency: Optional[int] = field(default=None)
+    runner: Optional[CallbackRunner] =\
+            field(default=None, repr=False, compare=False)
+    compiled: CompiledParser = field(init=False, repr=False, compare=False)
+
+
+    def __post_init__(self):
+        if self.parser is None:
+            self.parser = compile_format(
+                    self.format, tables=self.tables, anchored=self.anchored)
+
+        self.compiled = compile_parser(self.parser)
+
+
+    @property
+    def is_async(self) -> bool:
+        '''Whether the callback is run by the `CallbackRunner`, rather than
+        called directly by the thread invoking the command.
+        '''
+
+        return self.blocking or inspect.iscoroutinefunction(self.callback)
 
 
     def execute(self, input_str: str) -> str:
         '''Parse an input string to execute a command's callback with any
         extracted parameters.
+
+        With a `cache`, input with the same tokens as input answered before
+        is answered from it without being parsed.
+        '''
+
+        key = None
+
+        if self.cache is not None:
+            key = tuple(tokenize(input_str))
+            cached = self.cached(key)
+
+            if cached is not None:
+                return cached[1]
+
+        args = self.compiled.parse(input_str)
+
+        return self.invoke(args, key)
+
+
+    def cached(
+            self,
+            key: CacheKey
+            ) -> Optional[Tuple[Dict[str, Optional[str]], str]]:
+        '''The parameters parsed from and the message answering input with
+        the tokens `key`, if they are in the command's `cache`.
+        '''
+
+        if self.cache is None:
+            return None
+
+        entry = self.cache.get(key)
+
+        if entry is None:
+            return None
+
+        return (dict(entry[0]), entry[1])
+
+
+    def invoke(
+            self,
+            args: Dict[str, Optional[str]],
+            key: Optional[CacheKey] = None) -> str:
+        '''Call the command's callback with already parsed parameters,
+        raising a `CmdError` if it fails.  If the command has a `cache`, the
+        message is cached under `key`, the tokens of the input `args` were
+        parsed from, when it is given.
+
+        Callbacks run by the `CallbackRunner` are waited on, with the
+        command's `timeout` and `concurrency` applied.
+        '''
+
+        if self.is_async:
+            return self._runner().run(self.invoke_async(args, key))
+
+        message = self._call(args)
+        self._remember(key, args, message)
+
+        return message
+
+
+    async def invoke_async(
+            self,
+            args: Dict[str, Optional[str]],
+            key: Optional[CacheKey] = None) -> str:
+        '''Call the command's callback with already parsed parameters
+        without blocking the event loop, raising a `CmdError` if it fails or
+        takes longer than the command's `timeout`.  The message is cached as
+        by `invoke`.
+
+        Callbacks that are neither coroutine functions nor `blocking` are
+        called directly.  If awaited on any loop other than the
+        `CallbackRunner`'s, the call is made on the runner's loop.
         '''
 
-        args = self.parser.parse(input_str)
+        if not self.is_async:
+            return self.invoke(args, key)
+
+        runner = self._runner()
+
+        if asyncio.get_running_loop() is not runner.loop:
+            return await asyncio.wrap_future(
+                    runner.submit(self.invoke_async(args, key)))
+
+        message = await self._call_async(runner, args)
+        self._remember(key, args, message)
+
+        return message
 
+
+    def _remember(
+            self,
+            key: Optional[CacheKey],
+            args: Dict[str, Optional[str]],
+            message: str):
+        if self.cache is not None and key is not None:
+            self.cache.put(key, (dict(args), message))
+
+
+    def _runner(self) -> CallbackRunner:
+        return self.runner if self.runner is not None else default_runner()
+
+
+    def _call(self, args: Dict[str, Optional[str]]) -> str:
         try:
             return self.callback(args)
         except Exception as cause:
             raise CmdError(
                 f'Callback invocation with arguments {args} failed.',
                 cause)
+
+
+    async def _call_async(
+            self,
+            runner: CallbackRunner,
+            args: Dict[str, Optional[str]]) -> str:
+        if self.concurrency is None:
+            return await self._wait_for(runner, args)
+
+        async with runner.limit(self.name, self.concurrency):
+            return await self._wait_for(runner, args)
+
+
+    async def _wait_for(
+            self,
+            runner: CallbackRunner,
+            args: Dict[str, Optional[str]]) -> str:
+        # A blocking callback that times out is left to finish on its thread.
+        try:
+            if self.blocking:
+                call = runner.in_thread(self.callback, args)
+            else:
+                call = self.callback(args)
+
+            return await asyncio.wait_for(call, self.timeout)
+        except asyncio.TimeoutError as cause:
+            raise CmdError(
+                f'Callback invocation with arguments {args} timed out after '
+                f'{self.timeout} seconds.',
+                cause)
+        except Exception as cause:
+            raise CmdError(
+                f'Callback invocation with arguments {args} failed.',
+                cause)
+
+
+    def invalidate_cache(self):
+        '''Discard all cached results, such as when the data a callback
+        responds with has changed.
+        '''
+
+        if self.cache is not None:
+            self.cache.clear()
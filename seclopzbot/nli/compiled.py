@@ -0,0 +1,310 @@
+'''Exports a `CompiledParser` class, an immutable state table built from a
+`Parser`, and `compile_parser`, which builds one.
+
+A `Parser` tests every one of its `Transition`s against every input token.  A
+`CompiledParser` indexes its transitions by the state they leave from, so that
+only the transitions leaving the current state are tested for each token.
+'''
+
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import\
+    Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+
+from nli.parser import\
+    Parser, ParseError, ParseFailure, iter_tokens, tokenize, tokenize_many
+from nli.transition import MatchRule, Transition
+
+
+def _text_mask(txs: Tuple[Transition, ...], tkn: Optional[str]) -> int:
+    # Bit `i` is set if the `i`th transition's match rule passes for `tkn`,
+    # ignoring the stack.
+    mask = 0
+
+    for (i, tx) in enumerate(txs):
+        if tx.rule is MatchRule.CHECK_NONE:
+            passes = tkn is None
+        elif tx.rule is MatchRule.STACK_ONLY:
+            passes = True
+        else:
+            passes = tkn is not None and tx.pattern.match(tkn) is not None
+
+        if passes:
+            mask |= 1 << i
+
+    return mask
+
+
+def _stack_mask(txs: Tuple[Transition, ...], top: Optional[str]) -> int:
+    # Bit `i` is set if the `i`th transition's match rule passes for the
+    # stack symbol `top`, ignoring the input token.
+    mask = 0
+
+    for (i, tx) in enumerate(txs):
+        if tx.rule is MatchRule.CHECK_NONE or tx.rule is MatchRule.TEXT_ONLY:
+            passes = True
+        else:
+            passes = top is not None and\
+                    tx.stack_pattern.match(top) is not None
+
+        if passes:
+            mask |= 1 << i
+
+    return mask
+
+
+@dataclass(frozen=True)
+class CompiledParser:
+    '''An immutable, indexed form of a `Parser`.
+
+        * `start` is the symbol for the state the parser starts in.
+        * `end` is the symbol for the state the parser ends in successful
+        termination in.
+        * `table` maps each state symbol to the `Transition`s leaving that
+        state, in the order they were listed in the `Parser`.
+
+    A `CompiledParser` accepts and rejects exactly the same inputs as the
+    `Parser` it was built from and extracts the same parameters.
+    '''
+
+    start: str
+    end: str
+    table: Mapping[str, Tuple[Transition, ...]]
+
+
+    def _transition(
+            self,
+            state: str,
+            stack: List[Tuple[str, str]],
+            tkn: Optional[str]) -> Optional[str]:
+        # Mirrors `Transition.apply`, including testing the stack symbol
+        # against the first item on the stack.
+        top_symbol = stack[0][0] if len(stack) > 0 else None
+
+        for tx in self.table.get(state, ()):
+            next_state = tx._follow(stack, top_symbol, tkn)
+
+            if next_state is not None:
+                return next_state
+
+        return None
+
+
+    def _run(
+            self,
+            tokens: Iterable[str]
+            ) -> Tuple[bool, str, List[Tuple[str, str]], int]:
+        # Returns whether the tokens were accepted, the final state and stack,
+        # and the number of tokens up to the last one a transition was
+        # followed for.
+        table = self.table
+        state = self.start
+        stack = []
+        next_state = None
+        followed = 0
+
+        for (i, tkn) in enumerate(tokens):
+            if state not in table:
+                # No transition leaves this state, so neither this token nor
+                # any after it can be matched, and the last token matching is
+                # required for the parser to accept.  The rest of the input
+                # does not need to be read.
+                return (False, state, stack, followed)
+
+            next_state = self._transition(state, stack, tkn)
+
+            if next_state is not None:
+                state = next_state
+                followed = i + 1
+
+        while next_state is not None and next_state != self.end:
+            next_state = self._transition(state, stack, None)
+
+        return (next_state == self.end, state, stack, followed)
+
+
+    def _run_many(
+            self,
+            token_lists: Iterable[Iterable[str]]
+            ) -> List[Tuple[bool, str, List[Tuple[str, str]], int]]:
+        # Runs each list of tokens exactly as `_run` would.  Which of a
+        # state's transitions match a token, and which match a stack symbol,
+        # is worked out once per distinct token and symbol and kept as a
+        # bitmap, so each regular expression is tested once per distinct
+        # token rather than once per token.
+        table = self.table
+        end = self.end
+        text_masks = {state: {} for state in table}
+        stack_masks = {state: {} for state in table}
+
+        def transition(state, stack, tkn):
+            txs = table[state]
+            masks = text_masks[state]
+            mask = masks.get(tkn)
+
+            if mask is None:
+                mask = masks[tkn] = _text_mask(txs, tkn)
+
+            if mask == 0:
+                return None
+
+            top = stack[0][0] if len(stack) > 0 else None
+            masks = stack_masks[state]
+            stack_mask = masks.get(top)
+
+            if stack_mask is None:
+                stack_mask = masks[top] = _stack_mask(txs, top)
+
+            mask &= stack_mask
+            i = 0
+
+            while mask:
+                if mask & 1:
+                    next_state = txs[i]._operate(stack, tkn)
+
+                    if next_state is not None:
+                        return next_state
+
+                mask >>= 1
+                i += 1
+
+            return None
+
+        outcomes = []
+
+        for tokens in token_lists:
+            state = self.start
+            stack = []
+            next_state = None
+            followed = 0
+            dead = False
+
+            for (i, tkn) in enumerate(tokens):
+                if state not in table:
+                    dead = True
+                    break
+
+                next_state = transition(state, stack, tkn)
+
+                if next_state is not None:
+                    state = next_state
+                    followed = i + 1
+
+            if dead:
+                outcomes.append((False, state, stack, followed))
+                continue
+
+            while next_state is not None and next_state != end:
+                next_state = transition(state, stack, None)\
+                        if state in table else None
+
+            outcomes.append((next_state == end, state, stack, followed))
+
+        return outcomes
+
+
+    def accept_many(
+            self,
+            token_lists: Iterable[Iterable[str]]
+            ) -> List[Optional[Dict[str, Optional[str]]]]:
+        '''Run many already tokenized inputs through the parser, returning
+        what `accept` would for each.
+        '''
+
+        return [
+            dict(stack) if accepted else None
+            for (accepted, _, stack, _) in self._run_many(token_lists)
+        ]
+
+
+    def parse_many(
+            self,
+            inputs: Sequence[str]
+            ) -> List[Union[Dict[str, Optional[str]], ParseFailure]]:
+        '''Parse many input strings, returning what `try_parse` would for
+        each.
+
+        The inputs are tokenized together, and each distinct token is only
+        tested against each transition once.
+        '''
+
+        token_lists = tokenize_many(inputs)
+        results = []
+
+        for (tokens, (accepted, state, stack, followed)) in zip(
+                token_lists, self._run_many(token_lists)):
+            results.append(
+                dict(stack) if accepted else
+                ParseFailure(state, stack, followed, tokens))
+
+        return results
+
+
+    def accept(
+            self,
+            tokens: Iterable[str]) -> Optional[Dict[str, Optional[str]]]:
+        '''Run already tokenized input through the parser, returning the
+        extracted parameters, or `None` instead of raising a `ParseError` if
+        the input is not accepted.
+
+        Tokens are only read from `tokens` for as long as they can change the
+        outcome.
+        '''
+
+        (accepted, _, stack, _) = self._run(tokens)
+
+        return dict(stack) if accepted else None
+
+
+    def try_parse(
+            self,
+            input_str: str) -> Union[Dict[str, Optional[str]], ParseFailure]:
+        '''Parse an input string, exactly as `Parser.try_parse` would.
+
+        The input is only tokenized as far as the parser reads it, and a
+        `ParseFailure` only tokenizes the rest if its `tokens` are read.
+        '''
+
+        (accepted, state, stack, followed) = self._run(iter_tokens(input_str))
+
+        if not accepted:
+            return ParseFailure(state, stack, followed, input_=input_str)
+
+        return dict(stack)
+
+
+    def parse(self, input_str: str) -> Dict[str, Optional[str]]:
+        '''Parse an input string, exactly as `Parser.parse` would.
+
+        A `ParseError` will be raised if the parser never enters the `end`
+        state after processing all input tokens.
+        '''
+
+        (accepted, state, stack, _) = self._run(iter_tokens(input_str))
+
+        if not accepted:
+            raise ParseError(state, stack, tokenize(input_str))
+
+        return dict(stack)
+
+
+def compile_parser(parser: Parser) -> CompiledParser:
+    '''Build the `CompiledParser` for a `Parser`.
+
+    Transitions are grouped by the state they leave from, keeping the order
+    in which they are listed within each group, since the first transition
+    that applies is the one that is followed.
+    '''
+
+    table = {}
+
+    for tx in parser.transitions:
+        table.setdefault(tx.fr, []).append(tx)
+
+    return CompiledParser(
+        start=parser.start,
+        end=parser.end,
+        table=MappingProxyType({
+            state: tuple(txs)
+            for (state, txs) in table.items()
+        }))
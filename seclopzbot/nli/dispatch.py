@@ -0,0 +1,285 @@
+'''Exports a `Dispatcher` class that finds and executes the first of a list of
+`Command`s that accepts an input string.
+'''
+
+from dataclasses import dataclass
+from threading import Lock
+from typing import\
+    Callable, ContextManager, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from nli.command import CacheKey, CmdError, Command
+from nli.parser import TokenStream, tokenize, tokenize_many
+from nli.prefilter import KeywordIndex
+
+
+def _loaded(command: Command) -> bool:
+    # Whether a command's parser can be used without importing or compiling
+    # anything, as for a `LazyCommand` that has been loaded.
+    return getattr(command, 'loaded', True)
+
+
+@dataclass(frozen=True)
+class Dispatch:
+    '''The outcome of successfully dispatching an input string.
+
+        * `command` is the `Command` that was executed.
+        * `args` are the parameters its parser extracted.
+        * `message` is the string its callback returned.
+    '''
+
+    command: Command
+    args: Dict[str, Optional[str]]
+    message: str
+
+
+class Dispatcher:
+    '''Runs an input string through a list of `Command`s in priority order.
+
+    The input is tokenized once and the same tokens are given to each
+    command's compiled parser.  Unless `prefilter` is set, tokens are only
+    produced as far into the input as some parser reads.  Commands that do
+    not accept the input are skipped without raising a `ParseError`, and
+    commands after the first one whose callback succeeds are never run.
+    The outcome is the same as trying `Command.execute` on each command in
+    turn until one returns, and as with `Command.execute`, a command with a
+    `cache` answers input with the same tokens as input it answered before
+    without parsing it.
+
+    If a `timer` is given, it is called as `timer(name, command=...)` to get a
+    context manager timing each step of a dispatch: `'tokenize'`, and
+    `'parse'` and `'callback'` for each command.  Input is then tokenized in
+    full before parsing so that tokenizing can be timed on its own.
+
+    With `prefilter` set, commands whose parsers require a keyword that none
+    of the input's tokens begin with are skipped without being run.  The
+    input is then tokenized in full.  Each command is added to a
+    `KeywordIndex` once it is loaded, so that commands which load their
+    parsers lazily, such as those of a `Registry`, are not loaded just to be
+    indexed.  Until then a command is never skipped.  If a `counter` is
+    given, it is called as `counter('skipped', command=...)` for each command
+    skipped this way and `counter('parsed', command=...)` for each command
+    whose parser is run.
+    '''
+
+    def __init__(
+            self,
+            commands: Sequence[Command],
+            timer: Optional[Callable[..., ContextManager]] = None,
+            prefilter: bool = True,
+            counter: Optional[Callable[..., None]] = None):
+        self.commands = tuple(commands)
+        self.timer = timer
+        self.prefilter = prefilter
+        self.counter = counter
+        self._index = KeywordIndex()
+        # A bitmap of the commands not yet in the index.
+        self._unindexed = (1 << len(self.commands)) - 1
+        self._lock = Lock()
+
+
+    @property
+    def index(self) -> KeywordIndex:
+        '''The `KeywordIndex` of the commands loaded so far, adding any
+        loaded since it was last used.
+        '''
+
+        unindexed = self._unindexed
+
+        if unindexed != 0 and any(
+                unindexed >> i & 1 and _loaded(command)
+                for (i, command) in enumerate(self.commands)):
+            with self._lock:
+                for (i, command) in enumerate(self.commands):
+                    if self._unindexed >> i & 1 and _loaded(command):
+                        self._index.add(i, command.compiled)
+                        # Cleared only once the command is in the index, so
+                        # that it is a candidate until then.
+                        self._unindexed &= ~(1 << i)
+
+        return self._index
+
+
+    def recognizes(self, input_str: str) -> bool:
+        '''Whether an input string contains a keyword that some loaded
+        command requires, making it likely to be meant as a command.
+        '''
+
+        return self.index.recognizes(tokenize(input_str))
+
+
+    def _candidates(self, tokens: Sequence[str]) -> int:
+        # A bitmap of the commands that might accept the tokens.
+        if not self.prefilter:
+            return (1 << len(self.commands)) - 1
+
+        index = self.index
+        # Commands are added to the index before their bits are cleared, so
+        # any not in `unindexed` are already in `index`.
+        unindexed = self._unindexed
+        return index.candidates(tokens) | unindexed
+
+
+    def _count(self, outcome: str, command: Command, times: int = 1):
+        # Only indexed commands are skipped, and those are already loaded, so
+        # naming a command here never loads it.
+        counter = self.counter
+
+        if counter is not None:
+            for _ in range(times):
+                counter(outcome, command=command.name)
+
+
+    def matches(
+            self,
+            input_str: str
+            ) -> Iterator[Tuple[Command, Dict[str, Optional[str]]]]:
+        '''Lazily yield each command that accepts an input string, in priority
+        order, along with the parameters extracted for it.
+        '''
+
+        for (command, args, _, _) in self._matches(input_str):
+            yield (command, args)
+
+
+    def _matches(
+            self,
+            input_str: str
+            ) -> Iterator[Tuple[
+                Command, Dict[str, Optional[str]], Optional[CacheKey],
+                Optional[str]]]:
+        # Also yields the key the command caches its answer to the input
+        # under, if it has a cache, and the answer if it is already cached.
+        timer = self.timer
+        key = None
+
+        if timer is not None:
+            with timer('tokenize'):
+                tokens = tokenize(input_str)
+        elif self.prefilter:
+            tokens = tokenize(input_str)
+        else:
+            tokens = TokenStream(input_str)
+
+        candidates = self._candidates(tokens)
+
+        for (i, command) in enumerate(self.commands):
+            if not candidates >> i & 1:
+                self._count('skipped', command)
+                continue
+
+            if command.cache is not None:
+                if key is None:
+                    key = tuple(tokens)
+
+                cached = command.cached(key)
+
+                if cached is not None:
+                    yield (command, cached[0], key, cached[1])
+                    continue
+
+            self._count('parsed', command)
+
+            if timer is None:
+                args = command.compiled.accept(tokens)
+            else:
+                with timer('parse', command=command.name):
+                    args = command.compiled.accept(tokens)
+
+            if args is not None:
+                yield (command, args, key, None)
+
+
+    def classify_many(
+            self,
+            inputs: Sequence[str]
+            ) -> List[Optional[Tuple[Command, Dict[str, Optional[str]]]]]:
+        '''Find the first command that accepts each of many input strings,
+        along with the parameters extracted for it, without executing any
+        callbacks.
+
+        `None` is returned for inputs that no command accepts.  The inputs
+        are tokenized together and given to each command's compiled parser
+        in a batch, in priority order, until every input is accepted or no
+        commands are left.  With `prefilter` set, each command is only given
+        the inputs it might accept.
+        '''
+
+        token_lists = tokenize_many(inputs)
+        results: List[Optional[Tuple[Command, Dict[str, Optional[str]]]]] =\
+                [None] * len(inputs)
+        pending = list(range(len(inputs)))
+        candidates = [self._candidates(tokens) for tokens in token_lists]
+
+        for (c, command) in enumerate(self.commands):
+            if len(pending) == 0:
+                break
+
+            tried = [i for i in pending if candidates[i] >> c & 1]
+            accepted = command.compiled.accept_many(
+                    [token_lists[i] for i in tried])
+            unmatched = [i for i in pending if not candidates[i] >> c & 1]
+            self._count('skipped', command, len(unmatched))
+            self._count('parsed', command, len(tried))
+
+            for (i, args) in zip(tried, accepted):
+                if args is None:
+                    unmatched.append(i)
+                else:
+                    results[i] = (command, args)
+
+            pending = unmatched
+
+        return results
+
+
+    def dispatch(self, input_str: str) -> Optional[Dispatch]:
+        '''Execute the callback of the first command that accepts an input
+        string and whose callback does not fail.
+
+        Returns `None` if there is no such command.
+        '''
+
+        timer = self.timer
+
+        for (command, args, key, message) in self._matches(input_str):
+            if message is not None:
+                return Dispatch(command, args, message)
+
+            try:
+                if timer is None:
+                    message = command.invoke(args, key)
+                else:
+                    with timer('callback', command=command.name):
+                        message = command.invoke(args, key)
+            except CmdError:
+                continue
+
+            return Dispatch(command, args, message)
+
+        return None
+
+
+    async def dispatch_async(self, input_str: str) -> Optional[Dispatch]:
+        '''Like `dispatch`, but awaits each command's callback with
+        `Command.invoke_async`, so that the event loop can run other messages'
+        callbacks while it waits.
+        '''
+
+        timer = self.timer
+
+        for (command, args, key, message) in self._matches(input_str):
+            if message is not None:
+                return Dispatch(command, args, message)
+
+            try:
+                if timer is None:
+                    message = await command.invoke_async(args, key)
+                else:
+                    with timer('callback', command=command.name):
+                        message = await command.invoke_async(args, key)
+            except CmdError:
+                continue
+
+            return Dispatch(command, args, message)
+
+        return None
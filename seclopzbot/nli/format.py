@@ -0,0 +1,560 @@
+'''Exports `compile_format`, which builds a `Parser` from a command format
+written in the notation described in [the NLI doc](seclopzbot/docs/nli.md),
+and `check_parser`, which finds likely mistakes in any `Parser`.
+
+A format is compiled in four steps.
+
+    1. The format is parsed into a syntax tree.
+    2. The tree is translated into a nondeterministic automaton over words.
+    3. The automaton is made deterministic by the subset construction.
+    4. Equivalent states are merged and the keywords leading from one state
+    to another are collapsed into a single regular expression.
+'''
+
+from collections import deque
+from dataclasses import dataclass
+import re
+import string
+from typing\
+    import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple, Union
+import warnings
+
+from nli.parser import Parser
+from nli.tablecache import TableCache
+from nli.transition import MatchRule, StackOperation, Transition
+
+
+_PUNCTUATION = str.maketrans('', '', string.punctuation)
+
+# The state that parsers compiled from anchored formats move to on a word the
+# format does not allow, and that no transition leaves.
+REJECT = 'reject'
+
+
+class FormatError(ValueError):
+    '''Raised when a format string is not written in the NLI notation.
+    '''
+
+
+class FormatWarning(UserWarning):
+    '''Issued for each problem `check_parser` or `compile_format` finds.
+    '''
+
+
+@dataclass(frozen=True)
+class _Words:
+    words: Tuple[str, ...]
+
+
+@dataclass(frozen=True)
+class _Any:
+    pass
+
+
+@dataclass(frozen=True)
+class _Param:
+    name: str
+    rest: bool
+
+
+@dataclass(frozen=True)
+class _Seq:
+    items: Tuple['_Node', ...]
+
+
+@dataclass(frozen=True)
+class _Alt:
+    options: Tuple[_Seq, ...]
+    optional: bool
+
+
+_Node = Union[_Words, _Any, _Param, _Seq, _Alt]
+
+_LEXEME = re.compile(r'''
+      (?P<space>\s+)
+    | (?P<any>\(\s*\.\.\.\s*\))
+    | (?P<param><\s*(?P<name>\w+)\s*(?P<rest>\.\.\.)?\s*>)
+    | (?P<word>[^\s()\[\]|<>]+)(?:\[(?P<suffix>[^\s()\[\]|<>]+)\])?
+    | (?P<punct>[()\[\]|])
+    ''', re.VERBOSE)
+
+
+def _lex(fmt: str) -> List[Tuple[str, object]]:
+    lexemes = []
+    position = 0
+
+    while position < len(fmt):
+        found = _LEXEME.match(fmt, position)
+
+        if found is None:
+            raise FormatError(
+                f'Unexpected {fmt[position]!r} at {position} in {fmt!r}.')
+
+        position = found.end()
+
+        if found.group('space'):
+            continue
+        elif found.group('any'):
+            lexemes.append(('node', _Any()))
+        elif found.group('param'):
+            lexemes.append((
+                'node',
+                _Param(found.group('name'), found.group('rest') is not None)))
+        elif found.group('word'):
+            words = [found.group('word')]
+
+            if found.group('suffix'):
+                words.append(words[0] + found.group('suffix'))
+
+            words = tuple(word.translate(_PUNCTUATION) for word in words)
+
+            if not all(words):
+                raise FormatError(
+                    f'{found.group(0)!r} in {fmt!r} has no letters or digits.')
+
+            lexemes.append(('node', _Words(words)))
+        else:
+            lexemes.append(('punct', found.group('punct')))
+
+    return lexemes
+
+
+class _SyntaxParser:
+    # A recursive descent parser for the grammar
+    #
+    #   options := sequence ('|' sequence)*
+    #   sequence := item*
+    #   item := node | '(' options ')' | '[' options ']'
+
+    def __init__(self, fmt: str):
+        self.fmt = fmt
+        self.lexemes = _lex(fmt)
+        self.position = 0
+
+
+    def _peek(self) -> Optional[Tuple[str, object]]:
+        if self.position == len(self.lexemes):
+            return None
+
+        return self.lexemes[self.position]
+
+
+    def _options(self) -> Tuple[_Seq, ...]:
+        options = [self._sequence()]
+
+        while self._peek() == ('punct', '|'):
+            self.position += 1
+            options.append(self._sequence())
+
+        return tuple(options)
+
+
+    def _sequence(self) -> _Seq:
+        items = []
+
+        while True:
+            lexeme = self._peek()
+
+            if lexeme is None or lexeme[1] in ('|', ')', ']'):
+                return _Seq(tuple(items))
+
+            self.position += 1
+
+            if lexeme[0] == 'node':
+                items.append(lexeme[1])
+                continue
+
+            close = {'(': ')', '[': ']'}[lexeme[1]]
+            options = self._options()
+
+            if self._peek() != ('punct', close):
+                raise FormatError(f'Expected {close!r} in {self.fmt!r}.')
+
+            self.position += 1
+            items.append(_Alt(options, optional=close == ']'))
+
+
+    def parse(self) -> _Node:
+        options = self._options()
+
+        if self._peek() is not None:
+            raise FormatError(
+                f'Unexpected {self._peek()[1]!r} in {self.fmt!r}.')
+
+        if len(options) == 1:
+            return options[0]
+
+        return _Alt(options, optional=False)
+
+
+Label = Tuple[str, ...]  # ('word', w), ('param', p), ('extend', p) or ('any',)
+
+
+class _Automaton:
+    # A nondeterministic automaton with epsilon moves, built by Thompson's
+    # construction.  Edges are kept in the order they were added, which is
+    # the order they appear in the format.
+
+    def __init__(self):
+        self.epsilon: List[List[int]] = []
+        self.edges: List[List[Tuple[Label, int]]] = []
+
+
+    def state(self) -> int:
+        self.epsilon.append([])
+        self.edges.append([])
+        return len(self.edges) - 1
+
+
+    def build(self, node: _Node) -> Tuple[int, int]:
+        if isinstance(node, _Words):
+            (entry, exit) = (self.state(), self.state())
+
+            for word in node.words:
+                self.edges[entry].append((('word', word), exit))
+
+            return (entry, exit)
+
+        if isinstance(node, _Any):
+            entry = self.state()
+            self.edges[entry].append((('any',), entry))
+            return (entry, entry)
+
+        if isinstance(node, _Param):
+            (entry, exit) = (self.state(), self.state())
+            self.edges[entry].append((('param', node.name), exit))
+
+            if node.rest:
+                self.edges[exit].append((('extend', node.name), exit))
+
+            return (entry, exit)
+
+        if isinstance(node, _Seq):
+            entry = exit = self.state()
+
+            for item in node.items:
+                (item_entry, item_exit) = self.build(item)
+                self.epsilon[exit].append(item_entry)
+                exit = item_exit
+
+            return (entry, exit)
+
+        (entry, exit) = (self.state(), self.state())
+
+        for option in node.options:
+            (option_entry, option_exit) = self.build(option)
+            self.epsilon[entry].append(option_entry)
+            self.epsilon[option_exit].append(exit)
+
+        if node.optional:
+            self.epsilon[entry].append(exit)
+
+        return (entry, exit)
+
+
+    def closure(self, states: Iterable[int]) -> FrozenSet[int]:
+        found = set(states)
+        pending = list(found)
+
+        while pending:
+            for target in self.epsilon[pending.pop()]:
+                if target not in found:
+                    found.add(target)
+                    pending.append(target)
+
+        return frozenset(found)
+
+
+@dataclass
+class _DState:
+    accepting: bool
+    edges: List[Tuple[Label, int]]
+
+
+def _determinize(
+        nfa: _Automaton,
+        start: int,
+        final: int,
+        fmt: str,
+        diagnostics: List[str]) -> List[_DState]:
+    # The subset construction.  Keywords take precedence over parameters,
+    # which take precedence over `(...)`.  Because `(...)` has no effect on
+    # the stack, the states it leads to are also added to the targets of
+    # keywords and parameters, so that it can match any word.
+    initial = nfa.closure([start])
+    ids = {initial: 0}
+    dstates: List[_DState] = []
+    pending = deque([initial])
+    overlaps: Dict[str, Set[str]] = {}
+    shadows: Dict[str, Set[str]] = {}
+
+    def target(states: Iterable[int]) -> int:
+        closed = nfa.closure(states)
+
+        if closed not in ids:
+            ids[closed] = len(ids)
+            pending.append(closed)
+
+        return ids[closed]
+
+    while pending:
+        subset = pending.popleft()
+        words: Dict[str, Set[int]] = {}
+        params: Dict[Label, Set[int]] = {}
+        anything: Set[int] = set()
+
+        for state in sorted(subset):
+            for (label, to) in nfa.edges[state]:
+                if label[0] == 'word':
+                    words.setdefault(label[1], set()).add(to)
+                elif label[0] == 'any':
+                    anything.add(to)
+                else:
+                    params.setdefault(label, set()).add(to)
+
+        edges = []
+
+        for word in sorted(words):
+            edges.append((('word', word), target(words[word] | anything)))
+
+        if len(params) > 0:
+            labels = list(params)
+            chosen = labels[0]
+
+            for other in labels[1:]:
+                overlaps.setdefault(chosen[1], set()).add(other[1])
+
+            if chosen[0] == 'param':
+                shadows.setdefault(chosen[1], set()).update(words)
+
+            edges.append((chosen, target(params[chosen] | anything)))
+        elif len(anything) > 0:
+            edges.append((('any',), target(anything)))
+
+        dstates.append(_DState(final in subset, edges))
+
+    for (param, others) in overlaps.items():
+        diagnostics.append(
+            f'{fmt!r}: <{param}> and '
+            f'{", ".join(f"<{other}>" for other in sorted(others))} can '
+            f'capture the same word; only <{param}> will.')
+
+    for (param, keywords) in shadows.items():
+        if len(keywords) > 0:
+            diagnostics.append(
+                f'{fmt!r}: {", ".join(sorted(keywords))} will be read as '
+                f'keywords rather than as <{param}>.')
+
+    return dstates
+
+
+def _minimize(dstates: List[_DState]) -> List[int]:
+    # Moore's partition refinement.  Returns the block each state is in.
+    blocks = [int(d.accepting) for d in dstates]
+    count = len(set(blocks))
+
+    while True:
+        signatures: Dict[tuple, int] = {}
+        refined = []
+
+        for (i, d) in enumerate(dstates):
+            signature = (
+                blocks[i],
+                tuple((label, blocks[to]) for (label, to) in d.edges))
+            refined.append(signatures.setdefault(signature, len(signatures)))
+
+        if len(signatures) == count:
+            return refined
+
+        (blocks, count) = (refined, len(signatures))
+
+
+def _pattern(words: List[str]) -> str:
+    if len(words) == 1:
+        return re.escape(words[0]) + '$'
+
+    return '(?:' + '|'.join(re.escape(word) for word in words) + ')$'
+
+
+def _emit(
+        dstates: List[_DState],
+        blocks: List[int],
+        anchored: bool) -> List[Transition]:
+    # Name blocks in breadth first order from the start state.
+    names = {blocks[0]: 'start'}
+    order = deque([0])
+    visited = {blocks[0]}
+    representative = {}
+
+    while order:
+        i = order.popleft()
+        representative[blocks[i]] = i
+
+        for (_, to) in dstates[i].edges:
+            if blocks[to] not in visited:
+                visited.add(blocks[to])
+                names[blocks[to]] = f's{len(names)}'
+                order.append(to)
+
+    transitions = []
+
+    for (block, i) in representative.items():
+        fr = names[block]
+        groups: Dict[int, List[str]] = {}
+
+        for (label, to) in dstates[i].edges:
+            if label[0] == 'word':
+                groups.setdefault(blocks[to], []).append(label[1])
+
+        for (to, words) in sorted(groups.items(), key=lambda g: g[1][0]):
+            transitions.append(
+                Transition(fr=fr, to=names[to], match=_pattern(words)))
+
+        for (label, to) in dstates[i].edges:
+            if label[0] == 'word':
+                continue
+
+            transitions.append(Transition(
+                fr=fr,
+                to=names[blocks[to]],
+                match='.*',
+                param=None if label[0] == 'any' else label[1],
+                extend=label[0] == 'extend'))
+
+        if dstates[i].accepting:
+            transitions.append(Transition(fr=fr, to='end'))
+
+        if anchored and all(label[0] == 'word' for (label, _) in
+                            dstates[i].edges):
+            transitions.append(Transition(fr=fr, to=REJECT, match='.*'))
+
+    return transitions
+
+
+def compile_format(
+        fmt: str,
+        strict: bool = False,
+        tables: Optional[TableCache] = None,
+        anchored: bool = False) -> Parser:
+    '''Build a minimal, deterministic `Parser` for a command format.
+
+    Keywords are matched as whole tokens, and punctuation in them is ignored
+    just as it is in input.  Where a word could be read as either a keyword or
+    a parameter, it is read as the keyword.  A `<param...>` captures every
+    word up to the next keyword, or the end of the input, separated by
+    spaces.
+
+    Words in the input that the format has no place for are skipped, unless
+    `anchored` is `True`, in which case the input is rejected.  Arbitrary
+    words are then only accepted where the format has a `(...)` or a
+    parameter.
+
+    A `FormatError` is raised if `fmt` is not written in the NLI notation.
+    Any problems found with the resulting parser by `check_parser` are issued
+    as `FormatWarning`s, or raised as a `FormatError` if `strict` is `True`.
+
+    If `tables` are given, the parser is read from them instead of compiled
+    whenever the format has been compiled before, and cached in them if not.
+    '''
+
+    # Anchored and unanchored parsers for a format are cached apart.
+    key = f'{fmt}\0anchored' if anchored else fmt
+    cached = None if tables is None else tables.get(key)
+
+    if cached is not None:
+        (parser, diagnostics) = cached
+    else:
+        diagnostics = []
+        nfa = _Automaton()
+        (start, final) = nfa.build(_SyntaxParser(fmt).parse())
+        dstates = _determinize(nfa, start, final, fmt, diagnostics)
+        parser = Parser(
+                start='start',
+                end='end',
+                transitions=_emit(dstates, _minimize(dstates), anchored))
+
+        diagnostics.extend(check_parser(parser))
+
+        if tables is not None:
+            tables.put(key, parser, diagnostics)
+
+    for diagnostic in diagnostics:
+        if strict:
+            raise FormatError(diagnostic)
+
+        warnings.warn(diagnostic, FormatWarning, stacklevel=2)
+
+    return parser
+
+
+def _always_follows(tx: Transition) -> bool:
+    # Whether a transition is followed for every input token it sees.
+    return tx.rule is MatchRule.TEXT_ONLY and\
+            tx.match in ('.*', '.+', '.') and\
+            tx.operation in (StackOperation.NONE, StackOperation.PUSH,
+                             StackOperation.EXTEND)
+
+
+def check_parser(parser: Parser) -> List[str]:
+    '''Describe the problems found in a parser's transitions.
+
+        * States that cannot be reached from the start state.
+        * States from which the end state cannot be reached, other than
+        `REJECT`.
+        * Transitions that can never be followed because an earlier
+        transition from the same state always applies to the same tokens.
+    '''
+
+    problems = []
+    outgoing: Dict[str, List[Transition]] = {}
+    states = {parser.start, parser.end}
+
+    for tx in parser.transitions:
+        outgoing.setdefault(tx.fr, []).append(tx)
+        states.update([tx.fr, tx.to])
+
+    def reachable(fr: str, edges: Dict[str, Set[str]]) -> Set[str]:
+        found = {fr}
+        pending = [fr]
+
+        while pending:
+            for to in edges.get(pending.pop(), ()):
+                if to not in found:
+                    found.add(to)
+                    pending.append(to)
+
+        return found
+
+    forward: Dict[str, Set[str]] = {}
+    backward: Dict[str, Set[str]] = {}
+
+    for tx in parser.transitions:
+        forward.setdefault(tx.fr, set()).add(tx.to)
+        backward.setdefault(tx.to, set()).add(tx.fr)
+
+    from_start = reachable(parser.start, forward)
+    to_end = reachable(parser.end, backward)
+
+    for state in sorted(states - from_start):
+        problems.append(f'State {state!r} cannot be reached.')
+
+    for state in sorted(states - to_end - {REJECT}):
+        problems.append(f'The end state cannot be reached from {state!r}.')
+
+    for (state, txs) in outgoing.items():
+        for (i, earlier) in enumerate(txs):
+            for later in txs[i + 1:]:
+                same_stack = earlier.stack_match == later.stack_match
+                shadows = same_stack and (
+                    _always_follows(earlier) and later.match is not None or
+                    earlier.match == later.match and
+                    earlier.operation == later.operation)
+
+                if shadows:
+                    problems.append(
+                        f'The transition from {state!r} to {later.to!r} '
+                        f'matching {later.match!r} is never followed, because '
+                        f'the one to {earlier.to!r} matching '
+                        f'{earlier.match!r} always applies first.')
+
+    return problems
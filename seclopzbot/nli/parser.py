@@ -3,15 +3,34 @@ whether an input string processed as a list of tokens (words) matches an
 expected `Command` format.
 '''
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
 import string
-from typing import Dict, List, Optional, Tuple
+from typing import\
+    Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
 
 from nli.transition import Transition
 
 
+def _describe(
+        state: str,
+        stack: List[Tuple[str, str]],
+        tokens: List[Optional[str]]) -> str:
+    return f'''
+Parser state:
+    state symbol = {state}
+    stack = {stack}
+    tokens = {tokens}
+'''
+
+
 class ParseError(Exception):
+    '''Raised when a parser does not accept an input.
+
+    The message describing the parser's state is only formatted when the
+    error is converted to a string.
+    '''
+
     def __init__(
             self,
             state: str,
@@ -21,12 +40,180 @@ class ParseError(Exception):
         self.stack = stack
         self.tokens = tokens
 
-        super().__init__(f'''
-Parser state:
-    state symbol = {state}
-    stack = {stack}
-    tokens = {tokens}
-''')
+        super().__init__(state, stack, tokens)
+
+
+    def __str__(self) -> str:
+        return _describe(self.state, self.stack, self.tokens)
+
+
+class ParseFailure:
+    '''Describes why a parser did not accept an input, returned by
+    `try_parse` in place of raising a `ParseError`.
+
+        * `state` is the symbol for the state the parser was left in.
+        * `stack` is the stack the parser was left with.
+        * `index` is the index of the first of the tokens at the end of the
+        input for which the parser followed no transition, or the number of
+        tokens if it followed one for every token.
+        * `tokens` are the input's tokens.  If the parser did not need all of
+        them, they are only produced from the input when first read.
+
+    Creating a `ParseFailure` does no more work than recording these, so it
+    is cheap enough to return for every input that is not accepted.
+    '''
+
+    __slots__ = ('state', 'stack', 'index', '_tokens', '_input')
+
+
+    def __init__(
+            self,
+            state: str,
+            stack: List[Tuple[str, str]],
+            index: int,
+            tokens: Optional[List[Optional[str]]] = None,
+            input_: Optional[str] = None):
+        self.state = state
+        self.stack = stack
+        self.index = index
+        self._tokens = tokens
+        self._input = input_
+
+
+    @property
+    def tokens(self) -> List[Optional[str]]:
+        if self._tokens is None:
+            self._tokens = tokenize(self._input)
+
+        return self._tokens
+
+
+    @property
+    def token(self) -> Optional[str]:
+        '''The token at `index`, or `None` if input ran out first.
+        '''
+
+        tokens = self.tokens
+        return tokens[self.index] if self.index < len(tokens) else None
+
+
+    def error(self) -> ParseError:
+        '''The `ParseError` that `parse` raises for the same input.
+        '''
+
+        return ParseError(self.state, self.stack, self.tokens)
+
+
+    def __str__(self) -> str:
+        return _describe(self.state, self.stack, self.tokens)
+
+
+    def __repr__(self) -> str:
+        return f'ParseFailure(state={self.state!r}, index={self.index})'
+
+
+_PUNCTUATION = str.maketrans('', '', string.punctuation)
+_CHUNK_SIZE = 256
+
+
+def iter_tokens(input_: str) -> Iterator[str]:
+    '''Lazily split an input string on the space character (`' '`) and
+    remove all English punctuation (`string.punctuation`) from each resulting
+    word.  Words left empty are discarded.
+    '''
+
+    # Spaces are not punctuation, so punctuation can be removed from a whole
+    # chunk of words ending at a space at once, rather than from each word.
+    start = 0
+
+    while start < len(input_):
+        end = input_.find(' ', start + _CHUNK_SIZE)
+
+        if end < 0:
+            end = len(input_)
+
+        for word in input_[start:end].translate(_PUNCTUATION).split(' '):
+            if len(word) > 0:
+                yield word
+
+        start = end + 1
+
+
+def tokenize(input_: str) -> List[Optional[str]]:
+    '''Split an input string into the list of all of the tokens that
+    `iter_tokens` would produce.
+    '''
+
+    return [
+        word for word in input_.translate(_PUNCTUATION).split(' ')
+        if len(word) > 0
+    ]
+
+
+_SEPARATOR = '\0'
+
+
+def tokenize_many(inputs: Sequence[str]) -> List[List[str]]:
+    '''Tokenize many input strings at once, returning the same tokens
+    `tokenize` would for each.
+
+    Punctuation is removed from all of the inputs in a single pass.
+    '''
+
+    if len(inputs) == 0:
+        return []
+
+    if any(_SEPARATOR in input_ for input_ in inputs):
+        return [tokenize(input_) for input_ in inputs]
+
+    translated = _SEPARATOR.join(inputs).translate(_PUNCTUATION)
+
+    return [
+        [word for word in text.split(' ') if len(word) > 0]
+        for text in translated.split(_SEPARATOR)
+    ]
+
+
+class TokenStream:
+    '''The tokens of an input string, produced by `iter_tokens` only as they
+    are first needed and remembered so that they can be iterated over more
+    than once.
+
+    Inputs no longer than a single chunk are cheaper to tokenize all at once,
+    and are.
+    '''
+
+    def __init__(self, input_: str):
+        if len(input_) <= _CHUNK_SIZE:
+            self._source = None
+            self._tokens = tokenize(input_)
+        else:
+            self._source = iter_tokens(input_)
+            self._tokens = []
+
+
+    def __iter__(self) -> Iterator[str]:
+        if self._source is None:
+            return iter(self._tokens)
+
+        return self._stream()
+
+
+    def _stream(self) -> Iterator[str]:
+        tokens = self._tokens
+        i = 0
+
+        while True:
+            if i == len(tokens):
+                tkn = next(self._source, None)
+
+                if tkn is None:
+                    return
+
+                tokens.append(tkn)
+
+            yield tokens[i]
+            i += 1
 
 
 @dataclass
@@ -52,25 +239,14 @@ class Parser:
     start: str
     end: str
     transitions: List[Transition]
+    # The `CompiledParser` built by `parse_many`, and the start, end and
+    # transitions it was built from, so that it is rebuilt if they change.
+    _compiled: Optional[Tuple[Tuple, Any]] =\
+            field(default=None, init=False, repr=False, compare=False)
 
 
     def _tokenize(self, input_: str) -> List[Optional[str]]:
-        tokens = []
-
-        for word in input_.split(' '):
-            if len(word) == 0:
-                continue
-
-            cleaned = ''.join(filter(
-                lambda char: char not in string.punctuation,
-                word))
-
-            if len(cleaned) == 0:
-                continue
-
-            tokens.append(cleaned)
-
-        return tokens
+        return tokenize(input_)
 
 
     def _transition(
@@ -87,6 +263,36 @@ class Parser:
         return None
 
 
+    def try_parse(
+            self,
+            input_str: str) -> Union[Dict[str, Optional[str]], ParseFailure]:
+        '''Parse an input string exactly as `parse` does, but return a
+        `ParseFailure` instead of raising a `ParseError` if it is not
+        accepted.
+        '''
+
+        state = self.start
+        stack = []
+        tokens = self._tokenize(input_str)
+        next_state = None
+        followed = 0
+
+        for (i, tkn) in enumerate(tokens):
+            next_state = self._transition(state, stack, tkn)
+
+            if next_state is not None:
+                state = next_state
+                followed = i + 1
+
+        while next_state is not None and next_state != self.end:
+            next_state = self._transition(state, stack, None)
+
+        if next_state != self.end:
+            return ParseFailure(state, stack, followed, tokens)
+
+        return dict(stack)
+
+
     def parse(self, input_str: str) -> Dict[str, Optional[str]]:
         '''Parse an input string into tokens and then run it through a
         deterministic pushdown automaton to extract a tagged set of parameters.
@@ -101,20 +307,31 @@ class Parser:
         until either no transition applies until no rule applies.
         '''
 
-        state = self.start
-        stack = []
-        tokens = self._tokenize(input_str)
+        result = self.try_parse(input_str)
 
-        for tkn in tokens:
-            next_state = self._transition(state, stack, tkn)
+        if isinstance(result, ParseFailure):
+            raise result.error()
 
-            if next_state is not None:
-                state = next_state
+        return result
 
-        while next_state is not None and next_state != self.end:
-            next_state = self._transition(state, stack, None)
 
-        if next_state != self.end:
-            raise ParseError(state, stack, tokens)
+    def parse_many(
+            self,
+            inputs: Sequence[str]
+            ) -> List[Union[Dict[str, Optional[str]], ParseFailure]]:
+        '''Parse many input strings, returning what `try_parse` would for
+        each.
 
-        return dict(stack)
+        This is much faster than calling `parse` on each input.  See
+        `CompiledParser.parse_many`.  The parser is compiled the first time
+        this is called, and again only if it has been changed since.
+        '''
+
+        from nli.compiled import compile_parser
+
+        source = (self.start, self.end, tuple(self.transitions))
+
+        if self._compiled is None or self._compiled[0] != source:
+            self._compiled = (source, compile_parser(self))
+
+        return self._compiled[1].parse_many(inputs)
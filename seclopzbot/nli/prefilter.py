@@ -0,0 +1,260 @@
+'''Exports a `KeywordIndex` class that rules out, in a single pass over an
+input's tokens, the commands whose parsers cannot possibly accept it.
+
+Many parsers can only reach their end state by following a transition that
+matches one of a few literal words, such as the `hire` in `new hire`.  If none
+of an input's tokens begin with any of those words, the parser need not be
+run.  `required_keywords` finds such a set of words for a parser by looking
+for literal transitions that every path from the start state to the end state
+must follow.
+'''
+
+from typing import\
+    Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    from re import _constants as sre_constants, _parser as sre_parse
+except ImportError:  # Before Python 3.11.
+    import sre_constants
+    import sre_parse
+
+from nli.compiled import CompiledParser
+from nli.transition import MatchRule, Transition
+
+
+# A token matches a keyword `(text, exact)` if it is `text`, when `exact`, or
+# if it begins with `text` otherwise.
+Keyword = Tuple[str, bool]
+
+_MAX_EXPANSION = 64
+_MAX_REPEAT = 3
+
+
+def _concat(
+        left: List[Keyword],
+        right: List[Keyword]) -> Optional[List[Keyword]]:
+    if any(exact for (_, exact) in left):
+        # Nothing can follow the end of a token.
+        return None
+
+    joined = [(a + b, exact) for (a, _) in left for (b, exact) in right]
+    return joined if len(joined) <= _MAX_EXPANSION else None
+
+
+def _expand(items) -> Optional[List[Keyword]]:
+    # Expands a parsed regular expression into the finite set of keywords it
+    # matches, or returns `None` if there is no such small set.
+    expansion: List[Keyword] = [('', False)]
+
+    for (i, (op, av)) in enumerate(items):
+        if op is sre_constants.LITERAL:
+            part = [(chr(av), False)]
+        elif op is sre_constants.IN:
+            if any(kind is not sre_constants.LITERAL for (kind, _) in av):
+                return None
+
+            part = [(chr(c), False) for (_, c) in av]
+        elif op is sre_constants.SUBPATTERN:
+            (_, add_flags, _, pattern) = av
+
+            if add_flags & sre_constants.SRE_FLAG_IGNORECASE:
+                return None
+
+            part = _expand(pattern)
+        elif op is sre_constants.BRANCH:
+            part = []
+
+            for branch in av[1]:
+                alternative = _expand(branch)
+
+                if alternative is None:
+                    return None
+
+                part.extend(alternative)
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+            (low, high, pattern) = av
+            repeated = _expand(pattern)
+
+            if repeated is None or high > _MAX_REPEAT:
+                return None
+
+            part = []
+
+            for count in range(low, high + 1):
+                times: Optional[List[Keyword]] = [('', False)]
+
+                for _ in range(count):
+                    times = _concat(times, repeated)
+
+                    if times is None:
+                        return None
+
+                part.extend(times)
+        elif op is sre_constants.AT and av is sre_constants.AT_END and\
+                i == len(items) - 1:
+            part = [('', True)]
+        else:
+            return None
+
+        if part is None:
+            return None
+
+        expansion = _concat(expansion, part)
+
+        if expansion is None:
+            return None
+
+    return expansion
+
+
+def keywords(tx: Transition) -> Optional[FrozenSet[Keyword]]:
+    '''The keywords a transition's `match` can match, if it only matches
+    tokens that are, or begin with, one of a few literal words.
+    '''
+
+    if tx.rule not in (MatchRule.TEXT_ONLY, MatchRule.TEXT_AND_STACK):
+        return None
+
+    parsed = sre_parse.parse(tx.match)
+
+    if parsed.state.flags & sre_constants.SRE_FLAG_IGNORECASE:
+        return None
+
+    expansion = _expand(list(parsed))
+
+    if expansion is None or any(text == '' for (text, _) in expansion):
+        return None
+
+    return frozenset(expansion)
+
+
+def _reaches_end(
+        parser: CompiledParser,
+        removed: FrozenSet[Keyword],
+        literal: Dict[Transition, FrozenSet[Keyword]]) -> bool:
+    # Whether the end state can be reached without following a transition
+    # that only matches keywords in `removed`.
+    found = {parser.start}
+    pending = [parser.start]
+
+    while pending:
+        for tx in parser.table.get(pending.pop(), ()):
+            words = literal.get(tx)
+
+            if words is not None and words <= removed:
+                continue
+
+            if tx.to == parser.end:
+                return True
+
+            if tx.to not in found:
+                found.add(tx.to)
+                pending.append(tx.to)
+
+    return False
+
+
+def required_keywords(
+        parser: CompiledParser) -> Optional[FrozenSet[Keyword]]:
+    '''A set of keywords at least one of which must appear among the tokens
+    of any input the parser accepts, or `None` if no such set is found.
+
+    The keywords matched by each literal transition are tried on their own,
+    smallest first, and then those of every literal transition together.
+    '''
+
+    if parser.start == parser.end:
+        return None
+
+    literal = {}
+
+    for txs in parser.table.values():
+        for tx in txs:
+            words = keywords(tx)
+
+            if words is not None:
+                literal[tx] = words
+
+    candidates = sorted(
+            set(literal.values()), key=lambda w: (len(w), sorted(w)))
+
+    if len(literal) > 0:
+        candidates.append(frozenset().union(*literal.values()))
+
+    for words in candidates:
+        if not _reaches_end(parser, words, literal):
+            return words
+
+    return None
+
+
+class KeywordIndex:
+    '''An index of the keywords required by each of a sequence of parsers.
+
+    `candidates` returns a bitmap with bit `i` set unless the `i`th parser is
+    certain not to accept an input with the given tokens.  Parsers for which
+    `required_keywords` finds no keywords are always candidates.
+    '''
+
+    def __init__(self, parsers: Sequence[CompiledParser] = ()):
+        self.always = 0
+        self.words: Dict[str, int] = {}
+        self.prefixes: Dict[str, int] = {}
+        self.lengths: Tuple[int, ...] = ()
+
+        for (i, parser) in enumerate(parsers):
+            self.add(i, parser)
+
+
+    def add(self, i: int, parser: CompiledParser):
+        '''Index the keywords required by the `i`th parser.
+
+        Until a parser is added, its bit is never set by `candidates`.
+        '''
+
+        required = required_keywords(parser)
+
+        if required is None:
+            self.always |= 1 << i
+            return
+
+        for (text, exact) in required:
+            index = self.words if exact else self.prefixes
+            index[text] = index.get(text, 0) | 1 << i
+
+        self.lengths = tuple(sorted({len(p) for p in self.prefixes}))
+
+
+    def candidates(self, tokens: Iterable[str]) -> int:
+        mask = self.always
+        words = self.words
+        prefixes = self.prefixes
+        lengths = self.lengths
+
+        for tkn in tokens:
+            found = words.get(tkn)
+
+            if found is not None:
+                mask |= found
+            elif tkn[-1:] == '\n':
+                # `$` also matches before a newline ending a token.
+                mask |= words.get(tkn[:-1], 0)
+
+            for length in lengths:
+                if length > len(tkn):
+                    break
+
+                found = prefixes.get(tkn[:length])
+
+                if found is not None:
+                    mask |= found
+
+        return mask
+
+
+    def recognizes(self, tokens: Iterable[str]) -> bool:
+        '''Whether the tokens include a keyword required by any parser, so
+        that the input is likely meant for one.
+        '''
+
+        return self.candidates(tokens) & ~self.always != 0
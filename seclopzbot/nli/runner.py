@@ -0,0 +1,131 @@
+'''Exports a `CallbackRunner` class that runs `Command` callbacks written as
+coroutines on an event loop, and blocking callbacks on a pool of threads, so
+that many slow callbacks can be waited on at once.
+'''
+
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Lock, Thread
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+
+T = TypeVar('T')
+
+
+class CallbackRunner:
+    '''An event loop running on its own daemon thread, and a pool of up to
+    `threads` threads for callbacks that block.
+
+    Coroutines can be submitted from any thread.  The loop and the pool are
+    only started once the first coroutine is submitted.
+    '''
+
+    def __init__(self, threads: Optional[int] = None):
+        self.threads = threads
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[Thread] = None
+        self._limits: Dict[Tuple[str, int], asyncio.Semaphore] = {}
+        self._lock = Lock()
+
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        '''The runner's event loop, started the first time it is needed.
+        '''
+
+        loop = self._loop
+
+        if loop is not None:
+            return loop
+
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                self._thread = Thread(
+                        target=loop.run_forever,
+                        name='callback-loop',
+                        daemon=True)
+                self._thread.start()
+                self._executor = ThreadPoolExecutor(
+                        self.threads, thread_name_prefix='callback')
+                self._loop = loop
+
+            return self._loop
+
+
+    def submit(self, coroutine: Awaitable[T]) -> 'Future[T]':
+        '''Schedule a coroutine on the loop, returning a `Future` that can be
+        waited on from any thread.
+        '''
+
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+
+    def run(self, coroutine: Awaitable[T]) -> T:
+        '''Run a coroutine on the loop and wait for its result.
+
+        This must not be called from the loop's own thread.
+        '''
+
+        return self.submit(coroutine).result()
+
+
+    def in_thread(
+            self,
+            function: Callable[..., T],
+            *args: Any) -> Awaitable[T]:
+        '''Call a blocking function on the runner's pool of threads, returning
+        an awaitable that resolves to its result on the loop.
+        '''
+
+        return self.loop.run_in_executor(self._executor, function, *args)
+
+
+    def limit(self, name: str, concurrency: int) -> asyncio.Semaphore:
+        '''The semaphore shared by every coroutine on the loop limited to
+        `concurrency` at a time under `name`.
+        '''
+
+        key = (name, concurrency)
+        semaphore = self._limits.get(key)
+
+        if semaphore is None:
+            semaphore = self._limits.setdefault(
+                    key, asyncio.Semaphore(concurrency))
+
+        return semaphore
+
+
+    def close(self):
+        '''Stop the loop and wait for the callbacks running on the pool.
+        '''
+
+        with self._lock:
+            (loop, executor, thread) =\
+                    (self._loop, self._executor, self._thread)
+            (self._loop, self._executor, self._thread) = (None, None, None)
+            self._limits = {}
+
+        if loop is not None:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+            executor.shutdown(wait=True)
+
+
+_default: Optional[CallbackRunner] = None
+_default_lock = Lock()
+
+
+def default_runner() -> CallbackRunner:
+    '''The `CallbackRunner` shared by every `Command` not given its own.
+    '''
+
+    global _default
+
+    with _default_lock:
+        if _default is None:
+            _default = CallbackRunner()
+
+        return _default
@@ -0,0 +1,286 @@
+'''Exports a `TableCache` class, a file of the parser tables compiled from
+command formats, so that a process can skip compiling formats that another
+process already has.
+
+The file is laid out as
+
+    * a header holding `MAGIC`, `VERSION`, the `marshal` format version and the
+    number of entries,
+    * an index of entries sorted by key, each the key, offset and length of its
+    table, and
+    * the tables, each a `marshal`led tuple of its start and end states and its
+    transitions grouped by the state they leave from.
+
+Entries are keyed by the SHA-256 hash of the format and of the source of the
+modules that compile and store it, so that changing a format, or how formats
+are compiled, gives a new key without anyone having to remember to.  The
+file is memory mapped read-only, so that workers forked after it is opened
+share its pages, and only the tables that are looked up are read.  Entries
+that point outside the file or do not unpack are treated as missing.
+'''
+
+from hashlib import sha256
+import marshal
+import mmap
+import os
+import struct
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+from nli.parser import Parser
+from nli.transition import Transition
+
+
+MAGIC = b'SLZTBL'
+VERSION = 1
+
+_HEADER = struct.Struct('<6sHHI')
+_ENTRY = struct.Struct('<32sQI')
+
+# The modules, in this package, deciding which table a format compiles to and
+# how it is stored.
+_COMPILER_MODULES = [
+    'format.py', 'parser.py', 'transition.py', 'tablecache.py']
+
+
+def _compiler_hash() -> bytes:
+    digest = sha256()
+    directory = os.path.dirname(os.path.abspath(__file__))
+
+    for module in _COMPILER_MODULES:
+        with open(os.path.join(directory, module), 'rb') as source:
+            digest.update(source.read())
+
+    return digest.digest()
+
+
+# Changes whenever the compiler does, invalidating every table cached before.
+COMPILER_HASH = _compiler_hash()
+
+
+def format_key(fmt: str) -> bytes:
+    '''The key a format's table is cached under.
+    '''
+
+    return sha256(COMPILER_HASH + fmt.encode('utf-8')).digest()
+
+
+def _pack(parser: Parser, diagnostics: List[str]) -> bytes:
+    groups: Dict[str, List[tuple]] = {}
+
+    for tx in parser.transitions:
+        groups.setdefault(tx.fr, []).append(
+            (tx.to, tx.match, tx.stack_match, tx.param, tx.pop, tx.extend))
+
+    return marshal.dumps((
+        parser.start,
+        parser.end,
+        tuple((fr, tuple(txs)) for (fr, txs) in groups.items()),
+        tuple(diagnostics)))
+
+
+def _unpack(payload: bytes) -> Tuple[Parser, List[str]]:
+    (start, end, groups, diagnostics) = marshal.loads(payload)
+    transitions = [
+        Transition(
+            fr=fr,
+            to=to,
+            match=match,
+            stack_match=stack_match,
+            param=param,
+            pop=pop,
+            extend=extend)
+        for (fr, txs) in groups
+        for (to, match, stack_match, param, pop, extend) in txs
+    ]
+
+    return (Parser(start, end, transitions), list(diagnostics))
+
+
+class TableCache:
+    '''The parser tables compiled from command formats, read from and saved to
+    the file at `path`.
+
+    A missing file, or one written by a different version, is treated as
+    empty and replaced by `save`, and a table that is truncated or corrupt
+    is treated as missing.  Tables added with `put` are kept in memory
+    until `save` is called.  `hits` and `misses` count the lookups that did
+    and did not find a table.
+    '''
+
+    def __init__(self, path: str):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._map: Optional[mmap.mmap] = None
+        self._count = 0
+        self._added: Dict[bytes, bytes] = {}
+        self._lock = Lock()
+        self._open()
+
+
+    def _open(self):
+        try:
+            with open(self.path, 'rb') as cache_file:
+                mapped = mmap.mmap(
+                        cache_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            # A `ValueError` is raised when mapping an empty file.
+            return
+
+        if len(mapped) >= _HEADER.size:
+            (magic, version, marshal_version, count) =\
+                    _HEADER.unpack_from(mapped)
+            valid = magic == MAGIC and version == VERSION and\
+                    marshal_version == marshal.version and\
+                    len(mapped) >= _HEADER.size + count * _ENTRY.size
+
+            if valid:
+                (self._map, self._count) = (mapped, count)
+                return
+
+        mapped.close()
+
+
+    def _entry(self, i: int) -> Tuple[bytes, Optional[bytes]]:
+        # The key and table of the `i`th entry of the index, or no table if
+        # the entry points outside the tables in the file.
+        (key, offset, length) = _ENTRY.unpack_from(
+                self._map, _HEADER.size + i * _ENTRY.size)
+        start = _HEADER.size + self._count * _ENTRY.size
+
+        if offset < start or offset + length > len(self._map):
+            return (key, None)
+
+        return (key, self._map[offset:offset + length])
+
+
+    def _find(self, key: bytes) -> Optional[bytes]:
+        # Binary search of the sorted index.
+        if key in self._added:
+            return self._added[key]
+
+        (low, high) = (0, self._count)
+
+        while low < high:
+            middle = (low + high) // 2
+            (found, payload) = self._entry(middle)
+
+            if found == key:
+                return payload
+            elif found < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        return None
+
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._count + len(self._added)
+
+
+    @property
+    def changed(self) -> bool:
+        '''Whether tables have been added since the file was last saved.
+        '''
+
+        return len(self._added) > 0
+
+
+    def get(self, fmt: str) -> Optional[Tuple[Parser, List[str]]]:
+        '''Look up the parser compiled from a format and the problems found
+        with it, if cached.
+        '''
+
+        with self._lock:
+            payload = self._find(format_key(fmt))
+
+        try:
+            found = None if payload is None else _unpack(payload)
+        except (EOFError, TypeError, ValueError):
+            # A table `marshal` cannot read, or not shaped as `_pack` writes.
+            found = None
+
+        with self._lock:
+            if found is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        return found
+
+
+    def put(self, fmt: str, parser: Parser, diagnostics: List[str]):
+        '''Cache the parser compiled from a format and the problems found
+        with it.
+        '''
+
+        payload = _pack(parser, diagnostics)
+
+        with self._lock:
+            self._added[format_key(fmt)] = payload
+
+
+    def save(self):
+        '''Write every cached table to the file.
+
+        The file is written in full to a temporary file that then replaces
+        it, so that processes reading the old file are unaffected.
+        '''
+
+        with self._lock:
+            entries = {}
+
+            for i in range(self._count):
+                (key, payload) = self._entry(i)
+
+                if payload is not None:
+                    entries[key] = payload
+
+            entries.update(self._added)
+            keys = sorted(entries)
+            offset = _HEADER.size + len(keys) * _ENTRY.size
+            index = []
+
+            for key in keys:
+                index.append(_ENTRY.pack(key, offset, len(entries[key])))
+                offset += len(entries[key])
+
+            temporary = f'{self.path}.{os.getpid()}.tmp'
+
+            with open(temporary, 'wb') as cache_file:
+                cache_file.write(_HEADER.pack(
+                        MAGIC, VERSION, marshal.version, len(keys)))
+                cache_file.writelines(index)
+                cache_file.writelines(entries[key] for key in keys)
+
+            os.replace(temporary, self.path)
+
+            # Tables already read from the old mapping are copies, so it can
+            # be closed.
+            if self._map is not None:
+                self._map.close()
+
+            self._map = None
+            self._count = 0
+            self._added = {}
+            self._open()
+
+
+_OPENED: Dict[str, TableCache] = {}
+_OPENED_LOCK = Lock()
+
+
+def open_table_cache(path: str) -> TableCache:
+    '''The `TableCache` for the file at `path`, opened once per process.
+    '''
+
+    path = os.path.abspath(path)
+
+    with _OPENED_LOCK:
+        if path not in _OPENED:
+            _OPENED[path] = TableCache(path)
+
+        return _OPENED[path]
@@ -0,0 +1,125 @@
+import asyncio
+import unittest
+
+from nli.cache import ResultCache
+from nli.command import Command
+from nli.dispatch import Dispatcher
+from nli.parser import Parser
+from nli.transition import Transition
+
+
+class _CountingParser:
+    # Wraps a `CompiledParser`, counting the inputs it is given.
+    def __init__(self, compiled):
+        self.compiled = compiled
+        self.calls = 0
+
+    def accept(self, tokens):
+        self.calls += 1
+        return self.compiled.accept(tokens)
+
+    def parse(self, input_str):
+        self.calls += 1
+        return self.compiled.parse(input_str)
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class ResultCacheTests(unittest.TestCase):
+    def test_least_recently_used_evicted(self):
+        cache = ResultCache(size=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+
+        assert cache.get('a') == 1
+        assert cache.get('b') is None
+        assert cache.get('c') == 3
+
+
+    def test_entries_expire(self):
+        clock = _Clock()
+        cache = ResultCache(size=2, ttl=10, clock=clock)
+        cache.put('a', 1)
+
+        clock.now = 9.9
+        assert cache.get('a') == 1
+
+        clock.now = 10
+        assert cache.get('a') is None
+        assert len(cache) == 0
+
+
+    def test_hits_and_misses_counted(self):
+        cache = ResultCache()
+        cache.get('a')
+        cache.put('a', 1)
+        cache.get('a')
+        cache.get('a')
+
+        assert (cache.hits, cache.misses) == (2, 1)
+
+
+class CommandCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+
+        def callback(args):
+            self.calls.append(args)
+            return f'hello {args["name"]}'
+
+        self.command = Command(
+                name='greet',
+                help='',
+                format='hi <name>',
+                callback=callback,
+                cache=ResultCache(),
+                parser=Parser(
+                    start='start',
+                    end='end',
+                    transitions=[
+                        Transition(fr='start', to='hi', match='hi'),
+                        Transition(
+                            fr='hi', to='end', match='.*', param='name')
+                    ]))
+
+
+    def test_callback_result_cached_by_tokens(self):
+        assert self.command.execute('hi there') == 'hello there'
+        assert self.command.execute('hi, there!') == 'hello there'
+        assert self.command.execute('hi you') == 'hello you'
+        assert len(self.calls) == 2
+
+
+    def test_cached_input_not_parsed(self):
+        parser = _CountingParser(self.command.compiled)
+        self.command.compiled = parser
+        dispatcher = Dispatcher([self.command], prefilter=False)
+
+        self.command.execute('hi there')
+        outcomes = [
+            dispatcher.dispatch('hi there!'),
+            asyncio.run(dispatcher.dispatch_async('hi there')),
+        ]
+
+        assert [(o.args, o.message) for o in outcomes] ==\
+                [({'name': 'there'}, 'hello there')] * 2
+        assert dispatcher.dispatch('hi you').message == 'hello you'
+        assert dispatcher.dispatch('hi you?').message == 'hello you'
+        assert parser.calls == 2
+        assert len(self.calls) == 2
+
+
+    def test_invalidate_cache(self):
+        self.command.execute('hi there')
+        self.command.invalidate_cache()
+        self.command.execute('hi there')
+
+        assert len(self.calls) == 2
@@ -0,0 +1,208 @@
+import random
+import unittest
+
+from commands import new_hire
+from nli.compiled import compile_parser
+from nli.parser import Parser, ParseError, ParseFailure
+from nli.transition import Transition
+
+
+def _cargo_parser():
+    # cargo new [binary | lib] [using [rust | edition] <edition>]
+    # (called | named) <name>
+    return Parser(
+            start='start',
+            end='end',
+            transitions=[
+                Transition(fr='start', to='cargo', match='cargo'),
+                Transition(fr='cargo', to='new', match='new'),
+                Transition(fr='new', to='binlib', match='(binary|lib)'),
+                Transition(fr='new', to='using', match='using'),
+                Transition(fr='new', to='called', match='(called|named)'),
+                Transition(fr='binlib', to='using', match='using'),
+                Transition(fr='using', to='edition', match='(Rust|edition)'),
+                Transition(fr='edition', to='called', match='\\d{4}', param='edition'),
+                Transition(fr='called', to='name', match='(called|named)'),
+                Transition(fr='name', to='end', match='.*', param='name')
+            ])
+
+
+def _outcome(parser, input_):
+    try:
+        return ('ok', parser.parse(input_))
+    except ParseError as err:
+        return ('error', err.state, err.stack, err.tokens)
+
+
+class CompiledParserTests(unittest.TestCase):
+    def test_table_indexed_by_from_state(self):
+        compiled = compile_parser(_cargo_parser())
+
+        assert set(compiled.table) ==\
+                {'start', 'cargo', 'new', 'binlib', 'using', 'edition',
+                 'called', 'name'}
+        assert [e.to for e in compiled.table['new']] ==\
+                ['binlib', 'using', 'called']
+
+
+    def test_table_is_immutable(self):
+        compiled = compile_parser(_cargo_parser())
+
+        with self.assertRaises(TypeError):
+            compiled.table['extra'] = ()
+
+
+    def test_agrees_with_parser(self):
+        parsers = [_cargo_parser(), new_hire(['link']).parser]
+        inputs = [
+            '',
+            'cargo new called test',
+            'cargo new lib using Rust 2018 named test',
+            'cargo new binary using 2018 named test',
+            'cargo new lib test',
+            'new hires',
+            'hi! I\'m a new hire.',
+            'is there a guide for new hires?',
+            'new hire please',
+            'hire new',
+        ]
+
+        for parser in parsers:
+            compiled = compile_parser(parser)
+
+            for input_ in inputs:
+                assert _outcome(parser, input_) ==\
+                        _outcome(compiled, input_), input_
+
+
+    def test_stack_operations_agree_with_parser(self):
+        p = Parser(
+                start='start',
+                end='end',
+                transitions=[
+                    Transition(fr='start', to='a', match='a', param='x'),
+                    Transition(fr='a', to='b', match='b', pop=True),
+                    Transition(fr='a', to='b', match='c', param='y', pop=True),
+                    Transition(fr='b', to='end', match='d', stack_match='y'),
+                    Transition(fr='b', to='end', stack_match='x'),
+                    Transition(fr='b', to='end', match='e', pop=True)
+                ])
+        compiled = compile_parser(p)
+
+        for input_ in ['a b d', 'a c d', 'a b e', 'a c e', 'a c f', 'e']:
+            assert _outcome(p, input_) == _outcome(compiled, input_), input_
+
+
+    def test_input_not_read_past_dead_state(self):
+        compiled = compile_parser(new_hire(['link']).parser)
+        read = []
+
+        def tokens():
+            for tkn in ['new', 'hire', 'and', 'more']:
+                read.append(tkn)
+                yield tkn
+
+        assert compiled.accept(tokens()) is None
+        assert read == ['new', 'hire', 'and']
+
+
+_WORDS = ['a', 'b', 'ab', 'new', 'hire', '42', 'x']
+_PATTERNS = ['a', 'b', 'ab?', 'new', 'hires?', '\\d+', '.*', '[ax]']
+
+
+def _random_parser(rng):
+    states = ['start', 's1', 's2', 'end', 'end']
+    transitions = []
+
+    for _ in range(rng.randint(2, 14)):
+        param = rng.choice([None, None, 'p', 'q'])
+        match = rng.choice([None] + _PATTERNS * 3)
+        transitions.append(Transition(
+            fr=rng.choice(states[:-1]),
+            # Once input runs out, transitions with no `match` are retried
+            # from the same state until one reaches the end, so one leading
+            # anywhere else would never stop.
+            to=rng.choice(states) if match is not None else 'end',
+            match=match,
+            stack_match=rng.choice([None, None, None, 'p', 'q']),
+            param=param,
+            pop=rng.random() < 0.2,
+            extend=param is not None and rng.random() < 0.3))
+
+    return Parser(start='start', end='end', transitions=transitions)
+
+
+class ParseManyTests(unittest.TestCase):
+    def test_agrees_with_parse(self):
+        # A property test over seeded random parsers and inputs.
+        rng = random.Random(15)
+
+        for _ in range(300):
+            parser = _random_parser(rng)
+            compiled = compile_parser(parser)
+            inputs = [
+                ' '.join(rng.choice(_WORDS) for _ in range(rng.randint(0, 6)))
+                for _ in range(20)
+            ]
+
+            expected = [_outcome(parser, input_) for input_ in inputs]
+            batched = [
+                ('ok', result) if isinstance(result, dict) else
+                ('error', result.state, result.stack, result.tokens)
+                for result in parser.parse_many(inputs)
+            ]
+
+            assert batched == expected, (parser, inputs)
+            assert compiled.accept_many([i.split() for i in inputs]) ==\
+                    [e[1] if e[0] == 'ok' else None for e in expected]
+
+            failures = [
+                (r.state, r.stack, r.index, r.tokens)
+                if isinstance(r, ParseFailure) else r
+                for r in parser.parse_many(inputs)
+            ]
+
+            for (input_, failure) in zip(inputs, failures):
+                for engine in [parser, compiled]:
+                    r = engine.try_parse(input_)
+
+                    if isinstance(r, ParseFailure):
+                        r = (r.state, r.stack, r.index, r.tokens)
+
+                    assert r == failure, (parser, input_)
+
+
+    def test_parser_compiled_once_for_many(self):
+        parser = new_hire(['link']).parser
+        parser.parse_many(['new hire'])
+        compiled = parser._compiled
+
+        assert parser.parse_many(['hello new hires'])[0] == {}
+        assert parser._compiled is compiled
+
+        parser.transitions = parser.transitions[:1]
+
+        assert isinstance(parser.parse_many(['new hire'])[0], ParseFailure)
+        assert parser._compiled is not compiled
+        assert parser == Parser(parser.start, parser.end, parser.transitions)
+
+
+    def test_each_token_tested_once_per_transition(self):
+        compiled = compile_parser(new_hire(['link']).parser)
+        calls = []
+
+        pattern = compiled.table['start'][0].pattern
+
+        class Spy:
+            def match(self, tkn):
+                calls.append(tkn)
+                return pattern.match(tkn)
+
+        object.__setattr__(compiled.table['start'][0], 'pattern', Spy())
+
+        try:
+            compiled.parse_many(['new hire'] * 50 + ['hello new hires'] * 50)
+        finally:
+            object.__setattr__(compiled.table['start'][0], 'pattern', pattern)
+
+        assert sorted(calls) == ['hello', 'new']
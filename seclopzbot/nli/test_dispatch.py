@@ -0,0 +1,80 @@
+import unittest
+
+from nli.command import Command
+from nli.dispatch import Dispatcher
+from nli.parser import Parser
+from nli.transition import Transition
+
+
+def _command(name, word, callback=None):
+    return Command(
+            name=name,
+            help=name,
+            format=f'{word} <arg>',
+            callback=callback or (lambda args: f'{name} {args["arg"]}'),
+            parser=Parser(
+                start='start',
+                end='end',
+                transitions=[
+                    Transition(fr='start', to='word', match=word),
+                    Transition(fr='word', to='end', match='.*', param='arg')
+                ]))
+
+
+def _fail(args):
+    raise RuntimeError('callback failed')
+
+
+class DispatcherTests(unittest.TestCase):
+    def test_first_accepting_command_wins(self):
+        d = Dispatcher([
+            _command('first', 'hello'),
+            _command('second', 'hel+o'),
+        ])
+
+        result = d.dispatch('hello world')
+        assert result.command.name == 'first'
+        assert result.args == {'arg': 'world'}
+        assert result.message == 'first world'
+
+
+    def test_failed_callback_falls_through(self):
+        d = Dispatcher([
+            _command('first', 'hello', _fail),
+            _command('second', 'hello'),
+        ])
+
+        assert d.dispatch('hello world').message == 'second world'
+
+
+    def test_no_accepting_command(self):
+        d = Dispatcher([_command('first', 'hello')])
+
+        assert d.dispatch('goodbye world') is None
+        assert list(d.matches('goodbye world')) == []
+
+
+    def test_matches_in_priority_order(self):
+        d = Dispatcher([
+            _command('first', 'hello'),
+            _command('second', 'bye'),
+            _command('third', 'hello'),
+        ])
+
+        names = [c.name for (c, _) in d.matches('hello there')]
+        assert names == ['first', 'third']
+
+
+    def test_classify_many(self):
+        d = Dispatcher([
+            _command('first', 'hello', _fail),
+            _command('second', 'bye'),
+        ])
+
+        results = d.classify_many(['hello there', 'no', 'bye now'])
+
+        assert results[1] is None
+        assert (results[0][0].name, results[0][1]) ==\
+                ('first', {'arg': 'there'})
+        assert (results[2][0].name, results[2][1]) ==\
+                ('second', {'arg': 'now'})
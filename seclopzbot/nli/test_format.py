@@ -0,0 +1,184 @@
+import unittest
+import warnings
+
+from commands import new_hire
+from nli.compiled import compile_parser
+from nli.format import FormatError, FormatWarning, check_parser,\
+    compile_format
+from nli.parser import Parser, ParseError
+from nli.transition import Transition
+
+
+_CARGO = 'cargo new [binary | lib] [using [Rust | edition] <edition>] '\
+        '(called | named) <name>'
+
+
+def _outcome(parser, input_):
+    try:
+        return ('ok', parser.parse(input_))
+    except ParseError:
+        return ('error',)
+
+
+def _compile(fmt):
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        parser = compile_format(fmt)
+
+    return (parser, [str(w.message) for w in caught])
+
+
+class CompileFormatTests(unittest.TestCase):
+    def test_agrees_with_hand_written_parser(self):
+        hand_written = new_hire(['link']).parser
+        (parser, problems) = _compile('(...) new hire[s]')
+        inputs = [
+            '',
+            'new hires',
+            'hi! I\'m a new hire.',
+            'is there a guide for new hires?',
+            'new hire please',
+            'hire new',
+            'new',
+        ]
+
+        assert problems == []
+
+        for input_ in inputs:
+            assert _outcome(hand_written, input_) ==\
+                    _outcome(parser, input_), input_
+
+
+    def test_parameters_extracted(self):
+        (parser, _) = _compile(_CARGO)
+        compiled = compile_parser(parser)
+
+        assert compiled.parse('cargo new called test') == {'name': 'test'}
+        assert compiled.parse('cargo new lib using Rust 2018 named test') ==\
+                {'edition': '2018', 'name': 'test'}
+        assert compiled.parse('cargo new using 2018 called x') ==\
+                {'edition': '2018', 'name': 'x'}
+
+        with self.assertRaises(ParseError):
+            compiled.parse('cargo new lib')
+
+
+    def test_alternatives_collapsed_into_one_transition(self):
+        (parser, _) = _compile('seclopzbot (hello | hi | hey there)')
+
+        greetings = [
+            tx for tx in parser.transitions
+            if tx.fr == 's1' and tx.to == 's2'
+        ]
+
+        assert len(greetings) == 1
+        assert greetings[0].match == '(?:hello|hi)$'
+
+
+    def test_equivalent_states_merged(self):
+        (parser, _) = _compile('seclopzbot start [a new | an] investigation')
+        states = {tx.fr for tx in parser.transitions}
+
+        # `a new` and `an` both lead to the state expecting `investigation`.
+        assert len(states) == 6
+
+
+    def test_keywords_match_whole_tokens(self):
+        (parser, _) = _compile('seclopzbot hi')
+
+        with self.assertRaises(ParseError):
+            parser.parse('seclopzbot hiya')
+
+
+    def test_rest_parameter_captures_remaining_words(self):
+        (parser, _) = _compile(
+                'seclopzbot add note to <investigation> <words...>')
+
+        assert parser.parse('seclopzbot add note to 42 check the logs!') ==\
+                {'investigation': '42', 'words': 'check the logs'}
+
+
+    def test_keyword_shadowing_parameter_reported(self):
+        (_, problems) = _compile('deploy [now] <service>')
+
+        assert len(problems) == 1
+        assert 'now' in problems[0] and '<service>' in problems[0]
+
+
+    def test_ambiguous_parameters_reported(self):
+        (_, problems) = _compile('close <investigation> | close <incident>')
+
+        assert len(problems) == 1
+        assert '<investigation>' in problems[0] and '<incident>' in problems[0]
+
+
+    def test_strict_raises_on_problems(self):
+        with self.assertRaises(FormatError):
+            compile_format('deploy [now] <service>', strict=True)
+
+
+    def test_anchored_rejects_words_without_a_place(self):
+        parser = compile_format(
+                'close investigation[s] <ids...> (...)', anchored=True,
+                strict=True)
+        plain = compile_format('close investigation <id>', strict=True)
+        anchored = compile_format(
+                'close investigation <id>', anchored=True, strict=True)
+
+        assert _outcome(plain, 'do not close investigation 1') ==\
+            ('ok', {'id': '1'})
+        assert _outcome(anchored, 'do not close investigation 1') ==\
+            ('error',)
+        assert _outcome(anchored, 'close investigation 1 now') == ('error',)
+        assert _outcome(parser, 'close investigations 1 2 now') ==\
+            ('ok', {'ids': '1 2 now'})
+
+
+    def test_syntax_errors(self):
+        for fmt in ['new (hire', 'new hire]', 'a | (b', '<>', '...']:
+            with self.assertRaises(FormatError, msg=fmt):
+                compile_format(fmt)
+
+
+    def test_warning_category(self):
+        with self.assertWarns(FormatWarning):
+            compile_format('deploy [now] <service>')
+
+
+class CheckParserTests(unittest.TestCase):
+    def test_hand_written_parser_has_no_problems(self):
+        assert check_parser(new_hire(['link']).parser) == []
+
+
+    def test_unreachable_and_dead_states(self):
+        p = Parser(
+                start='start',
+                end='end',
+                transitions=[
+                    Transition(fr='start', to='end', match='a'),
+                    Transition(fr='start', to='stuck', match='b'),
+                    Transition(fr='orphan', to='end', match='c'),
+                ])
+        problems = check_parser(p)
+
+        assert problems == [
+            'State \'orphan\' cannot be reached.',
+            'The end state cannot be reached from \'stuck\'.',
+        ]
+
+
+    def test_shadowed_transitions(self):
+        p = Parser(
+                start='start',
+                end='end',
+                transitions=[
+                    Transition(fr='start', to='end', match='.*'),
+                    Transition(fr='start', to='end', match='new'),
+                    Transition(fr='start', to='end', match='a', param='x'),
+                    Transition(fr='start', to='end', match='.*',
+                               stack_match='x'),
+                ])
+        problems = check_parser(p)
+
+        assert len(problems) == 2
+        assert all('matching \'.*\' always applies' in p for p in problems)
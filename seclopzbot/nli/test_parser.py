@@ -1,6 +1,7 @@
 import unittest
 
-from nli.parser import Parser, ParseError
+from nli.parser import Parser, ParseError, ParseFailure, TokenStream,\
+    iter_tokens, tokenize, tokenize_many
 from nli.transition import Transition
 
 
@@ -122,3 +123,93 @@ class ParserTests(unittest.TestCase):
 
         for input_ in invalid_inputs:
             self.assertRaises(ParseError, p.parse, input_)
+
+
+class TryParseTests(unittest.TestCase):
+    def setUp(self):
+        self.parser = Parser(
+                start='start',
+                end='end',
+                transitions=[
+                    Transition(fr='start', to='name', match='call'),
+                    Transition(fr='name', to='end', match='.*', param='name'),
+                    Transition(fr='end', to='end', match='please')
+                ])
+
+
+    def test_accepted_input_returns_args(self):
+        assert self.parser.try_parse('call bob') == {'name': 'bob'}
+
+
+    def test_failure_records_where_parsing_stopped(self):
+        failure = self.parser.try_parse('hey call bob thanks')
+
+        assert isinstance(failure, ParseFailure)
+        assert failure.state == 'end'
+        assert failure.stack == [('name', 'bob')]
+        assert failure.index == 3
+        assert failure.token == 'thanks'
+
+
+    def test_failure_when_input_runs_out(self):
+        failure = self.parser.try_parse('hey call')
+
+        assert failure.index == 2
+        assert failure.token is None
+
+
+    def test_failure_describes_same_error_as_parse(self):
+        failure = self.parser.try_parse('hey call bob thanks')
+
+        with self.assertRaises(ParseError) as raised:
+            self.parser.parse('hey call bob thanks')
+
+        assert str(failure) == str(raised.exception) == str(failure.error())
+        assert 'state symbol = end' in str(failure)
+        assert raised.exception.tokens == ['hey', 'call', 'bob', 'thanks']
+
+
+class TokenizerTests(unittest.TestCase):
+    def test_punctuation_removed(self):
+        assert tokenize('hi!  I\'m a new-hire.  ...') ==\
+                ['hi', 'Im', 'a', 'newhire']
+
+
+    def test_only_spaces_split(self):
+        assert tokenize('new\thire now') == ['new\thire', 'now']
+
+
+    def test_tokens_produced_lazily(self):
+        tokens = iter_tokens('a b ' + '!' * 10)
+
+        assert next(tokens) == 'a'
+        assert next(tokens) == 'b'
+        assert next(tokens, None) is None
+
+
+    def test_token_stream_reiterable(self):
+        stream = TokenStream('one two three')
+
+        assert next(iter(stream)) == 'one'
+        assert list(stream) == ['one', 'two', 'three']
+        assert list(stream) == ['one', 'two', 'three']
+
+
+    def test_lazy_and_list_tokenizers_agree(self):
+        inputs = [
+            '', ' ', '...', 'a  b', ' a, b! ',
+            'x' * 600 + ' y.',
+            'new hire, ' * 200,
+            ' '.join(str(i) + '!' for i in range(500)),
+        ]
+
+        for input_ in inputs:
+            assert list(iter_tokens(input_)) == tokenize(input_), input_
+
+
+    def test_tokenize_many_agrees_with_tokenize(self):
+        inputs = ['', 'new hire!', 'a\nb c', ' a, b! ', 'nul\0 byte']
+
+        assert tokenize_many(inputs) == [tokenize(i) for i in inputs]
+        assert tokenize_many(inputs[:-1]) == [tokenize(i) for i in inputs[:-1]]
+        assert tokenize_many([]) == []
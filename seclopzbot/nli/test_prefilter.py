@@ -0,0 +1,159 @@
+import random
+import unittest
+
+from benchmarks import grammars
+from nli.compiled import compile_parser
+from nli.dispatch import Dispatcher
+from nli.format import compile_format
+from nli.parser import Parser, tokenize
+from nli.prefilter import KeywordIndex, keywords, required_keywords
+from nli.test_compiled import _WORDS, _random_parser
+from nli.test_dispatch import _command
+from nli.transition import Transition
+
+
+def _tx(match, stack_match=None):
+    return Transition(
+            fr='start', to='end', match=match, stack_match=stack_match)
+
+
+class KeywordsTests(unittest.TestCase):
+    def test_literal_patterns(self):
+        assert keywords(_tx('new')) == {('new', False)}
+        assert keywords(_tx('hires?')) == {('hire', False), ('hires', False)}
+        assert keywords(_tx('(?:add|remove)$')) ==\
+                {('add', True), ('remove', True)}
+        assert keywords(_tx('[ax]b')) == {('ab', False), ('xb', False)}
+
+
+    def test_non_literal_patterns(self):
+        for match in ['.*', '\\d+', '(?i)new', 'a*', 'b?', 'a{1,9}', '(a|)']:
+            assert keywords(_tx(match)) is None, match
+
+        assert keywords(_tx(None)) is None
+        assert keywords(_tx(None, 'p')) is None
+
+
+class RequiredKeywordsTests(unittest.TestCase):
+    def test_new_hire(self):
+        parser = compile_parser(grammars.new_hire_parser())
+
+        assert required_keywords(parser) == {('new', False)}
+
+
+    def test_compiled_format(self):
+        parser = compile_format('seclopzbot add note to <investigation>')
+
+        assert required_keywords(compile_parser(parser)) == {('add', True)}
+
+
+    def test_alternative_paths(self):
+        parser = Parser(
+                start='start',
+                end='end',
+                transitions=[
+                    Transition(fr='start', to='end', match='deploy'),
+                    Transition(fr='start', to='end', match='ship'),
+                ])
+
+        assert required_keywords(compile_parser(parser)) ==\
+                {('deploy', False), ('ship', False)}
+
+
+    def test_unavoidable_wildcard(self):
+        parser = Parser(
+                start='start',
+                end='end',
+                transitions=[
+                    Transition(fr='start', to='end', match='deploy'),
+                    Transition(fr='start', to='end', match='.*'),
+                ])
+
+        assert required_keywords(compile_parser(parser)) is None
+
+
+class KeywordIndexTests(unittest.TestCase):
+    def test_candidates(self):
+        index = KeywordIndex([
+            compile_parser(grammars.new_hire_parser()),
+            compile_parser(compile_format('deploy (now | later)')),
+            compile_parser(Parser(
+                start='start',
+                end='end',
+                transitions=[Transition(fr='start', to='end', match='.*')])),
+        ])
+
+        assert index.candidates([]) == 0b100
+        assert index.candidates(['any', 'newbies']) == 0b101
+        assert index.candidates(['deploy', 'now']) == 0b110
+        assert index.candidates(['deployment']) == 0b100
+
+
+    def test_never_rules_out_accepted_inputs(self):
+        # A property test over seeded random parsers and inputs.
+        rng = random.Random(17)
+
+        for _ in range(300):
+            compiled = compile_parser(_random_parser(rng))
+            index = KeywordIndex([compiled])
+            inputs = [
+                [rng.choice(_WORDS) for _ in range(rng.randint(0, 6))]
+                for _ in range(20)
+            ]
+
+            for tokens in inputs:
+                if compiled.accept(tokens) is not None:
+                    assert index.candidates(tokens) == 1, (compiled, tokens)
+
+
+class DispatcherPrefilterTests(unittest.TestCase):
+    def test_same_outcome_without_prefilter(self):
+        commands = [
+            _command('first', 'hello'),
+            _command('second', 'hel+o'),
+            _command('third', 'bye'),
+        ]
+        on = Dispatcher(commands)
+        off = Dispatcher(commands, prefilter=False)
+        messages = ['hello world', 'helllo there', 'bye now', 'hi', '', 'bye']
+
+        for message in messages:
+            assert list(on.matches(message)) == list(off.matches(message))
+
+        assert on.classify_many(messages) == off.classify_many(messages)
+
+
+    def test_skipped_commands_not_parsed(self):
+        counts = []
+        commands = [
+            _command('first', 'hello'),
+            _command('second', 'bye'),
+        ]
+        d = Dispatcher(
+                commands,
+                counter=lambda outcome, command: counts.append(
+                    (outcome, command)))
+
+        assert d.dispatch('bye now').message == 'second now'
+        assert counts == [('skipped', 'first'), ('parsed', 'second')]
+
+        counts.clear()
+        assert d.classify_many(['hello a', 'bye b', 'neither']) == [
+            (commands[0], {'arg': 'a'}),
+            (commands[1], {'arg': 'b'}),
+            None,
+        ]
+        assert sorted(counts) == [
+            ('parsed', 'first'),
+            ('parsed', 'second'),
+            ('skipped', 'first'),
+            ('skipped', 'first'),
+            ('skipped', 'second'),
+        ]
+
+
+    def test_tokens_with_punctuation(self):
+        d = Dispatcher([_command('first', 'hello')])
+
+        assert tokenize('hello, world!') == ['hello', 'world']
+        assert d.dispatch('hello, world!').message == 'first world'
@@ -0,0 +1,210 @@
+import asyncio
+from threading import Lock, Thread
+import time
+import unittest
+
+from nli.cache import ResultCache
+from nli.command import CmdError, Command
+from nli.dispatch import Dispatcher
+from nli.runner import CallbackRunner
+from nli.test_dispatch import _command
+
+
+class _FakeBackend:
+    '''Stands in for a service such as MozDef, answering lookups after
+    `latency` seconds and recording how many are in flight at once.
+    '''
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+        self.in_flight = 0
+        self.most_in_flight = 0
+        self._lock = Lock()
+
+
+    def _enter(self):
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.most_in_flight = max(self.most_in_flight, self.in_flight)
+
+
+    def _exit(self):
+        with self._lock:
+            self.in_flight -= 1
+
+
+    async def lookup(self, key: str) -> str:
+        self._enter()
+
+        try:
+            await asyncio.sleep(self.latency)
+            return f'found {key}'
+        finally:
+            self._exit()
+
+
+    def lookup_blocking(self, key: str) -> str:
+        self._enter()
+
+        try:
+            time.sleep(self.latency)
+            return f'found {key}'
+        finally:
+            self._exit()
+
+
+def _lookup_command(backend, runner, **options):
+    async def callback(args):
+        return await backend.lookup(args['arg'])
+
+    command = _command('lookup', 'lookup')
+    return Command(
+            name=command.name,
+            help=command.help,
+            format=command.format,
+            callback=callback,
+            parser=command.parser,
+            runner=runner,
+            **options)
+
+
+def _blocking_command(backend, runner, **options):
+    command = _command('lookup', 'lookup')
+    return Command(
+            name=command.name,
+            help=command.help,
+            format=command.format,
+            callback=lambda args: backend.lookup_blocking(args['arg']),
+            parser=command.parser,
+            runner=runner,
+            blocking=True,
+            **options)
+
+
+def _in_threads(function, count):
+    results = [None] * count
+
+    def call(i):
+        results[i] = function(i)
+
+    threads = [Thread(target=call, args=(i,)) for i in range(count)]
+    start = time.monotonic()
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    return (results, time.monotonic() - start)
+
+
+class CallbackRunnerTests(unittest.TestCase):
+    def setUp(self):
+        self.runner = CallbackRunner(threads=8)
+
+
+    def tearDown(self):
+        self.runner.close()
+
+
+    def test_async_callback(self):
+        command = _lookup_command(_FakeBackend(0.01), self.runner)
+
+        assert command.is_async
+        assert command.execute('lookup 7') == 'found 7'
+
+
+    def test_async_callbacks_run_concurrently(self):
+        backend = _FakeBackend(0.2)
+        command = _lookup_command(backend, self.runner)
+
+        (results, elapsed) = _in_threads(
+                lambda i: command.execute(f'lookup {i}'), 10)
+
+        assert results == [f'found {i}' for i in range(10)]
+        assert backend.most_in_flight == 10
+        assert elapsed < 1.0
+
+
+    def test_blocking_callbacks_run_on_threads(self):
+        backend = _FakeBackend(0.2)
+        command = _blocking_command(backend, self.runner)
+
+        (results, elapsed) = _in_threads(
+                lambda i: command.execute(f'lookup {i}'), 8)
+
+        assert results == [f'found {i}' for i in range(8)]
+        assert backend.most_in_flight == 8
+        assert elapsed < 1.0
+
+
+    def test_blocking_callback_does_not_block_loop(self):
+        slow = _blocking_command(_FakeBackend(0.5), self.runner)
+        fast = _lookup_command(_FakeBackend(0.01), self.runner)
+
+        pending = self.runner.submit(slow.invoke_async({'arg': 'slow'}))
+        start = time.monotonic()
+
+        assert fast.invoke({'arg': 'fast'}) == 'found fast'
+        assert time.monotonic() - start < 0.4
+        assert pending.result() == 'found slow'
+
+
+    def test_timeout(self):
+        for command in [
+                _lookup_command(_FakeBackend(1), self.runner, timeout=0.05),
+                _blocking_command(_FakeBackend(1), self.runner, timeout=0.05)]:
+            start = time.monotonic()
+
+            with self.assertRaises(CmdError) as raised:
+                command.invoke({'arg': 'x'})
+
+            assert isinstance(raised.exception.cause, asyncio.TimeoutError)
+            assert time.monotonic() - start < 0.5
+
+
+    def test_concurrency_limit(self):
+        backend = _FakeBackend(0.05)
+        command = _lookup_command(backend, self.runner, concurrency=3)
+
+        (results, _) = _in_threads(
+                lambda i: command.invoke({'arg': str(i)}), 12)
+
+        assert results == [f'found {i}' for i in range(12)]
+        assert backend.most_in_flight == 3
+
+
+    def test_timed_out_command_falls_through(self):
+        slow = _lookup_command(_FakeBackend(1), self.runner, timeout=0.05)
+        d = Dispatcher([slow, _command('fallback', 'lookup')])
+
+        assert d.dispatch('lookup 7').message == 'fallback 7'
+
+
+    def test_dispatch_async_on_another_loop(self):
+        backend = _FakeBackend(0.2)
+        d = Dispatcher([_lookup_command(backend, self.runner)])
+
+        async def dispatch_all():
+            return await asyncio.gather(*[
+                d.dispatch_async(f'lookup {i}') for i in range(5)
+            ])
+
+        start = time.monotonic()
+        outcomes = asyncio.run(dispatch_all())
+
+        assert [o.message for o in outcomes] ==\
+                [f'found {i}' for i in range(5)]
+        assert time.monotonic() - start < 0.8
+
+
+    def test_async_results_cached(self):
+        backend = _FakeBackend(0.01)
+        command = _lookup_command(backend, self.runner, cache=ResultCache())
+
+        assert command.execute('lookup a') == 'found a'
+        assert command.execute('lookup, a!') == 'found a'
+        assert backend.calls == 1
@@ -0,0 +1,160 @@
+import marshal
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from nli.command import Command
+from nli.format import FormatWarning, compile_format
+from nli.parser import ParseError
+from nli.tablecache import _ENTRY, _HEADER, TableCache, format_key
+
+
+_FORMAT = 'seclopzbot add note to <investigation> <words...>'
+
+
+def _transitions(parser):
+    return [
+        (tx.fr, tx.to, tx.match, tx.stack_match, tx.param, tx.pop, tx.extend)
+        for tx in parser.transitions
+    ]
+
+
+class TableCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'tables')
+
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+
+    def test_missing_file_is_empty(self):
+        tables = TableCache(self.path)
+
+        assert len(tables) == 0
+        assert tables.get(_FORMAT) is None
+        assert tables.misses == 1
+
+
+    def test_saved_tables_read_by_new_cache(self):
+        tables = TableCache(self.path)
+        compiled = compile_format(_FORMAT, tables=tables)
+        tables.save()
+
+        reopened = TableCache(self.path)
+        cached = compile_format(_FORMAT, tables=reopened)
+
+        assert reopened.hits == 1 and reopened.misses == 0
+        assert _transitions(cached) == _transitions(compiled)
+        assert cached.parse('seclopzbot add note to 7 all clear') ==\
+                {'investigation': '7', 'words': 'all clear'}
+
+
+    def test_save_keeps_earlier_tables(self):
+        formats = ['a (b | c)', 'd [e] f <g>', 'h <i...>']
+
+        for fmt in formats:
+            tables = TableCache(self.path)
+            compile_format(fmt, tables=tables)
+            tables.save()
+
+        tables = TableCache(self.path)
+
+        assert len(tables) == 3
+        assert all(tables.get(fmt) is not None for fmt in formats)
+
+
+    def test_changed_format_not_found(self):
+        tables = TableCache(self.path)
+        compile_format('a (b | c)', tables=tables)
+        tables.save()
+
+        assert TableCache(self.path).get('a (b | c | d)') is None
+        assert format_key('a (b | c)') != format_key('a (b | c | d)')
+
+
+    def test_changed_compiler_not_found(self):
+        tables = TableCache(self.path)
+        compile_format('a (b | c)', tables=tables)
+        tables.save()
+
+        with mock.patch('nli.tablecache.COMPILER_HASH', b'changed'):
+            assert TableCache(self.path).get('a (b | c)') is None
+
+
+    def test_cached_problems_reissued(self):
+        tables = TableCache(self.path)
+
+        with self.assertWarns(FormatWarning):
+            compile_format('deploy [now] <service>', tables=tables)
+
+        tables.save()
+
+        with self.assertWarns(FormatWarning):
+            compile_format(
+                    'deploy [now] <service>', tables=TableCache(self.path))
+
+
+    def test_invalid_files_ignored(self):
+        for contents in [b'', b'SLZTBL', b'not a table cache at all']:
+            with open(self.path, 'wb') as cache_file:
+                cache_file.write(contents)
+
+            tables = TableCache(self.path)
+            assert len(tables) == 0
+
+            compile_format('a (b | c)', tables=tables)
+            tables.save()
+            assert len(TableCache(self.path)) == 1
+
+
+    def test_corrupt_tables_missed(self):
+        tables = TableCache(self.path)
+        compile_format('a (b | c)', tables=tables)
+        tables.save()
+
+        with open(self.path, 'rb') as cache_file:
+            contents = cache_file.read()
+
+        # The table cut short, then overwritten with bytes `marshal` cannot
+        # read, then with a value that is not a table.
+        start = _HEADER.size + _ENTRY.size
+        length = len(contents) - start
+        damaged = [
+            contents[:-4],
+            contents[:start] + b'\xff' * length,
+            contents[:start] + marshal.dumps((1, 2)).ljust(length, b'\0'),
+        ]
+
+        for contents in damaged:
+            with open(self.path, 'wb') as cache_file:
+                cache_file.write(contents)
+
+            tables = TableCache(self.path)
+
+            assert tables.get('a (b | c)') is None
+            assert tables.misses == 1 and tables.hits == 0
+
+            parser = compile_format('a (b | c)', tables=tables)
+            assert parser.parse('a c') == {}
+
+            tables.save()
+            assert TableCache(self.path).get('a (b | c)') is not None
+
+
+    def test_command_compiled_from_format(self):
+        tables = TableCache(self.path)
+        command = Command(
+                name='greet',
+                help='Says hello',
+                format='seclopzbot (hello | hi)',
+                callback=lambda args: 'hello!',
+                tables=tables)
+
+        assert command.execute('seclopzbot hi') == 'hello!'
+        assert len(tables) == 1
+
+        with self.assertRaises(ParseError):
+            command.execute('seclopzbot bye')
@@ -1,6 +1,7 @@
+from dataclasses import FrozenInstanceError
 import unittest
 
-from nli.transition import Transition
+from nli.transition import MatchRule, StackOperation, Transition
 
 
 class TransitionTests(unittest.TestCase):
@@ -91,3 +92,40 @@ class TransitionTests(unittest.TestCase):
         assert t.apply(state, stack, token) == 'end'
         assert len(stack) == 1 and stack[0] == ('t', 'test')
 
+
+
+    def test_invalid_pattern_rejected_on_creation(self):
+        with self.assertRaises(ValueError):
+            Transition(fr='start', to='end', match='(unclosed')
+
+        with self.assertRaises(ValueError):
+            Transition(fr='start', to='end', stack_match='[')
+
+
+    def test_rules_resolved_on_creation(self):
+        t = Transition(fr='start', to='end', match='test', param='t', pop=True)
+
+        assert t.rule == MatchRule.TEXT_ONLY
+        assert t.operation == StackOperation.POP_THEN_PUSH
+        assert t.pattern.pattern == 'test' and t.stack_pattern is None
+
+
+    def test_immutable(self):
+        t = Transition(fr='start', to='end', match='test')
+
+        with self.assertRaises(FrozenInstanceError):
+            t.match = 'other'
+
+
+    def test_extend_appends_to_param(self):
+        t = Transition(fr='start', to='end', match='.*', param='t', extend=True)
+        stack = [('x', 'value')]
+
+        t.apply('start', stack, 'one')
+        t.apply('start', stack, 'two')
+        assert stack == [('x', 'value'), ('t', 'one two')]
+
+
+    def test_extend_requires_param(self):
+        with self.assertRaises(ValueError):
+            Transition(fr='start', to='end', match='.*', extend=True)
@@ -5,7 +5,7 @@ that a `Command`'s `Parser` can be in.
 from dataclasses import dataclass, field
 from enum import Enum
 import re
-from typing import List, Optional, Tuple
+from typing import List, Optional, Pattern, Tuple
 
 
 class MatchRule(Enum):
@@ -27,9 +27,10 @@ class StackOperation(Enum):
     PUSH = 1
     POP = 2
     POP_THEN_PUSH = 3
+    EXTEND = 4
 
 
-@dataclass
+@dataclass(frozen=True)
 class Transition:
     '''Describes a possible transition that can occur between two states.
 
@@ -57,6 +58,16 @@ class Transition:
     When both `param is not None` and `pop == True`, then the top item of the
     stack will be replaced with the new param value tagged with the symbol
     `param` is set to.
+
+    When `extend == True`, `param` is required and `pop` is disregarded.  If
+    the most recently pushed item on the stack is tagged with `param`, the
+    input token is appended to its value, separated by a space.  Otherwise the
+    token is pushed as it would be by a `param` transition.  This allows a
+    parameter to capture several words.
+
+    A `Transition` is immutable.  Its match rule, stack operation and regular
+    expressions are resolved once, when it is created, and a `ValueError` is
+    raised if `match` or `stack_match` is not a valid regular expression.
     '''
 
     fr: str
@@ -65,6 +76,40 @@ class Transition:
     stack_match: Optional[str] = field(default=None)
     param: Optional[str] = field(default=None)
     pop: bool = field(default=False)
+    extend: bool = field(default=False)
+    rule: MatchRule = field(init=False, repr=False, compare=False)
+    operation: StackOperation = field(init=False, repr=False, compare=False)
+    pattern: Optional[Pattern] =\
+            field(init=False, repr=False, compare=False)
+    stack_pattern: Optional[Pattern] =\
+            field(init=False, repr=False, compare=False)
+
+
+    def __post_init__(self):
+        if self.extend and self.param is None:
+            raise ValueError(
+                f'Transition from {self.fr} to {self.to} extends a parameter '
+                'but has no param.')
+
+        (match_rule, stack_op) = self._determine_rules()
+
+        object.__setattr__(self, 'rule', match_rule)
+        object.__setattr__(self, 'operation', stack_op)
+        object.__setattr__(self, 'pattern', self._compile(self.match))
+        object.__setattr__(
+                self, 'stack_pattern', self._compile(self.stack_match))
+
+
+    def _compile(self, regex: Optional[str]) -> Optional[Pattern]:
+        if regex is None:
+            return None
+
+        try:
+            return re.compile(regex)
+        except re.error as err:
+            raise ValueError(
+                f'Transition from {self.fr} to {self.to} has an invalid '
+                f'regular expression {regex!r}: {err}') from err
 
 
     def _determine_rules(self) -> Tuple[MatchRule, StackOperation]:
@@ -82,70 +127,68 @@ class Transition:
             (False, False): StackOperation.NONE
         }[(self.param is not None, self.pop)]
 
+        if self.extend:
+            stack_op = StackOperation.EXTEND
+
         return (match_rule, stack_op)
 
     
-    def _matches(
+    def _follow(
             self,
-            state: str,
-            rule: MatchRule,
+            stack: List[Tuple[str, str]],
             top_stack_sym: Optional[str],
-            tkn: Optional[str]) -> bool:
-
-        state_matches = state == self.fr
-
-        if self.match is None:
-            text_matches = False
+            tkn: Optional[str]) -> Optional[str]:
+        # Tests the precomputed match rule against the input token and stack,
+        # then applies the precomputed stack operation.  The caller is
+        # responsible for checking that the parser is in the `fr` state.
+        rule = self.rule
+
+        if rule is MatchRule.CHECK_NONE:
+            if tkn is not None:
+                return None
         else:
-            pattern = re.compile(self.match)
-            text_matches = tkn is not None and pattern.match(tkn) is not None
+            if rule is not MatchRule.STACK_ONLY and (
+                    tkn is None or self.pattern.match(tkn) is None):
+                return None
 
-        if self.stack_match is None:
-            stack_matches = False
-        else:
-            pattern = re.compile(self.stack_match)
-            stack_matches = top_stack_sym is not None and\
-                    pattern.match(top_stack_sym) is not None
-
-        any_rule_applies = any([
-            rule == MatchRule.CHECK_NONE and tkn is None,
-            rule == MatchRule.TEXT_ONLY and text_matches,
-            rule == MatchRule.STACK_ONLY and stack_matches,
-            rule == MatchRule.TEXT_AND_STACK and text_matches and stack_matches
-        ])
+            if rule is not MatchRule.TEXT_ONLY and (
+                    top_stack_sym is None or
+                    self.stack_pattern.match(top_stack_sym) is None):
+                return None
 
-        return state_matches and any_rule_applies
+        return self._operate(stack, tkn)
 
 
-    def _apply_stack_operation(
+    def _operate(
             self,
             stack: List[Tuple[str, str]],
-            op: StackOperation,
-            value: Optional[str] = None) -> bool:
+            tkn: Optional[str]) -> Optional[str]:
+        # Applies the precomputed stack operation, once the match rule is
+        # known to pass.
+        #
         # Note: `None` is a valid value for a parameter to take. We either
         # parsed out a string parameter value or we did not where we expected
         # one.  The latter case must be recognized for the parser's use.
-        # Therefore we do not check that `value is not None`.
-        have_param = self.param is not None
-        not_empty = len(stack) > 0
-
-        if op == StackOperation.NONE:
-            return True
+        # Therefore we do not check that `tkn is not None`.
+        op = self.operation
+
+        if op is StackOperation.PUSH:
+            stack.append((self.param, tkn))
+        elif op is StackOperation.EXTEND:
+            if len(stack) > 0 and stack[-1][0] == self.param:
+                stack[-1] = (self.param, f'{stack[-1][1]} {tkn}')
+            else:
+                stack.append((self.param, tkn))
+        elif op is not StackOperation.NONE:
+            if len(stack) == 0:
+                return None
 
-        if op == StackOperation.PUSH and have_param:
-            stack.append((self.param, value))
-            return True
-
-        if op == StackOperation.POP and not_empty:
             stack.pop()
-            return True
 
-        if op == StackOperation.POP_THEN_PUSH and not_empty and have_param:
-            stack.pop()
-            stack.append((self.param, value))
-            return True
+            if op is StackOperation.POP_THEN_PUSH:
+                stack.append((self.param, tkn))
 
-        return False
+        return self.to
 
 
     def apply(
@@ -174,13 +217,9 @@ class Transition:
         applied in any meaningful way, `None` will be returned.  For example,
         if `pop == True and len(stack) == 0`.
         '''
-        (match_rule, stack_op) = self._determine_rules()
-        top_symbol = stack[0][0] if len(stack) > 0 else None
-
-        does_match = self._matches(state, match_rule, top_symbol, token)
+        if state != self.fr:
+            return None
 
-        if does_match:
-            did_op = self._apply_stack_operation(stack, stack_op, token)
-            return self.to if did_op else None
+        top_symbol = stack[0][0] if len(stack) > 0 else None
 
-        return None
+        return self._follow(stack, top_symbol, token)
@@ -1,60 +1,199 @@
+from concurrent.futures import Future
+import multiprocessing
 import os
 from queue import Queue
-import time
 from threading import Thread
-from typing import Callable, Dict
-
-import click
-from flask import Flask, request
-import slack
+import time
 
 import bot
+from bot.intake import BUSY_REPLY
+
+
+config_path = os.environ.get('SECLOPZ_CONFIG', './config.json')
+cfg = bot.Config.load(config_path)
+metrics = bot.Metrics(enabled=cfg.metrics)
+
+if cfg.processes > 1:
+    # Messages are queued in a database shared with the responder processes.
+    message_queue = bot.Broker(
+            cfg.broker_path, cfg.broker_lease, cfg.dedupe_size)
+    terminate_signal = multiprocessing.Queue(maxsize=cfg.processes)
+    ingestor = bot.EventIngestor(
+            message_queue, cfg.bot_user_id, seen=message_queue.seen)
+else:
+    # Channels waiting on messages likely to be commands are served ahead of
+    # other chatter, which is shed first when the bot falls behind.
+    slack_bot = bot.Bot(os.environ['SLACK_TOKEN'], cfg, metrics)
+    message_queue = bot.BoundedIntake(
+            cfg.intake_size,
+            cfg.intake_policy,
+            slack_bot.is_command,
+            cfg.intake_timeout)
+    terminate_signal = Queue(maxsize=1)
+    ingestor = bot.EventIngestor(
+            message_queue, cfg.bot_user_id, cfg.dedupe_size)
+
+    for lane in ['commands', 'chatter']:
+        metrics.gauge(
+                f'intake_{lane}_depth',
+                lambda lane=lane: message_queue.depths()[lane],
+                f'Messages waiting in the {lane} lane of the intake.')
+
+    for outcome in message_queue.counts:
+        metrics.gauge(
+                f'intake_{outcome}_total',
+                lambda outcome=outcome: message_queue.counts[outcome],
+                f'Messages {outcome} by the intake.')
 
+metrics.gauge(
+        'message_queue_depth',
+        message_queue.qsize,
+        'Messages waiting to be handed to a responder.')
 
-cfg = bot.Config.load(os.environ.get('SECLOPZ_CONFIG', './config.json'))
-app = Flask('seclopzbot')
-slack_bot = bot.Bot(os.environ['SLACK_TOKEN'], cfg)
-message_queue = Queue()
-terminate_signal = Queue(maxsize=1)
+for outcome in ingestor.counts:
+    metrics.gauge(
+            f'events_{outcome}_total',
+            lambda outcome=outcome: ingestor.counts[outcome],
+            f'Slack events {outcome} by the webhook.')
 
 
-def respond_to_messages():
-    slack_client = slack.WebClient(token=os.environ['SLACK_TOKEN'])
+def watch_config(slack_bot: bot.Bot, sender: bot.SlackSender):
+    # Commands are rebuilt on the watcher's thread while the bot keeps
+    # answering messages with the old ones.
+    def reload(conf: bot.Config):
+        joined = set(slack_bot.channels_to_join())
+        stale = slack_bot.reload(conf)
+
+        for channel in conf.channels:
+            if channel not in joined:
+                sender.call('channels.join', name=channel)
+
+        print(f'Reloaded {config_path}')
+
+        if stale:
+            print(f'Restart to apply changes to {", ".join(stale)}')
+
+    watcher = bot.ConfigWatcher(
+            config_path, reload, cfg.reload_interval, cfg.reload_debounce)
+    watcher.start()
+    return watcher
+
+
+def respond_to_messages(slack_bot: bot.Bot):
+    sender = bot.SlackSender(
+            os.environ['SLACK_TOKEN'],
+            api_url=cfg.slack_api_url,
+            connections=cfg.send_connections,
+            rate=cfg.send_rate,
+            burst=cfg.send_burst,
+            coalesce=cfg.coalesce_replies,
+            metrics=slack_bot.metrics)
 
     for channel in slack_bot.channels_to_join():
-        slack_client.channels_join(name=channel)
+        sender.call('channels.join', name=channel)
+
+    def report(message: bot.Message, answered: Future):
+        if answered.exception() is not None:
+            print(f'Failed to handle message {message}: '
+                  f'{answered.exception()!r}')
+
+    def reply(message: bot.Message) -> Future:
+        # Commands are run on the bot's event loop, so that the worker is free
+        # for other channels while their callbacks wait.
+        slack_bot.metrics.observe(
+                'queue_wait_seconds', time.monotonic() - message.received)
+        answered = slack_bot.respond_later(message, sender.send)
+        answered.add_done_callback(lambda done: report(message, done))
+        return answered
+
+    slack_bot.metrics.gauge(
+            'send_queue_depth',
+            sender.pending,
+            'Replies waiting to be posted to Slack.')
+    if isinstance(message_queue, bot.BoundedIntake):
+        message_queue.on_reject = lambda message: sender.send(
+                bot.Response(message.channel, BUSY_REPLY))
+
+    sender.start()
+    watcher = None
+
+    if cfg.reload_interval > 0:
+        watcher = watch_config(slack_bot, sender)
 
     try:
-        while terminate_signal.empty():
-            print('Inside respond_to_messages main loop')
-            if not message_queue.empty():
-                message = message_queue.get()
-                response = slack_bot.respond_to_message(message)
-                slack_client.chat_postMessage(
-                        channel=response.channel,
-                        text=response.message)
-            
-            time.sleep(0.25)
+        if isinstance(message_queue, bot.Broker):
+            message_queue.consume(reply, cfg.workers, terminate_signal)
+        else:
+            pool = bot.ResponderPool(reply, cfg.workers)
+            pool.start()
+            pool.consume(message_queue, terminate_signal)
     except KeyboardInterrupt:
-        print('Exiting respond_to_messages')
-        return
+        pass
+
+    if watcher is not None:
+        watcher.stop()
+
+    slack_bot.wait_for_replies(timeout=10)
+    sender.stop(timeout=10)
+    print('Exiting respond_to_messages')
+
 
+def responder_process():
+    # Each process has its own bot, and its metrics are not served.
+    slack_bot = bot.Bot(os.environ['SLACK_TOKEN'], cfg)
+    slack_bot.warm(background=False)
+    respond_to_messages(slack_bot)
 
 
-@app.route('/', methods=['POST'])
-def bot_webhook():
-    if 'challenge' in request.json:
-        return request.json['challenge']
+def create_app():
+    # Flask is only imported once the bot has started loading its commands,
+    # so that the two happen at the same time.
+    from flask import Flask, Response, request
 
-    print(request.json)
-    return 'Ok'
+    app = Flask('seclopzbot')
+
+    @app.route('/', methods=['POST'])
+    def bot_webhook():
+        return ingestor.handle(request.get_json(silent=True))
+
+    @app.route('/metrics', methods=['GET'])
+    def bot_metrics():
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+    return app
 
 
 if __name__ == '__main__':
-    bot_thread = Thread(target=respond_to_messages)
-    bot_thread.start()
+    if cfg.processes > 1:
+        # The responder processes load their own commands, but they are
+        # loaded here too so that the bot refuses to start if any cannot be,
+        # and so that their parsers are in the table cache for the processes.
+        warming = bot.Registry(cfg).warm()
+        responders = [
+            multiprocessing.Process(target=responder_process)
+            for _ in range(cfg.processes)
+        ]
+    else:
+        warming = slack_bot.warm()
+        responders = [Thread(target=respond_to_messages, args=(slack_bot,))]
+
+    app = create_app()
+    # Raises, before anything is started, if a command cannot be loaded.
+    warming.join()
+
+    for responder in responders:
+        responder.start()
+
     try:
-        app.run()
+        app.run(
+                threaded=True, port=int(os.environ.get('SECLOPZ_PORT', 5000)))
     except KeyboardInterrupt:
-        terminate_signal.put(True)
-        bot_thread.join()
+        # Werkzeug returns from `run` on Ctrl+C itself, but other servers
+        # may let it propagate.
+        pass
+    finally:
+        for _ in responders:
+            terminate_signal.put(True)
+
+        for responder in responders:
+            responder.join()
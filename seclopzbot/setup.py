@@ -1,10 +1,10 @@
-from setuptools import setup, find_packages
+from setuptools import setup
 
 setup(
     name='seclopzbot',
     version='1.0',
     long_description=__doc__,
-    packages=find_packages(),
+    packages=['bot', 'commands', 'nli'],
     include_package_data=True,
     zip_safe=False,
     install_requires=[
@@ -0,0 +1,128 @@
+import http.client
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+from bot.stub_slack import StubSlack
+
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _metrics(port):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+
+    try:
+        connection.request('GET', '/metrics')
+        return connection.getresponse().status
+    except OSError:
+        return None
+    finally:
+        connection.close()
+
+
+class ShutdownTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.slack = StubSlack()
+        self.slack.start()
+        self.addCleanup(self.slack.stop)
+
+
+    def _launch(self, options):
+        config_path = os.path.join(self.directory.name, 'config.json')
+        port = _free_port()
+
+        with open(config_path, 'w') as cfg_file:
+            json.dump({
+                'channels': ['general'],
+                'new_hire_links': ['link'],
+                'slack_api_url': self.slack.url,
+                'command_entry_points': False,
+                'reload_interval': 0,
+                'broker_path': os.path.join(self.directory.name, 'queue'),
+                **options,
+            }, cfg_file)
+
+        bot = subprocess.Popen(
+                [sys.executable, 'seclopz-bot.py'],
+                cwd=ROOT,
+                env=dict(os.environ, SECLOPZ_CONFIG=config_path,
+                         SECLOPZ_PORT=str(port), SLACK_TOKEN='xoxb-test'),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT)
+        self.addCleanup(bot.stdout.close)
+        return (bot, port)
+
+
+    def _start(self, **options):
+        (bot, port) = self._launch(options)
+        deadline = time.monotonic() + 30
+
+        while _metrics(port) != 200:
+            if bot.poll() is not None or time.monotonic() > deadline:
+                bot.kill()
+                self.fail(bot.communicate()[0].decode())
+
+            time.sleep(0.1)
+
+        return bot
+
+
+    def _interrupt(self, bot):
+        bot.send_signal(signal.SIGINT)
+
+        try:
+            output = bot.communicate(timeout=15)[0].decode()
+        except subprocess.TimeoutExpired:
+            bot.kill()
+            self.fail('The bot did not exit after SIGINT.')
+
+        return output
+
+
+    def test_interrupt_stops_responder(self):
+        output = self._interrupt(self._start())
+
+        assert 'Exiting respond_to_messages' in output
+
+
+    def test_interrupt_stops_responder_processes(self):
+        output = self._interrupt(self._start(processes=2))
+
+        assert output.count('Exiting respond_to_messages') == 2
+
+
+    def test_bad_command_path_stops_start(self):
+        for processes in [1, 2]:
+            (bot, port) = self._launch({
+                'commands': ['commands.missing:from_config'],
+                'processes': processes,
+            })
+
+            try:
+                output = bot.communicate(timeout=30)[0].decode()
+            except subprocess.TimeoutExpired:
+                bot.kill()
+                self.fail('The bot started with a command it cannot load.')
+
+            assert bot.returncode != 0
+            assert 'commands.missing:from_config' in output
+            assert _metrics(port) is None
+
+
+if __name__ == '__main__':
+    unittest.main()